@@ -0,0 +1,36 @@
+from wagtailgeowidget.blocks import GoogleMapsBlock, LeafletBlock
+
+VALUES = [
+    "SRID=4326;POINT({} {})".format(18 + i / 1000, 59 + i / 1000) for i in range(100)
+]
+
+
+def test_google_maps_block_to_python(benchmark):
+    block = GoogleMapsBlock()
+
+    def to_python():
+        for value in VALUES:
+            block.to_python(value)
+
+    benchmark(to_python, number=100)
+
+
+def test_google_maps_block_value_for_form(benchmark):
+    block = GoogleMapsBlock()
+    values = [block.to_python(value) for value in VALUES]
+
+    def value_for_form():
+        for value in values:
+            block.value_for_form(value)
+
+    benchmark(value_for_form, number=100)
+
+
+def test_leaflet_block_round_trip(benchmark):
+    block = LeafletBlock()
+
+    def round_trip():
+        for value in VALUES:
+            block.value_for_form(block.to_python(block.get_prep_value(value)))
+
+    benchmark(round_trip, number=100)
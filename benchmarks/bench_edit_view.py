@@ -0,0 +1,31 @@
+import pytest
+from wagtail.models import Page
+
+from tests.geopage.models import GeoPage, GeoPageRelatedLocations
+
+RELATED_LOCATIONS = 200
+
+
+@pytest.fixture
+def render_edit_view(db, edit_form_renderer):
+    """
+    Renders the edit form of a GeoPage with many inline related locations,
+    the same way the page edit view does.
+    """
+
+    page = GeoPage(title="Benchmark", slug="benchmark")
+    page.related_locations = [
+        GeoPageRelatedLocations(
+            title="Location {}".format(i),
+            address="Address {}".format(i),
+            location="SRID=4326;POINT({} {})".format(18 + i / 1000, 59 + i / 1000),
+        )
+        for i in range(RELATED_LOCATIONS)
+    ]
+    Page.objects.get(depth=1).add_child(instance=page)
+
+    return edit_form_renderer(page)
+
+
+def test_edit_view_render(benchmark, render_edit_view):
+    benchmark(render_edit_view, number=1)
@@ -0,0 +1,36 @@
+from wagtailgeowidget import helpers
+from wagtailgeowidget.helpers import geosgeometry_str_to_struct, parse_many
+
+VALUES = [
+    "SRID=4326;POINT({} {})".format(18 + i / 10000, 59 + i / 10000) for i in range(1000)
+]
+
+
+def clear_caches():
+    helpers._cached_parse_geosgeometry.cache_clear()
+
+
+def test_geosgeometry_str_to_struct(benchmark):
+    def parse():
+        clear_caches()
+        for value in VALUES:
+            geosgeometry_str_to_struct(value)
+
+    benchmark(parse)
+
+
+def test_geosgeometry_str_to_struct_cached(benchmark):
+    def parse():
+        for value in VALUES:
+            geosgeometry_str_to_struct(value)
+
+    parse()
+    benchmark(parse)
+
+
+def test_parse_many(benchmark):
+    def parse():
+        clear_caches()
+        parse_many(VALUES)
+
+    benchmark(parse)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from wagtail.models import Page
+
+from tests.geopage_nospatial.models import StreamPage
+
+STREAM_BLOCKS = 1000
+
+EDIT_VIEW_STREAM_BLOCKS = 100
+
+
+def get_stream_data(blocks=STREAM_BLOCKS):
+    """
+    Returns the stored body of a StreamPage alternating map blocks and
+    struct blocks holding a map.
+    """
+
+    body = []
+    for i in range(blocks):
+        location = "SRID=4326;POINT({} {})".format(18 + i / 1000, 59 + i / 1000)
+        if i % 2:
+            body.append({"type": "map_leaflet", "value": location})
+        else:
+            body.append(
+                {
+                    "type": "map_struct_with_zoom",
+                    "value": {
+                        "address": "Address {}".format(i),
+                        "zoom": 8,
+                        "map": location,
+                    },
+                }
+            )
+    return json.dumps(body)
+
+
+def test_stream_to_python(benchmark):
+    field = StreamPage._meta.get_field("body")
+    data = get_stream_data()
+
+    def load():
+        # Stream values are converted lazily, read every block like a template
+        return [child.value for child in field.to_python(data)]
+
+    benchmark(load, number=10)
+
+
+@pytest.fixture
+def render_stream_edit_view(db, edit_form_renderer):
+    """
+    Renders the edit form of a StreamPage with many map blocks.
+    """
+
+    page = StreamPage(title="Benchmark", slug="benchmark")
+    page.body = get_stream_data(EDIT_VIEW_STREAM_BLOCKS)
+    Page.objects.get(depth=1).add_child(instance=page)
+
+    return edit_form_renderer(page)
+
+
+def test_stream_edit_view_render(benchmark, render_stream_edit_view):
+    benchmark(render_stream_edit_view, number=1)
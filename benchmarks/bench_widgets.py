@@ -0,0 +1,50 @@
+from wagtailgeowidget import geocoders
+from wagtailgeowidget.widgets import GeocoderField, GoogleMapsField, LeafletField
+
+VALUE = "SRID=4326;POINT(18.0686 59.3293)"
+
+
+def build_google_maps_field_attrs():
+    widget = GoogleMapsField(srid=4326, address_field="address")
+    widget.value_data = VALUE
+
+    def build_attrs():
+        widget.build_attrs({"id": "id_location"})
+
+    return build_attrs
+
+
+def build_leaflet_field_attrs():
+    widget = LeafletField(srid=4326, address_field="address")
+    widget.value_data = VALUE
+
+    def build_attrs():
+        widget.build_attrs({"id": "id_location"})
+
+    return build_attrs
+
+
+def test_google_maps_field_build_attrs(benchmark):
+    benchmark(build_google_maps_field_attrs(), number=10000)
+
+
+def test_leaflet_field_build_attrs(benchmark):
+    benchmark(build_leaflet_field_attrs(), number=10000)
+
+
+def test_google_maps_field_render(benchmark):
+    widget = GoogleMapsField(srid=4326, address_field="address")
+
+    benchmark(lambda: widget.render("location", VALUE, {"id": "id_location"}))
+
+
+def test_leaflet_field_render(benchmark):
+    widget = LeafletField(srid=4326, address_field="address")
+
+    benchmark(lambda: widget.render("location", VALUE, {"id": "id_location"}))
+
+
+def test_geocoder_field_render(benchmark):
+    widget = GeocoderField(geocoder=geocoders.MAPBOX)
+
+    benchmark(lambda: widget.render("address", "Stockholm", {"id": "id_address"}))
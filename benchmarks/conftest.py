@@ -0,0 +1,181 @@
+import json
+import os
+import statistics
+import timeit
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Allowed slowdown compared to the stored baseline before a benchmark fails
+DEFAULT_MAX_REGRESSION = 0.25
+
+# Rounds per benchmark, the median ratio to the reference workload is
+# compared to the baselines
+DEFAULT_ROUNDS = 25
+
+# Rounds shorter than this are dominated by timer and scheduler noise, the
+# number of calls per round is raised until a round takes at least this long
+MIN_ROUND_TIME = 0.02
+
+results = []
+
+
+def _reference_workload():
+    """
+    A fixed workload timed between the rounds of every benchmark. Timings
+    are stored relative to it so baselines recorded on one machine can be
+    compared on another, and so a machine slowing down during the run
+    doesn't show up as a regression.
+    """
+
+    for i in range(1000):
+        json.loads(json.dumps({"lat": i / 7, "lng": i / 3, "zoom": i}))
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+
+    with open(BASELINES_PATH) as fd:
+        return json.load(fd)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--save-baselines",
+        action="store_true",
+        help="Store the timings of this run in benchmarks/baselines.json",
+    )
+    group.addoption(
+        "--check-baselines",
+        action="store_true",
+        help="Fail benchmarks slower than their stored baseline",
+    )
+    group.addoption(
+        "--max-regression",
+        type=float,
+        default=DEFAULT_MAX_REGRESSION,
+        help="Allowed slowdown with --check-baselines, 0.25 is 25%% slower",
+    )
+
+
+class Benchmark:
+    """
+    Times a callable with timeit over a number of rounds. number is the
+    minimum number of calls per round, it is raised for fast callables so
+    every round lasts MIN_ROUND_TIME. Each round is followed by a run of
+    the reference workload, and the median of their ratios is kept so a
+    single lucky or disturbed round doesn't move the result.
+    """
+
+    def __init__(self, name, config, baselines):
+        self.name = name
+        self.config = config
+        self.baselines = baselines
+
+    def __call__(self, fn, number=10, repeat=DEFAULT_ROUNDS):
+        # The first call also warms up caches and lazy imports
+        elapsed = timeit.timeit(fn, number=number)
+        if elapsed < MIN_ROUND_TIME:
+            number = int(number * MIN_ROUND_TIME / max(elapsed, 1e-9)) + 1
+
+        timer = timeit.Timer(fn)
+        reference = timeit.Timer(_reference_workload)
+        timings = []
+        ratios = []
+        for _ in range(repeat):
+            elapsed = timer.timeit(number) / number
+            timings.append(elapsed)
+            ratios.append(elapsed / reference.timeit(1))
+
+        best = min(timings)
+        relative = statistics.median(ratios)
+        baseline = self.baselines.get(self.name)
+        results.append((self.name, best, relative, baseline))
+
+        if (
+            self.config.getoption("check_baselines")
+            and baseline is not None
+            and relative > baseline * (1 + self.config.getoption("max_regression"))
+        ):
+            pytest.fail(
+                "{} is {:.0%} slower than its baseline".format(
+                    self.name, relative / baseline - 1
+                )
+            )
+
+        return best
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    return load_baselines()
+
+
+@pytest.fixture
+def benchmark(request, baselines):
+    name = request.node.nodeid.rsplit("/", 1)[-1]
+    return Benchmark(name, request.config, baselines)
+
+
+@pytest.fixture
+def edit_form_renderer(db):
+    """
+    Returns a function building a callable that renders the edit form of a
+    page, the same way the page edit view does.
+    """
+
+    user = get_user_model().objects.create_superuser(
+        "benchmark", "benchmark@example.com", "password"
+    )
+    request = RequestFactory().get("/")
+    request.user = user
+
+    def get_renderer(page):
+        edit_handler = page.specific_class.get_edit_handler()
+        form_class = edit_handler.get_form_class()
+
+        def render():
+            form = form_class(instance=page, for_user=user)
+            panel = edit_handler.get_bound_panel(
+                instance=page, request=request, form=form
+            )
+            return panel.render_form_content()
+
+        return render
+
+    return get_renderer
+
+
+def pytest_sessionfinish(session):
+    if not results or not session.config.getoption("save_baselines"):
+        return
+
+    # Baselines of benchmarks not part of this run are kept
+    baselines = load_baselines()
+    for name, _best, relative, _baseline in results:
+        baselines[name] = float("{:.4g}".format(relative))
+
+    with open(BASELINES_PATH, "w") as fd:
+        json.dump(baselines, fd, indent=4, sort_keys=True)
+        fd.write("\n")
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not results:
+        return
+
+    terminalreporter.section("benchmarks")
+    width = max(len(name) for name, *_ in results)
+    for name, best, relative, baseline in results:
+        change = ""
+        if baseline:
+            change = "{:>+8.1%}".format(relative / baseline - 1)
+
+        terminalreporter.write_line(
+            "{}  {:>12.1f} us {}".format(name.ljust(width), best * 1000000, change)
+        )
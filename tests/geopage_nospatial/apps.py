@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class GeopageNospatialConfig(AppConfig):
     name = "tests.geopage_nospatial"
+
+    def ready(self):
+        from wagtailgeowidget.clustering import register_cluster_source
+        from wagtailgeowidget.vector_tiles import register_vector_tile_source
+
+        from .models import StandardPage
+
+        # Served by the views in tests.urls
+        register_cluster_source(StandardPage)
+        register_vector_tile_source(StandardPage, properties=["title"])
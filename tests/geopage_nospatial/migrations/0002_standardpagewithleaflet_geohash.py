@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:12
+
+from django.db import migrations
+import wagtailgeowidget.geohash
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geopage_nospatial", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="standardpagewithleaflet",
+            name="geohash",
+            field=wagtailgeowidget.geohash.GeohashField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                location_field="location",
+                max_length=12,
+                null=True,
+                precision=12,
+            ),
+        ),
+    ]
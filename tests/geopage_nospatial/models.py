@@ -4,7 +4,7 @@ from django.utils.translation import gettext as _
 from wagtail import blocks
 from wagtail.admin.panels import FieldPanel, MultiFieldPanel
 from wagtail.fields import StreamField
-from wagtail.models import Page
+from wagtail.models import Page, PageManager
 
 from wagtailgeowidget import geocoders
 from wagtailgeowidget.blocks import (
@@ -13,6 +13,7 @@ from wagtailgeowidget.blocks import (
     GoogleMapsBlock,
     LeafletBlock,
 )
+from wagtailgeowidget.geohash import GeohashField, GeohashPageQuerySet
 from wagtailgeowidget.panels import GeoAddressPanel, GoogleMapsPanel, LeafletPanel
 
 
@@ -61,6 +62,9 @@ class StandardPageWithLeaflet(Page):
         null=True,
     )
     location = models.CharField(max_length=250, blank=True, null=True)
+    geohash = GeohashField(location_field="location")
+
+    objects = PageManager.from_queryset(GeohashPageQuerySet)()
 
     content_panels = Page.content_panels + [
         MultiFieldPanel(
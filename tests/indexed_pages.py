@@ -0,0 +1,34 @@
+from django.core.cache import cache
+from wagtail.models import Page
+
+from tests.geopage_nospatial.models import StandardPage
+from wagtailgeowidget.indexes import clear_indexes
+
+STOCKHOLM = (18.0686, 59.3293)
+UPPSALA = (17.6389, 59.8586)
+LONDON = (-0.1276, 51.5072)
+
+
+class IndexedPagesMixin:
+    """
+    Starts every test with empty indexes and change logs, and adds pages
+    located at lng/lat under the root page.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        clear_indexes()
+        self.addCleanup(clear_indexes)
+
+        self.root = Page.objects.get(depth=1)
+
+    def add_page(self, title, lnglat, live=True):
+        return self.root.add_child(
+            instance=StandardPage(
+                title=title,
+                slug=title.lower(),
+                live=live,
+                location="SRID=4326;POINT({} {})".format(*lnglat),
+            )
+        )
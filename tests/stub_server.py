@@ -0,0 +1,52 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubServer:
+    """
+    Local HTTP stand-in for upstream providers, responses are produced by
+    respond(path, params, headers) returning (status, headers, body).
+    """
+
+    def __init__(self, respond, protocol_version="HTTP/1.0"):
+        self.respond = respond
+        self.protocol_version = protocol_version
+        self.requests = []
+        self.connections = set()
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = stub.protocol_version
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                stub.requests.append((url.path, params))
+                stub.connections.add(self.client_address)
+
+                status, headers, body = stub.respond(url.path, params, self.headers)
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}".format(self.server.server_port)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,67 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from wagtailgeowidget import app_settings
+from wagtailgeowidget.api_keys import clear_google_maps_api_key, get_google_maps_api_key
+from wagtailgeowidget.widgets import get_google_maps_config
+
+calls = []
+
+
+def get_apikey():
+    calls.append(1)
+    time.sleep(0.05)
+    return "key-{}".format(len(calls))
+
+
+class GoogleMapsApiKeyTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+        clear_google_maps_api_key()
+        self.addCleanup(clear_google_maps_api_key)
+
+    @override_settings(GOOGLE_MAPS_V3_APIKEY="static")
+    def test_static_key(self):
+        self.assertEqual(get_google_maps_api_key(), "static")
+
+    @override_settings(GOOGLE_MAPS_V3_APIKEY_CALLBACK="tests.test_api_keys.get_apikey")
+    def test_callback_is_cached(self):
+        self.assertEqual(get_google_maps_api_key(), "key-1")
+        self.assertEqual(get_google_maps_api_key(), "key-1")
+        self.assertIn("key=key-1&", get_google_maps_config()["googleMapsApiUrl"])
+        self.assertEqual(len(calls), 1)
+
+        expired = time.monotonic() + 301
+        with mock.patch(
+            "wagtailgeowidget.api_keys.time.monotonic", return_value=expired
+        ):
+            self.assertEqual(get_google_maps_api_key(), "key-2")
+
+    @override_settings(GOOGLE_MAPS_V3_APIKEY_CALLBACK="tests.test_api_keys.get_apikey")
+    def test_concurrent_refresh_calls_callback_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_google_maps_api_key()))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["key-1"] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_changing_settings_clears_key(self):
+        with override_settings(
+            GOOGLE_MAPS_V3_APIKEY_CALLBACK="tests.test_api_keys.get_apikey"
+        ):
+            self.assertEqual(get_google_maps_api_key(), "key-1")
+
+            with override_settings(GOOGLE_MAPS_V3_APIKEY_CACHE_TIMEOUT=0):
+                self.assertEqual(get_google_maps_api_key(), "key-2")
+
+        self.assertIsNone(app_settings.GOOGLE_MAPS_V3_APIKEY_CALLBACK)
@@ -0,0 +1,131 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from wagtail.models import Page
+
+from tests.geopage_nospatial.models import StreamPage
+from wagtailgeowidget import app_settings
+from wagtailgeowidget.block_locations import extract_locations
+from wagtailgeowidget.models import BlockLocation
+
+BODY = [
+    {"type": "map", "value": "SRID=4326;POINT(18.0686 59.3293)", "id": "a"},
+    {
+        "type": "map_struct_with_zoom",
+        "value": {
+            "address": "Uppsala",
+            "zoom": 9,
+            "map": "SRID=4326;POINT(17.6389 59.8586)",
+        },
+        "id": "b",
+    },
+    {
+        "type": "map_struct_leaflet",
+        "value": {"address": "London", "map": {"lat": 51.5072, "lng": -0.1276}},
+        "id": "c",
+    },
+    {"type": "map_leaflet", "value": "", "id": "d"},
+]
+
+
+class ExtractLocationsTestCase(TestCase):
+    def test_locations_are_extracted(self):
+        stream_block = StreamPage._meta.get_field("body").stream_block
+
+        locations = extract_locations(stream_block, BODY)
+
+        self.assertEqual(
+            [
+                (
+                    location.block_path,
+                    location.block_id,
+                    location.point.y,
+                    location.point.x,
+                    location.address,
+                    location.zoom,
+                )
+                for location in locations
+            ],
+            [
+                ("map", "a", 59.3293, 18.0686, "", None),
+                ("map_struct_with_zoom.map", "b", 59.8586, 17.6389, "Uppsala", 9),
+                ("map_struct_leaflet.map", "c", 51.5072, -0.1276, "London", None),
+            ],
+        )
+
+
+@mock.patch.object(app_settings, "GEO_WIDGET_BLOCK_LOCATIONS", True)
+class BlockLocationTestCase(TestCase):
+    def setUp(self):
+        self.root = Page.objects.get(depth=1)
+
+    def add_page(self, slug, body, live=True):
+        return self.root.add_child(
+            instance=StreamPage(title=slug, slug=slug, live=live, body=json.dumps(body))
+        )
+
+    def test_locations_follow_publishing(self):
+        page = self.add_page("page", BODY, live=False)
+        revision = page.save_revision()
+        revision.publish()
+
+        locations = BlockLocation.objects.filter(page=page).order_by("block_id")
+        self.assertEqual(
+            [(location.block_path, location.revision_id) for location in locations],
+            [
+                ("map", revision.pk),
+                ("map_struct_with_zoom.map", revision.pk),
+                ("map_struct_leaflet.map", revision.pk),
+            ],
+        )
+
+        page.body = json.dumps(BODY[:1])
+        page.save_revision().publish()
+        self.assertEqual(BlockLocation.objects.filter(page=page).count(), 1)
+
+        page.refresh_from_db()
+        page.unpublish()
+        self.assertFalse(BlockLocation.objects.filter(page=page).exists())
+
+    def test_lookups(self):
+        page = self.add_page("page", BODY, live=False)
+        page.save_revision().publish()
+
+        self.assertEqual(
+            list(
+                BlockLocation.objects.within_bbox((17.5, 59.2, 18.2, 59.9)).values_list(
+                    "address", flat=True
+                )
+            ),
+            ["", "Uppsala"],
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                BlockLocation.objects.within_distance(59.3293, 18.0686, 50000).count(),
+                1,
+            )
+        self.assertEqual(
+            list(
+                StreamPage.objects.filter(
+                    pk__in=BlockLocation.objects.within_bbox((-1, 51, 0, 52)).values(
+                        "page"
+                    )
+                )
+            ),
+            [page],
+        )
+
+    def test_update_block_locations_command(self):
+        live = self.add_page("live", BODY)
+        draft = self.add_page("draft", BODY, live=False)
+        BlockLocation.objects.create(page=draft, block_path="map", lat=0, lng=0)
+
+        out = StringIO()
+        call_command("update_block_locations", "--batch-size=1", stdout=out)
+
+        self.assertIn("geopage_nospatial.StreamPage: 1 pages updated", out.getvalue())
+        self.assertEqual(BlockLocation.objects.filter(page=live).count(), 3)
+        self.assertFalse(BlockLocation.objects.filter(page=draft).exists())
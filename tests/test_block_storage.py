@@ -0,0 +1,96 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase
+from wagtail.models import Page
+
+from tests.geopage_nospatial.models import StreamPage
+from wagtailgeowidget import app_settings
+from wagtailgeowidget.blocks import GoogleMapsBlock, get_storage_value
+
+STOCKHOLM = "SRID=4326;POINT(18.0686 59.3293)"
+
+
+class StorageValueTestCase(TestCase):
+    def test_formats(self):
+        block = GoogleMapsBlock()
+        value = block.to_python(STOCKHOLM)
+
+        self.assertEqual(get_storage_value(value, "ewkt"), STOCKHOLM)
+        self.assertEqual(
+            get_storage_value(STOCKHOLM, "object"),
+            {"lat": 59.3293, "lng": 18.0686, "srid": 4326},
+        )
+        self.assertEqual(get_storage_value(value, "array"), [18.0686, 59.3293])
+        self.assertEqual(get_storage_value([18.0686, 59.3293], "ewkt"), STOCKHOLM)
+        self.assertEqual(get_storage_value("", "array"), "")
+
+        with self.assertRaises(ImproperlyConfigured):
+            get_storage_value(value, "geojson")
+
+    def test_blocks_read_every_format(self):
+        block = GoogleMapsBlock()
+        expected = block.to_python(STOCKHOLM)
+
+        for storage in ["ewkt", "object", "array"]:
+            with mock.patch.object(app_settings, "GEO_WIDGET_BLOCK_STORAGE", storage):
+                stored = block.get_prep_value(expected)
+
+            self.assertEqual(block.to_python(stored), expected)
+            self.assertEqual(block.bulk_to_python([stored]), [expected])
+
+
+class MigrateBlockStorageTestCase(TestCase):
+    def setUp(self):
+        body = [
+            {"type": "map", "value": STOCKHOLM, "id": "a"},
+            {
+                "type": "map_struct",
+                "value": {"address": "Stockholm", "map": STOCKHOLM},
+                "id": "b",
+            },
+        ]
+        self.page = Page.objects.get(depth=1).add_child(
+            instance=StreamPage(title="Page", slug="page", body=json.dumps(body))
+        )
+        self.revision = self.page.save_revision()
+
+    def call_command(self, *args):
+        out = StringIO()
+        call_command("migrate_block_storage", "--batch-size=1", *args, stdout=out)
+        return out.getvalue()
+
+    def get_stored(self):
+        page = StreamPage.objects.get(pk=self.page.pk)
+        self.revision.refresh_from_db()
+        return (
+            list(page.body.raw_data),
+            json.loads(self.revision.content["body"]),
+        )
+
+    def test_data_and_revisions_are_rewritten(self):
+        out = self.call_command("--format=array")
+
+        self.assertIn("geopage_nospatial.StreamPage: 1 rows and 1 revisions", out)
+        for stored in self.get_stored():
+            self.assertEqual(stored[0]["value"], [18.0686, 59.3293])
+            self.assertEqual(stored[1]["value"]["map"], [18.0686, 59.3293])
+            self.assertEqual(stored[1]["value"]["address"], "Stockholm")
+
+        self.assertEqual(
+            StreamPage.objects.get(pk=self.page.pk).body[0].value.lat, 59.3293
+        )
+
+        out = self.call_command("--format=ewkt")
+
+        self.assertIn("1 rows and 1 revisions", out)
+        for stored in self.get_stored():
+            self.assertEqual(stored[0]["value"], STOCKHOLM)
+
+    def test_unchanged_data_is_skipped(self):
+        out = self.call_command("--format=ewkt", "--skip-revisions")
+
+        self.assertIn("0 rows and 0 revisions", out)
@@ -0,0 +1,82 @@
+import json
+
+from django.template import Context, Template
+from django.test import TestCase
+
+from tests.geopage_nospatial.models import StreamPage
+from wagtailgeowidget.blocks import GeoPointValue, GoogleMapsBlock, LeafletBlock
+
+STOCKHOLM = "SRID=4326;POINT(18.0686 59.3293)"
+
+
+class GeoPointValueTestCase(TestCase):
+    def test_values_are_typed(self):
+        value = GoogleMapsBlock().to_python(STOCKHOLM)
+
+        self.assertIsInstance(value, GeoPointValue)
+        self.assertEqual((value.lat, value.lng, value.srid), (59.3293, 18.0686, 4326))
+        self.assertEqual(value.ewkt, STOCKHOLM)
+        self.assertFalse(hasattr(value, "__dict__"))
+
+    def test_dict_compatibility(self):
+        value = LeafletBlock().to_python({"lat": "59.3293", "lng": "18.0686"})
+
+        self.assertEqual(value["lat"], 59.3293)
+        self.assertEqual(value.get("srid"), 4326)
+        self.assertIsNone(value.get("address"))
+        self.assertEqual(dict(value.items()), value.as_dict())
+        self.assertEqual(
+            Template("{{ value.lat }} {{ value.lng }}").render(
+                Context({"value": value})
+            ),
+            "59.3293 18.0686",
+        )
+
+        with self.assertRaises(KeyError):
+            value["address"]
+
+    def test_storage_round_trip(self):
+        for block in [GoogleMapsBlock(), LeafletBlock()]:
+            value = block.to_python(STOCKHOLM)
+
+            self.assertEqual(block.get_prep_value(value), STOCKHOLM)
+            self.assertEqual(block.to_python(block.get_prep_value(value)), value)
+            self.assertEqual(block.value_for_form(value), STOCKHOLM)
+            self.assertEqual(
+                block.get_api_representation(value),
+                {"lat": 59.3293, "lng": 18.0686, "srid": 4326},
+            )
+
+    def test_invalid_values(self):
+        with self.assertRaises(Exception):
+            LeafletBlock().to_python("POINT(18.0686 59.3293)")
+
+
+class BulkToPythonTestCase(TestCase):
+    def test_matches_to_python(self):
+        block = LeafletBlock()
+        values = [STOCKHOLM, {"lat": 51.5072, "lng": -0.1276}, STOCKHOLM]
+
+        result = block.bulk_to_python(values)
+
+        self.assertEqual(result, [block.to_python(value) for value in values])
+        # Values are immutable, so equal locations share one
+        self.assertIs(result[0], result[2])
+
+    def test_stream_values(self):
+        field = StreamPage._meta.get_field("body")
+        body = [
+            {"type": "map", "value": STOCKHOLM},
+            {
+                "type": "map_struct_with_zoom",
+                "value": {"address": "Stockholm", "zoom": 8, "map": STOCKHOLM},
+            },
+        ]
+
+        stream = field.to_python(json.dumps(body))
+
+        self.assertEqual(stream[0].value.lat, 59.3293)
+        self.assertEqual(stream[1].value["map"].lng, 18.0686)
+
+        with self.assertRaises(Exception):
+            GoogleMapsBlock().bulk_to_python([STOCKHOLM, "POINT(1 2)"])
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.test import TestCase
+from wagtail.models import Page
+
+from tests.geopage_nospatial.models import StandardPage
+from wagtailgeowidget import bulk
+
+
+class LocationColumnsTestCase(TestCase):
+    def setUp(self):
+        root = Page.objects.get(depth=1)
+        locations = [
+            "SRID=4326;POINT(18.0686 59.3293)",
+            "SRID=4326;POINT(-0.1276 51.5072)",
+            None,
+            "invalid",
+        ]
+
+        for i, location in enumerate(locations):
+            root.add_child(
+                instance=StandardPage(
+                    title="Page {}".format(i),
+                    slug="page-{}".format(i),
+                    location=location,
+                )
+            )
+
+    def test_columns_are_loaded_without_numpy(self):
+        with mock.patch.object(bulk, "np", None):
+            result = bulk.location_columns(
+                StandardPage.objects.order_by("pk"), "location", chunk_size=2
+            )
+
+        self.assertEqual(list(result["srid"]), [4326, 4326])
+        self.assertEqual(list(result["lng"]), [18.0686, -0.1276])
+        self.assertEqual(list(result["lat"]), [59.3293, 51.5072])
+
+    def test_unparseable_strings_are_skipped(self):
+        with mock.patch.object(bulk, "np", None):
+            result = bulk.location_columns(
+                StandardPage.objects.filter(location__isnull=False).order_by("pk"),
+                "location",
+            )
+
+        self.assertEqual(list(result["srid"]), [4326, 4326])
+        self.assertEqual(list(result["lng"]), [18.0686, -0.1276])
+        self.assertEqual(list(result["lat"]), [59.3293, 51.5072])
+
+    def test_columns_are_loaded_into_structured_array(self):
+        if bulk.np is None:
+            self.skipTest("NumPy is not installed")
+
+        result = bulk.location_columns(StandardPage.objects.order_by("pk"))
+
+        self.assertEqual(result.dtype.names, ("srid", "lng", "lat"))
+        self.assertEqual(result["lng"].tolist(), [18.0686, -0.1276])
+        self.assertEqual(result["lat"].tolist(), [59.3293, 51.5072])
@@ -0,0 +1,160 @@
+import json
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from tests.geopage_nospatial.models import StandardPage
+from tests.indexed_pages import LONDON, STOCKHOLM, UPPSALA, IndexedPagesMixin
+from wagtailgeowidget import indexes
+from wagtailgeowidget.clustering import (
+    ClusterIndex,
+    ClusterSource,
+    register_cluster_source,
+)
+from wagtailgeowidget.indexes import IndexedSource
+from wagtailgeowidget.views import ClusterView
+
+
+class ClusterIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = ClusterIndex()
+        self.index.add(1, *STOCKHOLM)
+        self.index.add(2, *UPPSALA)
+        self.index.add(3, *LONDON)
+
+    def test_nearby_points_are_clustered_at_low_zoom(self):
+        clusters = sorted(
+            self.index.get_clusters((-180, -85, 180, 85), 4), key=lambda c: c.count
+        )
+
+        self.assertEqual([cluster.count for cluster in clusters], [1, 2])
+        self.assertEqual(clusters[0].pk, 3)
+        self.assertIsNone(clusters[1].pk)
+        self.assertAlmostEqual(clusters[1].lng, (STOCKHOLM[0] + UPPSALA[0]) / 2)
+        self.assertTrue(UPPSALA[1] > clusters[1].lat > STOCKHOLM[1])
+
+    def test_points_are_returned_on_their_own_above_max_zoom(self):
+        clusters = self.index.get_clusters((17, 59, 19, 60), 17)
+
+        self.assertEqual(sorted(cluster.pk for cluster in clusters), [1, 2])
+        self.assertTrue(all(cluster.count == 1 for cluster in clusters))
+
+    def test_removed_points_leave_their_cluster(self):
+        self.index.remove(2)
+        (cluster,) = self.index.get_clusters((17, 59, 19, 60), 4)
+
+        self.assertEqual(cluster.count, 1)
+        self.assertEqual(cluster.pk, 1)
+        self.assertAlmostEqual(cluster.lng, STOCKHOLM[0])
+        self.assertAlmostEqual(cluster.lat, STOCKHOLM[1])
+
+    def test_bbox_past_the_antimeridian(self):
+        clusters = self.index.get_clusters((170, 40, 380, 70), 8)
+
+        self.assertEqual(sorted(cluster.pk for cluster in clusters), [1, 2, 3])
+
+
+@override_settings(ROOT_URLCONF="tests.urls")
+class ClusterViewTestCase(IndexedPagesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.stockholm = self.add_page("Stockholm", STOCKHOLM)
+        self.add_page("London", LONDON)
+        self.add_page("Draft", UPPSALA, live=False)
+
+    def get(self, **params):
+        url = reverse("clusters")
+        request = RequestFactory().get(url, params)
+        response = resolve(url).func(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_live_pages_are_clustered(self):
+        status, data = self.get(bbox="-180,-85,180,85", zoom=2)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data["type"], "FeatureCollection")
+        self.assertEqual(
+            sorted(feature.get("id") for feature in data["features"]),
+            sorted(page.pk for page in StandardPage.objects.live()),
+        )
+
+    def test_index_follows_publishing(self):
+        self.get(bbox="-180,-85,180,85", zoom=2)
+        source = register_cluster_source(StandardPage)
+        index = source._index
+
+        draft = StandardPage.objects.get(slug="draft")
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.save_revision().publish()
+            self.stockholm.unpublish()
+
+        status, data = self.get(bbox="17,59,19,60", zoom=18)
+
+        # The changes were replayed on the existing index
+        self.assertIs(source._index, index)
+        self.assertEqual([feature["id"] for feature in data["features"]], [draft.pk])
+
+    def test_changes_are_recorded_on_commit(self):
+        self.get(bbox="-180,-85,180,85", zoom=2)
+        source = register_cluster_source(StandardPage)
+        version = source.get_version()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.stockholm.unpublish()
+
+        # Not visible to other processes until the transaction commits
+        self.assertEqual(source.get_version(), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(source.get_version(), version + 1)
+
+    def test_version_is_read_once_per_interval(self):
+        source = register_cluster_source(StandardPage)
+        version = source.get_version()
+
+        # Recorded by another process
+        source.cache.set(source.get_cache_key("version"), version + 5)
+        self.assertEqual(source.get_version(), version)
+
+        with mock.patch.object(indexes, "VERSION_CHECK_INTERVAL", 0):
+            self.assertEqual(source.get_version(), version + 5)
+
+    def test_sources_must_implement_the_index(self):
+        class IncompleteSource(IndexedSource):
+            def create_index(self):
+                return ClusterIndex()
+
+        with self.assertRaises(TypeError):
+            IncompleteSource(StandardPage)
+
+    def test_queryset_sources_read_the_saved_location(self):
+        source = ClusterSource(
+            StandardPage, queryset=StandardPage.objects.filter(slug="stockholm")
+        )
+
+        with mock.patch.object(source, "record_change") as record_change:
+            with self.captureOnCommitCallbacks(execute=True):
+                source.update(self.stockholm)
+                source.update(StandardPage.objects.get(slug="london"))
+
+        self.assertEqual(
+            record_change.call_args_list,
+            [
+                mock.call(self.stockholm.pk, *STOCKHOLM, ()),
+                mock.call(StandardPage.objects.get(slug="london").pk, None, None),
+            ],
+        )
+
+    def test_views_require_registered_sources(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ClusterView.as_view(model=StandardPage, location_field="address")
+
+    def test_invalid_parameters(self):
+        status, data = self.get(bbox="1,2,3", zoom=2)
+        self.assertEqual(status, 400)
+
+        status, data = self.get(bbox="1,2,3,4", zoom="x")
+        self.assertEqual(status, 400)
@@ -0,0 +1,235 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from wagtail.models import Page
+
+from tests.geopage_nospatial.models import StandardPageWithLeaflet
+from tests.stub_server import StubServer
+from wagtailgeowidget import app_settings, geocoders
+from wagtailgeowidget.tiles import count_tiles_in_bbox
+
+
+def nominatim_response(path, params, headers):
+    if params["q"] == "nowhere":
+        return 200, {}, "[]"
+
+    if params["q"] == "unavailable":
+        return 503, {}, ""
+
+    return 200, {}, json.dumps([{"lat": "59.3293", "lon": "18.0686"}])
+
+
+@mock.patch.dict(
+    app_settings.GEO_WIDGET_GEOCODER_RATE_LIMITS, {geocoders.NOMINATIM: 1000}
+)
+class GeocodeAddressesTestCase(TestCase):
+    def setUp(self):
+        root = Page.objects.get(depth=1)
+        rows = [
+            ("Stockholm", None),
+            ("nowhere", None),
+            ("", None),
+            ("Gothenburg", "SRID=4326;POINT(11.9746 57.7089)"),
+        ]
+
+        self.pages = []
+        for i, (address, location) in enumerate(rows):
+            self.pages.append(
+                root.add_child(
+                    instance=StandardPageWithLeaflet(
+                        title="Page {}".format(i),
+                        slug="page-{}".format(i),
+                        address=address,
+                        location=location,
+                    )
+                )
+            )
+
+    def call_command(self, *args, respond=nominatim_response):
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_NOMINATIM_URL", upstream.url
+        ):
+            call_command(
+                "geocode_addresses",
+                "--model=geopage_nospatial.StandardPageWithLeaflet",
+                "--batch-size=1",
+                *args,
+                stdout=StringIO(),
+                stderr=StringIO(),
+            )
+
+        return upstream
+
+    def test_empty_locations_are_geocoded(self):
+        upstream = self.call_command()
+
+        locations = [
+            StandardPageWithLeaflet.objects.get(pk=page.pk).location
+            for page in self.pages
+        ]
+
+        self.assertEqual(
+            locations,
+            [
+                "SRID=4326;POINT(18.0686 59.3293)",
+                None,
+                None,
+                "SRID=4326;POINT(11.9746 57.7089)",
+            ],
+        )
+        self.assertEqual(
+            sorted(params["q"] for path, params in upstream.requests),
+            ["Stockholm", "nowhere"],
+        )
+
+    def test_runs_are_resumed_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, "checkpoint.json")
+
+            self.call_command("--checkpoint", checkpoint)
+            upstream = self.call_command("--checkpoint", checkpoint)
+
+            with open(checkpoint) as fd:
+                data = json.load(fd)
+
+        self.assertEqual(upstream.requests, [])
+        self.assertEqual(
+            data,
+            {
+                "geopage_nospatial.standardpagewithleaflet.location": {
+                    "last_pk": self.pages[1].pk,
+                    "failed": [],
+                }
+            },
+        )
+
+    def test_failed_rows_are_retried(self):
+        page = self.pages[0]
+        page.address = "unavailable"
+        page.save()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, "checkpoint.json")
+
+            self.call_command("--checkpoint", checkpoint)
+            self.assertIsNone(StandardPageWithLeaflet.objects.get(pk=page.pk).location)
+
+            def recovered(path, params, headers):
+                params = {**params, "q": params["q"].replace("unavailable", "x")}
+                return nominatim_response(path, params, headers)
+
+            upstream = self.call_command("--checkpoint", checkpoint, respond=recovered)
+
+        self.assertEqual(
+            [params["q"] for path, params in upstream.requests], ["unavailable"]
+        )
+        self.assertEqual(
+            StandardPageWithLeaflet.objects.get(pk=page.pk).location,
+            "SRID=4326;POINT(18.0686 59.3293)",
+        )
+
+    def test_revisions_and_geohashes_are_updated(self):
+        page = self.pages[0]
+        page.save_revision().publish()
+
+        self.call_command()
+
+        page = StandardPageWithLeaflet.objects.get(pk=page.pk)
+        self.assertEqual(page.geohash, "u6sce0t4hzhe")
+        self.assertEqual(
+            page.latest_revision.as_object().location,
+            "SRID=4326;POINT(18.0686 59.3293)",
+        )
+
+        # Publishing the revision again keeps the location
+        page.latest_revision.publish()
+        self.assertEqual(
+            StandardPageWithLeaflet.objects.get(pk=page.pk).location,
+            "SRID=4326;POINT(18.0686 59.3293)",
+        )
+
+
+def tile_response(path, params, headers):
+    return 200, {"Content-Type": "image/png"}, b"tile"
+
+
+class SeedGeoTilesTestCase(TestCase):
+    bbox = (17.9, 59.2, 18.2, 59.4)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def call_command(self, *args):
+        self.stdout = StringIO()
+        with StubServer(tile_response) as upstream, mock.patch.multiple(
+            app_settings,
+            GEO_WIDGET_TILE_PROXY=True,
+            GEO_WIDGET_TILE_CACHE_DIR=os.path.join(self.tmp_dir.name, "tiles"),
+            GEO_WIDGET_LEAFLET_TILE_LAYER=upstream.url + "/{z}/{x}/{y}.png",
+        ):
+            call_command(
+                "seed_geo_tiles",
+                "--bbox={}".format(",".join(str(value) for value in self.bbox)),
+                "--max-zoom=8",
+                "--rate=1000",
+                "--batch-size=5",
+                *args,
+                stdout=self.stdout,
+                stderr=StringIO(),
+            )
+
+        return upstream
+
+    def test_tile_pyramid_is_fetched_once(self):
+        upstream = self.call_command()
+        second_run = self.call_command()
+
+        self.assertEqual(len(upstream.requests), count_tiles_in_bbox(self.bbox, 0, 8))
+        self.assertEqual(
+            len(set(path for path, params in upstream.requests)),
+            len(upstream.requests),
+        )
+        self.assertIn("/8/140/75.png", [path for path, params in upstream.requests])
+        self.assertEqual(second_run.requests, [])
+
+    def test_runs_are_resumed_from_checkpoint(self):
+        checkpoint = os.path.join(self.tmp_dir.name, "checkpoint.json")
+        self.call_command("--checkpoint", checkpoint)
+        shutil.rmtree(os.path.join(self.tmp_dir.name, "tiles"))
+
+        upstream = self.call_command("--checkpoint", checkpoint)
+        other_area = self.call_command("--checkpoint", checkpoint, "--max-zoom=4")
+
+        self.assertEqual(upstream.requests, [])
+        self.assertEqual(len(other_area.requests), count_tiles_in_bbox(self.bbox, 0, 4))
+
+    def test_summary_counts_the_tiles_seeded_by_the_run(self):
+        checkpoint = os.path.join(self.tmp_dir.name, "checkpoint.json")
+        total = count_tiles_in_bbox(self.bbox, 0, 8)
+        self.call_command("--checkpoint", checkpoint)
+        self.assertIn("{} tiles seeded, 0 failed".format(total), self.stdout.getvalue())
+
+        self.call_command("--checkpoint", checkpoint)
+        self.assertIn(
+            "0 tiles seeded, 0 failed, {} seeded by an earlier run".format(total),
+            self.stdout.getvalue(),
+        )
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            self.call_command("--rate=0")
+
+    def test_invalid_bbox_is_refused(self):
+        with self.assertRaises(CommandError):
+            self.call_command("--bbox=18.2,59.2,17.9,59.4")
+
+    def test_large_areas_are_refused(self):
+        with self.assertRaises(CommandError):
+            self.call_command("--max-tiles=5")
@@ -0,0 +1,247 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from tests.stub_server import StubServer
+from wagtailgeowidget import app_settings, geocoders
+from wagtailgeowidget.geocoders import GeocoderError, get_geocoder
+from wagtailgeowidget.upstream import (
+    ConnectionPool,
+    RateLimiter,
+    SingleFlight,
+    UpstreamError,
+    get_rate_limiter,
+)
+
+
+class RateLimiterTestCase(SimpleTestCase):
+    def test_requests_above_rate_are_delayed(self):
+        limiter = RateLimiter(rate=20, burst=2)
+
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        elapsed = time.monotonic() - start
+
+        # Two requests fit the burst, the remaining two wait 1/20s each
+        self.assertGreaterEqual(elapsed, 0.09)
+
+    def test_rates_must_be_positive(self):
+        for rate in (0, -1, float("nan")):
+            with self.assertRaises(ValueError):
+                RateLimiter(rate)
+
+        with self.assertRaises(ValueError):
+            RateLimiter(1, burst=0)
+
+        with self.assertRaises(ValueError):
+            get_rate_limiter("test-positive", 1).configure(0, 1)
+
+    def test_shared_limiters_follow_rate_changes(self):
+        limiter = get_rate_limiter("test", 1)
+
+        self.assertIs(get_rate_limiter("test", 5, burst=2), limiter)
+        self.assertEqual((limiter.rate, limiter.burst), (5, 2))
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    def test_concurrent_calls_are_coalesced(self):
+        single_flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight.do("a", fn)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 5)
+
+    def test_errors_are_shared_and_not_kept(self):
+        single_flight = SingleFlight()
+
+        def fn():
+            raise ValueError("error")
+
+        with self.assertRaises(ValueError):
+            single_flight.do("a", fn)
+
+        self.assertEqual(single_flight.do("a", lambda: "ok"), "ok")
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def test_connections_are_reused(self):
+        pool = ConnectionPool()
+
+        with StubServer(
+            lambda *args: (200, {}, "ok"), protocol_version="HTTP/1.1"
+        ) as upstream:
+            for _ in range(3):
+                response = pool.request("GET", upstream.url + "/", params={"a": 1})
+            pool.clear()
+
+        self.assertEqual(response.body, b"ok")
+        self.assertEqual(len(upstream.requests), 3)
+        self.assertEqual(len(upstream.connections), 1)
+
+    def test_truncated_bodies_raise_upstream_error(self):
+        pool = ConnectionPool()
+
+        # The declared length is sent before the actual one and wins
+        with StubServer(
+            lambda *args: (200, {"Content-Length": "100"}, "ok")
+        ) as upstream:
+            with self.assertRaises(UpstreamError):
+                pool.request("GET", upstream.url + "/")
+
+
+@mock.patch.dict(
+    app_settings.GEO_WIDGET_GEOCODER_RATE_LIMITS,
+    {geocoders.GOOGLE_MAPS: 1000, geocoders.MAPBOX: 1000},
+)
+class GeocoderTestCase(SimpleTestCase):
+    def test_google_maps_results_are_normalized(self):
+        def respond(path, params, headers):
+            return (
+                200,
+                {},
+                json.dumps(
+                    {
+                        "status": "OK",
+                        "results": [
+                            {
+                                "geometry": {"location": {"lat": 59.3, "lng": 18.1}},
+                                "formatted_address": "Stockholm",
+                            }
+                        ],
+                    }
+                ),
+            )
+
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_GOOGLE_MAPS_URL", upstream.url
+        ):
+            results = get_geocoder(geocoders.GOOGLE_MAPS_PLACES_NEW).geocode("sthlm")
+
+        self.assertEqual(results, [{"lat": 59.3, "lng": 18.1, "address": "Stockholm"}])
+        self.assertEqual(upstream.requests[0][0], "/maps/api/geocode/json")
+        self.assertEqual(upstream.requests[0][1]["address"], "sthlm")
+
+    def test_google_maps_errors_are_raised(self):
+        def respond(path, params, headers):
+            return 200, {}, json.dumps({"status": "REQUEST_DENIED"})
+
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_GOOGLE_MAPS_URL", upstream.url
+        ):
+            with self.assertRaises(GeocoderError):
+                get_geocoder(geocoders.GOOGLE_MAPS).geocode("sthlm")
+
+    def test_malformed_responses_raise_geocoder_error(self):
+        responses = {
+            "/maps/api/geocode/json": {"results": []},
+            "/search/geocode/v6/forward": {"features": [{"properties": {}}]},
+        }
+
+        def respond(path, params, headers):
+            return 200, {}, json.dumps(responses[path])
+
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_GOOGLE_MAPS_URL", upstream.url
+        ), mock.patch.object(app_settings, "GEO_WIDGET_MAPBOX_URL", upstream.url):
+            with self.assertRaises(GeocoderError):
+                get_geocoder(geocoders.GOOGLE_MAPS).geocode("sthlm")
+
+            with self.assertRaises(GeocoderError):
+                get_geocoder(geocoders.MAPBOX).geocode("sthlm")
+
+    def test_unexpected_payload_types_raise_geocoder_error(self):
+        def respond(path, params, headers):
+            return 200, {}, json.dumps({"error": "Unable to geocode"})
+
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_NOMINATIM_URL", upstream.url
+        ):
+            with self.assertRaises(GeocoderError):
+                get_geocoder(geocoders.NOMINATIM).geocode("sthlm")
+
+    def test_programming_errors_are_not_reported_as_provider_errors(self):
+        def respond(path, params, headers):
+            return 200, {}, json.dumps([])
+
+        geocoder = get_geocoder(geocoders.NOMINATIM)
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_NOMINATIM_URL", upstream.url
+        ), mock.patch.object(geocoder, "parse", side_effect=AttributeError):
+            with self.assertRaises(AttributeError):
+                geocoder.geocode("sthlm")
+
+    def test_mapbox_results_are_normalized(self):
+        def respond(path, params, headers):
+            feature = {
+                "geometry": {"coordinates": [18.1, 59.3]},
+                "properties": {"full_address": "Stockholm"},
+            }
+            return 200, {}, json.dumps({"features": [feature]})
+
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_MAPBOX_URL", upstream.url
+        ):
+            results = get_geocoder(geocoders.MAPBOX).geocode("sthlm")
+
+        self.assertEqual(results, [{"lat": 59.3, "lng": 18.1, "address": "Stockholm"}])
+
+    def test_google_maps_reverse(self):
+        def respond(path, params, headers):
+            if params["latlng"] == "0,0":
+                return 200, {}, json.dumps({"status": "ZERO_RESULTS"})
+
+            results = [{"formatted_address": "Drottninggatan 1, Stockholm"}]
+            return 200, {}, json.dumps({"status": "OK", "results": results})
+
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_GOOGLE_MAPS_URL", upstream.url
+        ):
+            geocoder = get_geocoder(geocoders.GOOGLE_MAPS)
+
+            self.assertEqual(
+                geocoder.reverse(59.3293, 18.0686), "Drottninggatan 1, Stockholm"
+            )
+            self.assertEqual(geocoder.reverse(0, 0), "")
+
+        self.assertEqual(upstream.requests[0][1]["latlng"], "59.3293,18.0686")
+
+    def test_mapbox_reverse(self):
+        def respond(path, params, headers):
+            feature = {"properties": {"full_address": "Drottninggatan 1, Stockholm"}}
+            return 200, {}, json.dumps({"features": [feature]})
+
+        with StubServer(respond) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_MAPBOX_URL", upstream.url
+        ):
+            address = get_geocoder(geocoders.MAPBOX).reverse(59.3293, 18.0686)
+
+        self.assertEqual(address, "Drottninggatan 1, Stockholm")
+        self.assertEqual(upstream.requests[0][0], "/search/geocode/v6/reverse")
+        self.assertEqual(upstream.requests[0][1]["longitude"], "18.0686")
+
+    def test_unknown_geocoder_raises_error(self):
+        with self.assertRaises(GeocoderError):
+            get_geocoder("unknown")
@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.test import TestCase
+from wagtail.models import Page
+
+from tests.geopage_nospatial.models import StandardPageWithLeaflet
+from wagtailgeowidget import helpers
+from wagtailgeowidget.geohash import get_geohash_ranges, next_prefix, update_geohashes
+from wagtailgeowidget.helpers import (
+    geohash_bounds,
+    geohash_decode,
+    geohash_encode,
+    geohash_encode_many,
+)
+
+STOCKHOLM = (59.3293, 18.0686)
+UPPSALA = (59.8586, 17.6389)
+LONDON = (51.5072, -0.1276)
+
+
+class GeohashTestCase(TestCase):
+    def test_encode(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geohash_encode(*LONDON, precision=6), "gcpvj0")
+        self.assertEqual(geohash_encode(-90, -180, 4), "0000")
+        self.assertEqual(geohash_encode(90, 180, 4), "zzzz")
+
+    def test_decode(self):
+        lat, lng = geohash_decode("u4pruydqqvj")
+
+        self.assertAlmostEqual(lat, 57.64911, places=5)
+        self.assertAlmostEqual(lng, 10.40744, places=5)
+        self.assertEqual(geohash_bounds("u"), (0.0, 45.0, 45.0, 90.0))
+
+        with self.assertRaises(ValueError):
+            geohash_bounds("abc")
+
+    def test_encode_many(self):
+        lats, lngs = zip(STOCKHOLM, UPPSALA, LONDON)
+        expected = [geohash_encode(lat, lng, 9) for lat, lng in zip(lats, lngs)]
+
+        with mock.patch.object(helpers, "np", None):
+            self.assertEqual(geohash_encode_many(lats, lngs, 9), expected)
+
+        if helpers.np is not None:
+            self.assertEqual(geohash_encode_many(lats, lngs, 9), expected)
+
+    def test_ranges_cover_bbox(self):
+        ranges = get_geohash_ranges((17.5, 59.2, 18.2, 59.9))
+        geohash = geohash_encode(*STOCKHOLM)
+
+        self.assertLessEqual(len(ranges), 32)
+        self.assertTrue(any(start <= geohash < end for start, end in ranges))
+        self.assertFalse(
+            any(start <= geohash_encode(*LONDON) < end for start, end in ranges)
+        )
+
+    def test_next_prefix(self):
+        self.assertEqual(next_prefix("u4p"), "u4q")
+        self.assertEqual(next_prefix("u4z"), "u5")
+        self.assertIsNone(next_prefix("zz"))
+
+
+class GeohashFieldTestCase(TestCase):
+    def setUp(self):
+        root = Page.objects.get(depth=1)
+        for title, (lat, lng) in [
+            ("Stockholm", STOCKHOLM),
+            ("Uppsala", UPPSALA),
+            ("London", LONDON),
+        ]:
+            root.add_child(
+                instance=StandardPageWithLeaflet(
+                    title=title,
+                    slug=title.lower(),
+                    location="SRID=4326;POINT({} {})".format(lng, lat),
+                )
+            )
+
+    def titles(self, queryset):
+        return sorted(queryset.values_list("title", flat=True))
+
+    def test_geohash_follows_location(self):
+        page = StandardPageWithLeaflet.objects.get(slug="london")
+        self.assertEqual(page.geohash, geohash_encode(*LONDON))
+
+        page.location = None
+        page.save()
+        page.refresh_from_db()
+
+        self.assertIsNone(page.geohash)
+
+    def test_within_bbox(self):
+        pages = StandardPageWithLeaflet.objects.within_bbox((17.5, 59.2, 18.2, 59.5))
+
+        self.assertEqual(self.titles(pages), ["Stockholm"])
+
+    def test_within_distance(self):
+        pages = StandardPageWithLeaflet.objects.within_distance(*STOCKHOLM, 70000)
+        self.assertEqual(self.titles(pages), ["Stockholm", "Uppsala"])
+
+        pages = StandardPageWithLeaflet.objects.within_distance(*STOCKHOLM, 50000)
+        self.assertEqual(self.titles(pages), ["Stockholm"])
+
+    def test_lookups_are_filtered_in_the_database(self):
+        with self.assertNumQueries(0):
+            pages = StandardPageWithLeaflet.objects.within_distance(*STOCKHOLM, 70000)
+
+        # Rows with a stale geohash and no location are left out
+        StandardPageWithLeaflet.objects.filter(slug="uppsala").update(location="")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.titles(pages), ["Stockholm"])
+
+    def test_update_geohashes(self):
+        StandardPageWithLeaflet.objects.update(geohash=None)
+
+        updated = update_geohashes(StandardPageWithLeaflet.objects.all())
+
+        self.assertEqual(updated, 3)
+        self.assertEqual(
+            StandardPageWithLeaflet.objects.get(slug="uppsala").geohash,
+            geohash_encode(*UPPSALA),
+        )
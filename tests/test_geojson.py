@@ -0,0 +1,136 @@
+import json
+import unittest
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+from wagtail.models import Page
+
+from tests.geopage_nospatial.models import StandardPage
+from wagtailgeowidget import geojson
+from wagtailgeowidget.geojson import dumps_geojson
+
+try:
+    from django.contrib.gis.gdal import HAS_GDAL
+except Exception:  # NOQA
+    HAS_GDAL = False
+
+
+@override_settings(ROOT_URLCONF="tests.urls")
+class GeoJSONViewTestCase(TestCase):
+    def setUp(self):
+        root = Page.objects.get(depth=1)
+        pages = [
+            ("Stockholm", "SRID=4326;POINT(18.0686 59.3293)", True),
+            ("London", "SRID=4326;POINT(-0.1276 51.5072)", True),
+            ("Tokyo", "SRID=4326;POINT(139.6917 35.6895)", True),
+            ("Empty", None, True),
+            ("Draft", "SRID=4326;POINT(17.6389 59.8586)", False),
+        ]
+
+        self.pages = {}
+        for title, location, live in pages:
+            page = root.add_child(
+                instance=StandardPage(
+                    title=title,
+                    slug=title.lower(),
+                    address="{} address".format(title),
+                    location=location,
+                    live=live,
+                )
+            )
+            if live:
+                page.save_revision().publish()
+            self.pages[title] = page
+
+    def get(self, **params):
+        headers = params.pop("headers", {})
+        url = reverse("geojson")
+        request = RequestFactory().get(url, params, headers=headers)
+        return resolve(url).func(request)
+
+    def get_features(self, **params):
+        response = self.get(**params)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["type"], "FeatureCollection")
+        return data["features"]
+
+    def test_live_locations_are_streamed(self):
+        features = self.get_features()
+
+        self.assertEqual(
+            sorted(feature["properties"]["title"] for feature in features),
+            ["London", "Stockholm", "Tokyo"],
+        )
+        stockholm = next(f for f in features if f["id"] == self.pages["Stockholm"].pk)
+        self.assertEqual(stockholm["geometry"]["coordinates"], [18.0686, 59.3293])
+        self.assertEqual(
+            stockholm["properties"],
+            {"title": "Stockholm", "address": "Stockholm address"},
+        )
+
+    def test_bbox_and_property_selection(self):
+        features = self.get_features(bbox="-10,50,20,60", properties="title")
+
+        self.assertEqual(
+            sorted(feature["properties"]["title"] for feature in features),
+            ["London", "Stockholm"],
+        )
+        self.assertEqual(list(features[0]["properties"]), ["title"])
+
+        # Panned past the antimeridian
+        features = self.get_features(bbox="130,30,380,40")
+        self.assertEqual([f["properties"]["title"] for f in features], ["Tokyo"])
+
+    def test_unknown_properties_are_rejected(self):
+        response = self.get(properties="title,password")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_revalidation(self):
+        response = self.get()
+        etag = response["ETag"]
+
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertEqual(self.get(headers={"if_none_match": etag}).status_code, 304)
+
+        self.pages["Tokyo"].unpublish()
+
+        self.assertEqual(self.get(headers={"if_none_match": etag}).status_code, 200)
+
+    def test_dumps_geojson(self):
+        data = json.loads(
+            dumps_geojson(
+                StandardPage.objects.live(), chunk_size=1, properties=["slug"]
+            )
+        )
+
+        self.assertEqual(len(data["features"]), 3)
+        self.assertEqual(data["features"][0]["type"], "Feature")
+
+    def test_untransformable_locations_are_skipped(self):
+        StandardPage.objects.filter(pk=self.pages["Stockholm"].pk).update(
+            location="SRID=999999;POINT(2011387.35 8251904.23)"
+        )
+
+        with self.assertLogs(geojson.logger, "WARNING") as logs:
+            features = self.get_features()
+
+        self.assertEqual(
+            sorted(f["id"] for f in features),
+            sorted([self.pages["London"].pk, self.pages["Tokyo"].pk]),
+        )
+        self.assertIn("Skipped 1 ", logs.output[0])
+
+    @unittest.skipUnless(HAS_GDAL, "Transforming locations requires GDAL")
+    def test_locations_are_transformed_to_wgs84(self):
+        StandardPage.objects.filter(pk=self.pages["Stockholm"].pk).update(
+            location="SRID=3857;POINT(2011387.35 8251904.23)"
+        )
+
+        features = self.get_features()
+
+        stockholm = next(f for f in features if f["id"] == self.pages["Stockholm"].pk)
+        lng, lat = stockholm["geometry"]["coordinates"]
+        self.assertAlmostEqual(lng, 18.0686, places=3)
+        self.assertAlmostEqual(lat, 59.3293, places=3)
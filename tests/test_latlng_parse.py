@@ -1,8 +1,14 @@
+import math
 from typing import Dict, cast
 
 from django.test import SimpleTestCase
 
-from wagtailgeowidget.helpers import geosgeometry_str_to_struct
+from wagtailgeowidget.helpers import (
+    ParsedPoint,
+    geosgeometry_str_to_struct,
+    parse_geosgeometry,
+    parse_many,
+)
 
 
 class LatLngParseTestCase(SimpleTestCase):
@@ -34,3 +40,72 @@ class LatLngParseTestCase(SimpleTestCase):
         self.assertEqual(struct["srid"], "5432")
         self.assertEqual(struct["x"], "12.0")
         self.assertEqual(struct["y"], "-13.0")
+
+
+class ParseGeosgeometryTestCase(SimpleTestCase):
+    def test_that_values_are_typed(self):
+        point = parse_geosgeometry("SRID=5432;POINT(12.0 -13.0)")
+
+        self.assertEqual(point, ParsedPoint(srid=5432, x=12.0, y=-13.0))
+        self.assertIsInstance(point.srid, int)
+        self.assertIsInstance(point.x, float)
+
+    def test_parsed_points_are_memoized(self):
+        value = "SRID=4326;POINT(18.0686 59.3293)"
+
+        self.assertIs(parse_geosgeometry(value), parse_geosgeometry(value))
+
+    def test_none_is_returned_on_invalid_values(self):
+        self.assertIsNone(parse_geosgeometry("S=5432_P(12.0 13.0)"))
+        self.assertIsNone(parse_geosgeometry("SRID=5432;POINT(12.0.1 13.0)"))
+        self.assertIsNone(parse_geosgeometry("SRID=5432;POINT(12.0 13.0) "))
+        self.assertIsNone(parse_geosgeometry(None))
+
+    def test_scanner_matches_legacy_pattern(self):
+        from wagtailgeowidget.helpers import geos_ptrn
+
+        values = [
+            "SRID=4326;POINT(18.0686 59.3293)",
+            "SRID=4326;POINT (18.0686 59.3293)",
+            "SRID=4326;POINT(18.0686  59.3293)",
+            "SRID=4326;POINT(-.5 -.)",
+            "SRID=4326;POINT(1 2)\n",
+            "SRID=;POINT(1 2)",
+            "SRID=4326;POINT(- 2)",
+            "SRID=4326;POINT(1 2",
+        ]
+
+        for value in values:
+            match = geos_ptrn.match(value)
+            expected = (
+                {
+                    "srid": match.group(1),
+                    "x": match.group(2),
+                    "y": match.group(3),
+                }
+                if match
+                else None
+            )
+
+            self.assertEqual(geosgeometry_str_to_struct(value), expected, value)
+
+    def test_unhashable_values_are_not_parsed(self):
+        self.assertIsNone(parse_geosgeometry({"a": 1}))
+        self.assertIsNone(parse_geosgeometry(["SRID=4326;POINT(12.0 13.0)"]))
+
+    def test_parse_many_returns_columns(self):
+        srids, xs, ys = parse_many(
+            [
+                "SRID=4326;POINT(12.0 13.0)",
+                "invalid",
+                "SRID=3857;POINT(14.5 -15.5)",
+            ]
+        )
+
+        self.assertEqual(list(srids), [4326, 0, 3857])
+        self.assertEqual(xs[0], 12.0)
+        self.assertTrue(math.isnan(xs[1]))
+        self.assertEqual(xs[2], 14.5)
+        self.assertEqual(ys[0], 13.0)
+        self.assertTrue(math.isnan(ys[1]))
+        self.assertEqual(ys[2], -15.5)
@@ -0,0 +1,110 @@
+import random
+
+from django.test import TestCase
+
+from tests.geopage_nospatial.models import StandardPage
+from tests.indexed_pages import LONDON, STOCKHOLM, IndexedPagesMixin
+from wagtailgeowidget.helpers import distance
+from wagtailgeowidget.spatial_index import SpatialIndex, register_spatial_index
+
+
+class SpatialIndexTestCase(TestCase):
+    def setUp(self):
+        rng = random.Random(4)
+        self.points = {
+            pk: (rng.uniform(-180, 180), rng.uniform(-80, 80)) for pk in range(2000)
+        }
+        self.index = SpatialIndex(leaf_size=8)
+        for pk, (lng, lat) in self.points.items():
+            self.index.add(pk, lng, lat)
+
+    def brute_force_bbox(self, min_lng, min_lat, max_lng, max_lat):
+        return sorted(
+            pk
+            for pk, (lng, lat) in self.points.items()
+            if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat
+        )
+
+    def brute_force_nearest(self, lat, lng, k):
+        return sorted(
+            self.points,
+            key=lambda pk: distance(lat, lng, self.points[pk][1], self.points[pk][0]),
+        )[:k]
+
+    def test_bbox(self):
+        bbox = (-20, -10, 40, 30)
+
+        self.assertEqual(sorted(self.index.in_bbox(bbox)), self.brute_force_bbox(*bbox))
+
+    def test_bbox_past_the_antimeridian(self):
+        self.assertEqual(
+            sorted(self.index.in_bbox((170, 0, 200, 10))),
+            sorted(
+                self.brute_force_bbox(170, 0, 180, 10)
+                + self.brute_force_bbox(-180, 0, -160, 10)
+            ),
+        )
+
+    def test_nearest(self):
+        for lat, lng in [(59.3, 18.1), (-33.9, 151.2), (0, 179.9)]:
+            result = self.index.nearest(lat, lng, k=5)
+
+            self.assertEqual(
+                [pk for pk, _meters in result], self.brute_force_nearest(lat, lng, 5)
+            )
+            self.assertEqual(
+                [meters for _pk, meters in result],
+                sorted(meters for _pk, meters in result),
+            )
+
+    def test_nearest_within_max_distance(self):
+        self.index.add("here", 18.1, 59.3)
+
+        self.assertEqual(
+            self.index.nearest(59.3, 18.1, k=3, max_distance=1000), [("here", 0.0)]
+        )
+
+    def test_changes_are_patched_in(self):
+        tree = self.index.get_tree()
+
+        self.index.remove(1)
+        self.index.add(2, 18.1, 59.3)
+        self.index.add(5000, 18.2, 59.3)
+        del self.points[1]
+        self.points[2] = (18.1, 59.3)
+        self.points[5000] = (18.2, 59.3)
+
+        bbox = (0, 50, 30, 70)
+        self.assertEqual(sorted(self.index.in_bbox(bbox)), self.brute_force_bbox(*bbox))
+        self.assertEqual(self.index.nearest(59.3, 18.1)[0][0], 2)
+        self.assertIs(self.index.get_tree(), tree)
+
+    def test_tree_is_rebuilt_after_many_changes(self):
+        tree = self.index.get_tree()
+
+        for pk in range(300):
+            self.index.remove(pk)
+
+        self.assertIsNot(self.index.get_tree(), tree)
+        self.assertEqual(len(self.index.get_tree()), 1700)
+
+
+class SpatialIndexSourceTestCase(IndexedPagesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.stockholm = self.add_page("Stockholm", STOCKHOLM)
+        self.london = self.add_page("London", LONDON)
+
+    def test_lookups_follow_publishing(self):
+        source = register_spatial_index(StandardPage)
+
+        self.assertEqual(source.nearest(59.8586, 17.6389)[0][0], self.stockholm.pk)
+        self.assertEqual(source.in_bbox((-1, 51, 0, 52)), [self.london.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stockholm.unpublish()
+            self.london.location = "SRID=4326;POINT(17.6389 59.8586)"
+            self.london.save_revision().publish()
+
+        self.assertEqual(source.nearest(59.8586, 17.6389), [(self.london.pk, 0.0)])
+        self.assertEqual(source.in_bbox((-1, 51, 0, 52)), [])
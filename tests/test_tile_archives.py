@@ -0,0 +1,320 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from wagtailgeowidget import app_settings, tile_archives
+from wagtailgeowidget.tile_archives import (
+    PMTILES_HEADER,
+    MBTilesArchive,
+    PMTilesArchive,
+    PMTilesEntry,
+    get_tile_archive,
+    zxy_to_tile_id,
+)
+from wagtailgeowidget.widgets import get_leaflet_config
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def serialize_directory(entries):
+    out = bytearray()
+    write_varint(out, len(entries))
+
+    last_id = 0
+    for entry in entries:
+        write_varint(out, entry.tile_id - last_id)
+        last_id = entry.tile_id
+    for entry in entries:
+        write_varint(out, entry.run_length)
+    for entry in entries:
+        write_varint(out, entry.length)
+    for i, entry in enumerate(entries):
+        previous = entries[i - 1] if i else None
+        if previous and entry.offset == previous.offset + previous.length:
+            write_varint(out, 0)
+        else:
+            write_varint(out, entry.offset + 1)
+
+    return gzip.compress(bytes(out))
+
+
+def hilbert_tile_ids(max_zoom):
+    """
+    Returns {(z, x, y): tile_id} up to max_zoom by walking the Hilbert curve
+    from distance to position, the inverse of what the archive computes.
+    """
+
+    tile_ids = {}
+    tile_id = 0
+    for z in range(max_zoom + 1):
+        n = 1 << z
+        for d in range(n * n):
+            x = y = 0
+            t = d
+            s = 1
+            while s < n:
+                rx = 1 & (t // 2)
+                ry = 1 & (t ^ rx)
+                if ry == 0:
+                    if rx == 1:
+                        x = s - 1 - x
+                        y = s - 1 - y
+                    x, y = y, x
+                x += s * rx
+                y += s * ry
+                t //= 4
+                s *= 2
+            tile_ids[(z, x, y)] = tile_id + d
+        tile_id += n * n
+
+    return tile_ids
+
+
+def write_pmtiles(path, tiles, leaf_size=None):
+    """
+    Writes tiles {(z, x, y): data} as a PMTiles file, with entries split in
+    leaf directories of leaf_size entries when set.
+    """
+
+    tile_ids = hilbert_tile_ids(max(z for z, _x, _y in tiles))
+    data = bytearray()
+    entries = []
+    for tile_id, tile in sorted((tile_ids[zxy], tile) for zxy, tile in tiles.items()):
+        entries.append(PMTilesEntry(tile_id, len(data), len(tile), 1))
+        data += tile
+
+    leaves = bytearray()
+    if leaf_size:
+        root_entries = []
+        for i in range(0, len(entries), leaf_size):
+            leaf = serialize_directory(entries[i : i + leaf_size])
+            root_entries.append(
+                PMTilesEntry(entries[i].tile_id, len(leaves), len(leaf), 0)
+            )
+            leaves += leaf
+        root = serialize_directory(root_entries)
+    else:
+        root = serialize_directory(entries)
+
+    root_offset = PMTILES_HEADER.size
+    leaf_offset = root_offset + len(root)
+    data_offset = leaf_offset + len(leaves)
+    header = PMTILES_HEADER.pack(
+        b"PMTiles", 3,
+        root_offset, len(root),
+        data_offset, 0,
+        leaf_offset, len(leaves),
+        data_offset, len(data),
+        len(entries), len(entries), len(entries),
+        0, 2, 1, 2,
+        0, 3,
+        0, 0, 0, 0,
+        0, 0, 0,
+    )  # fmt: skip
+
+    with open(path, "wb") as fd:
+        fd.write(header + root + leaves + data)
+
+
+def write_mbtiles(path, tiles):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE metadata (name text, value text)")
+    connection.execute(
+        "CREATE TABLE tiles (zoom_level integer, tile_column integer, "
+        "tile_row integer, tile_data blob)"
+    )
+    connection.executemany(
+        "INSERT INTO metadata VALUES (?, ?)", [("format", "png"), ("maxzoom", "3")]
+    )
+    connection.executemany(
+        "INSERT INTO tiles VALUES (?, ?, ?, ?)",
+        [(z, x, (1 << z) - 1 - y, data) for (z, x, y), data in tiles.items()],
+    )
+    connection.commit()
+    connection.close()
+
+
+TILES = {
+    (z, x, y): "tile {}/{}/{}".format(z, x, y).encode("ascii")
+    for z in range(4)
+    for x in range(2**z)
+    for y in range(2**z)
+    if (x + y) % 3 != 1
+}
+
+
+class TileArchiveTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def assertArchiveTiles(self, archive):
+        for z in range(4):
+            for x in range(2**z):
+                for y in range(2**z):
+                    tile = archive.get_tile(z, x, y)
+                    expected = TILES.get((z, x, y))
+                    self.assertEqual(tile and bytes(tile), expected, (z, x, y))
+
+    def test_tile_ids_follow_hilbert_curve(self):
+        # Reference values from the PMTiles specification
+        self.assertEqual(
+            [
+                zxy_to_tile_id(*zxy)
+                for zxy in [
+                    (0, 0, 0),
+                    (1, 0, 0),
+                    (1, 0, 1),
+                    (1, 1, 1),
+                    (1, 1, 0),
+                    (2, 0, 0),
+                ]
+            ],
+            [0, 1, 2, 3, 4, 5],
+        )
+        self.assertEqual(zxy_to_tile_id(12, 3423, 1763), 19078479)
+        self.assertEqual(zxy_to_tile_id(20, 0, 0), 366503875925)
+
+    def test_tile_ids_match_the_fixture_ids(self):
+        for zxy, tile_id in hilbert_tile_ids(5).items():
+            self.assertEqual(zxy_to_tile_id(*zxy), tile_id, zxy)
+
+    def test_pmtiles_archive(self):
+        path = os.path.join(self.root, "tiles.pmtiles")
+        write_pmtiles(path, TILES)
+
+        archive = PMTilesArchive(path)
+        self.addCleanup(archive.close)
+
+        self.assertEqual(archive.content_type, "image/png")
+        self.assertEqual(archive.max_zoom, 3)
+        self.assertArchiveTiles(archive)
+
+    def test_pmtiles_archive_with_leaf_directories(self):
+        path = os.path.join(self.root, "tiles.pmtiles")
+        write_pmtiles(path, TILES, leaf_size=5)
+
+        archive = PMTilesArchive(path)
+        self.addCleanup(archive.close)
+
+        self.assertArchiveTiles(archive)
+
+    def test_mbtiles_archive(self):
+        path = os.path.join(self.root, "tiles.mbtiles")
+        write_mbtiles(path, TILES)
+
+        archive = MBTilesArchive(path)
+
+        self.assertEqual(archive.max_zoom, 3)
+        self.assertArchiveTiles(archive)
+
+
+@override_settings(ROOT_URLCONF="tests.urls")
+class ArchiveTileViewTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = os.path.join(self.root, "tiles.mbtiles")
+        write_mbtiles(self.path, TILES)
+
+        self.user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+
+    def get(self, url):
+        request = RequestFactory().get(url)
+        request.user = self.user
+        match = resolve(url)
+        return match.func(request, *match.args, **match.kwargs)
+
+    def test_tiles_are_served_with_immutable_caching(self):
+        with mock.patch.object(app_settings, "GEO_WIDGET_TILE_ARCHIVE", self.path):
+            config = get_leaflet_config()
+            url = config["tileLayer"].format(z=1, x=1, y=1)
+            response = self.get(url)
+            with self.assertRaises(Http404):
+                self.get(config["tileLayer"].format(z=1, x=1, y=0))
+
+        self.assertEqual(config["tileLayerOptions"]["maxNativeZoom"], 3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"tile 1/1/1")
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_outdated_versions_are_not_cached(self):
+        url = reverse(
+            "wagtailgeowidget_public:archive_tile", args=("outdated", 1, 1, 1)
+        )
+
+        with mock.patch.object(app_settings, "GEO_WIDGET_TILE_ARCHIVE", self.path):
+            response = self.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+
+class GetTileArchiveTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_replaced_archives_are_closed(self):
+        path = os.path.join(self.root, "tiles.pmtiles")
+        write_pmtiles(path, TILES)
+
+        with mock.patch.object(app_settings, "GEO_WIDGET_TILE_ARCHIVE", path):
+            archive = get_tile_archive()
+            self.assertIs(get_tile_archive(), archive)
+
+            write_pmtiles(path, {(0, 0, 0): b"replaced"})
+            os.utime(path, ns=(0, archive.stat_key[1] + 1))
+            replacement = get_tile_archive()
+            self.addCleanup(replacement.close)
+
+        self.assertIsNot(replacement, archive)
+        self.assertTrue(archive._mmap.closed)
+        self.assertEqual(bytes(replacement.get_tile(0, 0, 0)), b"replaced")
+
+    def test_broken_archives_fall_back_to_the_tile_layer(self):
+        path = os.path.join(self.root, "tiles.mbtiles")
+        with open(path, "wb") as fd:
+            fd.write(b"not a database")
+
+        with mock.patch.object(
+            app_settings, "GEO_WIDGET_TILE_ARCHIVE", path
+        ), self.assertLogs(tile_archives.logger, "ERROR") as logs:
+            config = get_leaflet_config()
+            self.assertIsNone(get_tile_archive())
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(
+            config["tileLayer"], app_settings.GEO_WIDGET_LEAFLET_TILE_LAYER
+        )
+        self.assertNotIn("maxNativeZoom", config["tileLayerOptions"])
+
+    @override_settings(ROOT_URLCONF="tests.urls")
+    def test_missing_archives_fall_back_to_the_tile_proxy(self):
+        path = os.path.join(self.root, "missing.pmtiles")
+
+        proxy_url = reverse("wagtailgeowidget_public:tile", args=(0, 0, 0))
+
+        with mock.patch.multiple(
+            app_settings, GEO_WIDGET_TILE_ARCHIVE=path, GEO_WIDGET_TILE_PROXY=True
+        ), self.assertLogs(tile_archives.logger, "ERROR"):
+            config = get_leaflet_config()
+
+        self.assertEqual(
+            config["tileLayer"], proxy_url.replace("/0/0/0/", "/{z}/{x}/{y}/")
+        )
@@ -0,0 +1,219 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from tests.stub_server import StubServer
+from wagtailgeowidget import app_settings
+from wagtailgeowidget.tiles import (
+    TILE_PROXY_BURST,
+    Tile,
+    TileCache,
+    TileProxy,
+    get_tile_proxy,
+    get_tile_url,
+)
+from wagtailgeowidget.widgets import get_leaflet_config
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"0" * 100
+
+
+def tile_response(path, params, headers):
+    if headers.get("If-None-Match") == '"v1"':
+        return 304, {"ETag": '"v1"'}, b""
+
+    if path == "/missing/0/0/0.png":
+        return 404, {}, b""
+
+    return 200, {"Content-Type": "image/png", "ETag": '"v1"'}, PNG
+
+
+def make_tile(body=PNG, fetched=None):
+    return Tile(
+        body=body,
+        content_type="image/png",
+        etag='"v1"',
+        last_modified=None,
+        fetched=time.time() if fetched is None else fetched,
+    )
+
+
+class TileCacheTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_tiles_are_stored_sharded_by_zoom(self):
+        cache = TileCache(self.root, max_size=10**6)
+        cache.set(3, 1, 2, make_tile())
+
+        self.assertEqual(cache.get(3, 1, 2).body, PNG)
+        self.assertIsNone(cache.get(3, 2, 1))
+        self.assertTrue(
+            cache.get_path(3, 1, 2).startswith(os.path.join(self.root, "3"))
+        )
+
+    def test_least_recently_used_tiles_are_evicted(self):
+        tile = make_tile()
+        cache = TileCache(self.root, max_size=10**6)
+        cache.set(5, 0, 0, tile)
+        cache.max_size = os.path.getsize(cache.get_path(5, 0, 0)) * 3
+
+        for x in range(3):
+            cache.set(5, x, 0, tile)
+            past = time.time() - 100 + x
+            os.utime(cache.get_path(5, x, 0), (past, past))
+
+        # Reading a tile marks it as recently used
+        cache.get(5, 0, 0)
+        cache.set(5, 3, 0, tile)
+
+        self.assertIsNotNone(cache.get(5, 0, 0))
+        self.assertIsNone(cache.get(5, 1, 0))
+        self.assertIsNotNone(cache.get(5, 3, 0))
+
+    def test_size_is_read_from_disk_after_other_writers(self):
+        tile = make_tile()
+        cache = TileCache(self.root, max_size=10**6)
+        other = TileCache(self.root, max_size=10**6)
+        cache.set(5, 0, 0, tile)
+        tile_size = os.path.getsize(cache.get_path(5, 0, 0))
+
+        # Tiles written by another process are not counted until the
+        # next scan of the disk
+        for x in range(1, 4):
+            other.set(5, x, 0, tile)
+        cache.max_size = tile_size * 3
+
+        cache.set(5, 4, 0, tile)
+        self.assertEqual(len(list(cache._files())), 5)
+
+        with mock.patch("wagtailgeowidget.tiles.SIZE_SCAN_INTERVAL", 0):
+            cache.set(5, 5, 0, tile)
+
+        self.assertLessEqual(len(list(cache._files())), 2)
+
+
+class TileProxyTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.proxy = TileProxy(TileCache(self.root, max_size=10**6), timeout=60)
+
+    def test_tiles_are_fetched_once(self):
+        with StubServer(tile_response) as upstream, mock.patch.object(
+            app_settings,
+            "GEO_WIDGET_LEAFLET_TILE_LAYER",
+            upstream.url + "/{z}/{x}/{y}.png",
+        ):
+            first = self.proxy.get_tile(1, 0, 1)
+            second = self.proxy.get_tile(1, 0, 1)
+
+        self.assertEqual(first.body, PNG)
+        self.assertEqual(second.body, PNG)
+        self.assertEqual(upstream.requests, [("/1/0/1.png", {})])
+
+    def test_stale_tiles_are_revalidated(self):
+        self.proxy.cache.set(1, 1, 1, make_tile(fetched=time.time() - 120))
+
+        with StubServer(tile_response) as upstream, mock.patch.object(
+            app_settings,
+            "GEO_WIDGET_LEAFLET_TILE_LAYER",
+            upstream.url + "/{z}/{x}/{y}.png",
+        ):
+            tile = self.proxy.get_tile(1, 1, 1)
+
+        self.assertEqual(tile.body, PNG)
+        self.assertEqual(len(upstream.requests), 1)
+        self.assertGreater(self.proxy.cache.get(1, 1, 1).fetched, time.time() - 60)
+
+    def test_stale_tiles_are_served_on_upstream_errors(self):
+        self.proxy.cache.set(0, 0, 0, make_tile(fetched=0))
+
+        with StubServer(tile_response) as upstream, mock.patch.object(
+            app_settings,
+            "GEO_WIDGET_LEAFLET_TILE_LAYER",
+            upstream.url + "/missing/{z}/{x}/{y}.png",
+        ):
+            tile = self.proxy.get_tile(0, 0, 0)
+
+        self.assertEqual(tile.body, PNG)
+
+    def test_tile_url_template(self):
+        self.assertEqual(
+            get_tile_url("https://{s}.tile.example.com/{z}/{x}/{y}{r}.png", 2, 1, 3),
+            "https://b.tile.example.com/2/1/3.png",
+        )
+
+
+@override_settings(ROOT_URLCONF="tests.urls")
+class TileViewTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+
+    def get(self, z, x, y, **headers):
+        url = reverse("wagtailgeowidget_public:tile", args=(z, x, y))
+        request = RequestFactory().get(url, headers=headers)
+        request.user = self.user
+        return resolve(url).func(request, *resolve(url).args, **resolve(url).kwargs)
+
+    def test_tiles_are_proxied(self):
+        with StubServer(tile_response) as upstream, mock.patch.multiple(
+            app_settings,
+            GEO_WIDGET_TILE_PROXY=True,
+            GEO_WIDGET_TILE_CACHE_DIR=self.root,
+            GEO_WIDGET_LEAFLET_TILE_LAYER=upstream.url + "/{z}/{x}/{y}.png",
+        ):
+            response = self.get(2, 3, 1)
+            not_modified = self.get(2, 3, 1, if_none_match='"v1"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, PNG)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(len(upstream.requests), 1)
+
+    def test_proxy_is_disabled_by_default(self):
+        with self.assertRaises(Http404):
+            self.get(0, 0, 0)
+
+    def test_invalid_tiles_are_not_found(self):
+        with mock.patch.object(app_settings, "GEO_WIDGET_TILE_PROXY", True):
+            with self.assertRaises(Http404):
+                self.get(1, 2, 0)
+
+    def test_tiles_require_admin_access(self):
+        self.user = AnonymousUser()
+
+        with mock.patch.object(app_settings, "GEO_WIDGET_TILE_PROXY", True):
+            response = self.get(0, 0, 0)
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_proxy_is_rate_limited(self):
+        with mock.patch.multiple(
+            app_settings,
+            GEO_WIDGET_TILE_CACHE_DIR=self.root,
+            GEO_WIDGET_TILE_PROXY_RATE_LIMIT=2,
+        ):
+            proxy = get_tile_proxy()
+
+        self.assertEqual(proxy.rate_limiter.rate, 2)
+        self.assertEqual(proxy.rate_limiter.burst, TILE_PROXY_BURST)
+
+    def test_widget_uses_proxy_tile_layer(self):
+        with mock.patch.object(app_settings, "GEO_WIDGET_TILE_PROXY", True):
+            config = get_leaflet_config()
+
+        self.assertEqual(config["tileLayer"], "/geo-widget/tiles/{z}/{x}/{y}/")
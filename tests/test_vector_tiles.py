@@ -0,0 +1,180 @@
+import struct
+
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from tests.geopage_nospatial.models import StandardPage
+from tests.indexed_pages import LONDON, STOCKHOLM, UPPSALA, IndexedPagesMixin
+from wagtailgeowidget.tiles import lnglat_to_tile
+from wagtailgeowidget.vector_tiles import encode_tile
+
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def read_message(data):
+    """
+    Returns the fields of a protobuf message as {field: [values]}.
+    """
+
+    fields = {}
+    pos = 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value = struct.unpack_from("<d", data, pos)[0]
+            pos += 8
+        else:
+            length, pos = read_varint(data, pos)
+            value = data[pos : pos + length]
+            pos += length
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def read_packed(data):
+    values = []
+    pos = 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_tile(data):
+    """
+    Returns {layer name: [(id, x, y, properties)]} of a vector tile.
+    """
+
+    layers = {}
+    for layer_data in read_message(data).get(3, []):
+        layer = read_message(layer_data)
+        keys = [key.decode("utf-8") for key in layer.get(3, [])]
+        values = []
+        for value_data in layer.get(4, []):
+            value = read_message(value_data)
+            (number, (raw,)) = next(iter(value.items()))
+            if number == 1:
+                raw = raw.decode("utf-8")
+            elif number == 6:
+                raw = unzigzag(raw)
+            values.append(raw)
+
+        features = []
+        for feature_data in layer.get(2, []):
+            feature = read_message(feature_data)
+            tags = read_packed(feature.get(2, [b""])[0])
+            command, x, y = read_packed(feature[4][0])
+            features.append(
+                (
+                    feature.get(1, [None])[0],
+                    unzigzag(x),
+                    unzigzag(y),
+                    {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])},
+                )
+            )
+        layers[layer[1][0].decode("utf-8")] = features
+    return layers
+
+
+class EncodeTileTestCase(TestCase):
+    def test_features_are_encoded(self):
+        data = encode_tile(
+            "places",
+            [
+                (1, 10, 20, {"title": "A", "rank": 3, "score": 0.5, "open": True}),
+                (2, -5, 4100, {"title": "A", "rank": -1}),
+            ],
+        )
+
+        self.assertEqual(
+            decode_tile(data),
+            {
+                "places": [
+                    (1, 10, 20, {"title": "A", "rank": 3, "score": 0.5, "open": 1}),
+                    (2, -5, 4100, {"title": "A", "rank": -1}),
+                ]
+            },
+        )
+
+    def test_empty_tiles(self):
+        self.assertEqual(encode_tile("places", []), b"")
+
+
+@override_settings(ROOT_URLCONF="tests.urls")
+class VectorTileViewTestCase(IndexedPagesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.stockholm = self.add_page("Stockholm", STOCKHOLM)
+        self.add_page("London", LONDON)
+
+    def get(self, z, x, y, **headers):
+        url = reverse("vector_tile", args=(z, x, y))
+        request = RequestFactory().get(url, headers=headers)
+        match = resolve(url)
+        return match.func(request, *match.args, **match.kwargs)
+
+    def get_features(self, z, x, y):
+        response = self.get(z, x, y)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        return decode_tile(response.content).get("standardpage", [])
+
+    def test_locations_are_encoded(self):
+        features = self.get_features(0, 0, 0)
+
+        self.assertEqual(
+            sorted(properties["title"] for _id, _x, _y, properties in features),
+            ["London", "Stockholm"],
+        )
+        stockholm = next(f for f in features if f[0] == self.stockholm.pk)
+        # 18.0686 is at 0.5502 of the map width, 59.3293 at 0.2942 of its height
+        self.assertEqual(stockholm[1:3], (2254, 1205))
+
+    def test_tiles_only_hold_their_locations(self):
+        x, y = lnglat_to_tile(18.0686, 59.3293, 10)
+
+        features = self.get_features(10, x, y)
+        empty = self.get(10, x + 5, y)
+
+        self.assertEqual([f[0] for f in features], [self.stockholm.pk])
+        self.assertEqual(empty.content, b"")
+
+    def test_tiles_follow_publishing(self):
+        response = self.get(0, 0, 0)
+        self.assertEqual(
+            self.get(0, 0, 0, if_none_match=response["ETag"]).status_code, 304
+        )
+
+        self.add_page("Uppsala", UPPSALA, live=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            StandardPage.objects.get(slug="uppsala").save_revision().publish()
+            self.stockholm.unpublish()
+
+        features = self.get_features(0, 0, 0)
+
+        self.assertEqual(
+            sorted(properties["title"] for _id, _x, _y, properties in features),
+            ["London", "Uppsala"],
+        )
+
+    def test_invalid_tiles(self):
+        with self.assertRaises(Http404):
+            self.get(1, 2, 0)
@@ -0,0 +1,165 @@
+import json
+from html import escape
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from tests.stub_server import StubServer
+from wagtailgeowidget import app_settings, geocoders
+from wagtailgeowidget.widgets import GeocoderField
+
+
+def nominatim_response(path, params, headers):
+    if params["q"] == "nowhere":
+        return 200, {"Content-Type": "application/json"}, "[]"
+
+    return (
+        200,
+        {"Content-Type": "application/json"},
+        json.dumps([{"lat": "59.3293", "lon": "18.0686", "display_name": "Stockholm"}]),
+    )
+
+
+@override_settings(ROOT_URLCONF="tests.urls")
+class GeocodeViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.url = reverse("wagtailgeowidget:geocode")
+
+    def get(self, params, user=None):
+        request = RequestFactory().get(self.url, params)
+        request.user = user or self.user
+        return resolve(self.url).func(request)
+
+    def test_results_are_normalized_and_cached(self):
+        with StubServer(nominatim_response) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_NOMINATIM_URL", upstream.url
+        ):
+            response = self.get({"q": " Stockholm "})
+            self.get({"q": "stockholm"})
+
+        self.assertEqual(
+            json.loads(response.content),
+            {"results": [{"lat": 59.3293, "lng": 18.0686, "address": "Stockholm"}]},
+        )
+        self.assertEqual(len(upstream.requests), 1)
+        self.assertEqual(upstream.requests[0][1]["q"], "stockholm")
+
+    def test_empty_results_are_cached(self):
+        with StubServer(nominatim_response) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_NOMINATIM_URL", upstream.url
+        ):
+            self.get({"q": "nowhere"})
+            response = self.get({"q": "nowhere"})
+
+        self.assertEqual(json.loads(response.content), {"results": []})
+        self.assertEqual(len(upstream.requests), 1)
+
+    def test_upstream_errors_are_not_cached(self):
+        with StubServer(lambda *args: (500, {}, "")) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_NOMINATIM_URL", upstream.url
+        ):
+            response = self.get({"q": "stockholm"})
+            self.get({"q": "stockholm"})
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(len(upstream.requests), 2)
+
+    def test_unsupported_geocoder_is_rejected(self):
+        response = self.get({"q": "stockholm", "geocoder": geocoders.GOOGLE_MAPS})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_anonymous_users_are_denied(self):
+        response = self.get({"q": "stockholm"}, user=AnonymousUser())
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_widget_is_pointed_at_proxy(self):
+        widget = GeocoderField(geocoder=geocoders.MAPBOX)
+
+        with mock.patch.object(app_settings, "GEO_WIDGET_GEOCODER_PROXY", True):
+            html = widget.render("field", "", {"id": "X"})
+
+        self.assertIn(escape('"proxyUrl": "{}"'.format(self.url)), html)
+        self.assertNotIn("accessToken", html)
+
+
+def nominatim_reverse_response(path, params, headers):
+    if params["lat"] == "0.0":
+        return 200, {}, json.dumps({"error": "Unable to geocode"})
+
+    return 200, {}, json.dumps({"display_name": "Stockholm"})
+
+
+@override_settings(ROOT_URLCONF="tests.urls")
+class ReverseGeocodeViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.url = reverse("wagtailgeowidget:reverse_geocode")
+
+    def get(self, params, user=None):
+        request = RequestFactory().get(self.url, params)
+        request.user = user or self.user
+        return resolve(self.url).func(request)
+
+    def test_nearby_locations_share_cached_address(self):
+        with StubServer(nominatim_reverse_response) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_NOMINATIM_URL", upstream.url
+        ):
+            response = self.get({"lat": "59.32931", "lng": "18.06861"})
+            self.get({"lat": "59.32929", "lng": "18.06859"})
+            self.get({"lat": "59.3301", "lng": "18.0686"})
+
+        self.assertEqual(json.loads(response.content), {"address": "Stockholm"})
+        self.assertEqual(len(upstream.requests), 2)
+        self.assertEqual(upstream.requests[0][0], "/reverse")
+        self.assertEqual(
+            (upstream.requests[0][1]["lat"], upstream.requests[0][1]["lon"]),
+            ("59.3293", "18.0686"),
+        )
+
+    def test_locations_without_address_are_cached(self):
+        with StubServer(nominatim_reverse_response) as upstream, mock.patch.object(
+            app_settings, "GEO_WIDGET_NOMINATIM_URL", upstream.url
+        ):
+            self.get({"lat": "0", "lng": "0"})
+            response = self.get({"lat": "0", "lng": "0"})
+
+        self.assertEqual(json.loads(response.content), {"address": ""})
+        self.assertEqual(len(upstream.requests), 1)
+
+    def test_invalid_requests_are_rejected(self):
+        for params in [
+            {"lat": "59.3293"},
+            {"lat": "north", "lng": "18.0686"},
+            {"lat": "91", "lng": "18.0686"},
+            {"lat": "nan", "lng": "18.0686"},
+            {"lat": "59.3293", "lng": "18.0686", "geocoder": "unknown"},
+            # Reverse geocoded in the browser
+            {"lat": "59.3293", "lng": "18.0686", "geocoder": "google_maps"},
+        ]:
+            self.assertEqual(self.get(params).status_code, 400)
+
+    def test_anonymous_users_are_denied(self):
+        response = self.get({"lat": "59.3293", "lng": "18.0686"}, user=AnonymousUser())
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_url_is_added_to_shared_config(self):
+        from wagtailgeowidget.widgets import get_shared_config
+
+        self.assertNotIn("reverseGeocodeUrl", get_shared_config())
+
+        with mock.patch.object(app_settings, "GEO_WIDGET_REVERSE_GEOCODE", True):
+            self.assertEqual(get_shared_config()["reverseGeocodeUrl"], self.url)
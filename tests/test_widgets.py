@@ -1,15 +1,26 @@
+import base64
+import hashlib
+import json
 import unittest
+from unittest import mock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import NoReverseMatch
 from wagtail import VERSION as WAGTAIL_VERSION
 
 from wagtailgeowidget import app_settings, geocoders
 from wagtailgeowidget.widgets import (
     GeocoderField,
+    GeocoderFieldAdapter,
     GoogleMapsField,
     GoogleMapsFieldAdapter,
     LeafletField,
     LeafletFieldAdapter,
+    get_google_maps_config,
+    get_leaflet_assets,
+    get_leaflet_config,
+    get_shared_config,
+    translations,
 )
 
 
@@ -29,6 +40,25 @@ class GoogleMapsFieldTestCase(TestCase):
             html,
         )
 
+    def test_options_contain_static_and_value_parts(self):
+        widget = GoogleMapsField(srid=4326, address_field="address", zoom=12)
+        widget.value_data = "SRID=4326;POINT(18.0686 59.3293)"
+
+        attrs = widget.build_attrs({})
+        options = json.loads(attrs["data-google-maps-field-options-value"])
+
+        self.assertEqual(
+            options,
+            {
+                "addressField": "address",
+                "zoomField": None,
+                "zoom": 12,
+                "srid": 4326,
+                "defaultLocation": {"lat": "59.3293", "lng": "18.0686"},
+                "mapId": widget.map_id,
+            },
+        )
+
     def test_streamfield_widget_uses_empty_id_prefix(self):
         """Test that StreamField widgets use empty id_prefix."""
 
@@ -142,6 +172,24 @@ class LeafletFieldTestCase(TestCase):
         self.assertIn(escape('"lat": "13.0"'), html)
         self.assertIn(escape('"lng": "12.0"'), html)
 
+    def test_options_contain_static_and_value_parts(self):
+        widget = LeafletField(srid=4326, zoom_field="zoom")
+        widget.value_data = "SRID=4326;POINT(18.0686 59.3293)"
+
+        attrs = widget.build_attrs({})
+        options = json.loads(attrs["data-leaflet-field-options-value"])
+
+        self.assertEqual(
+            options,
+            {
+                "addressField": None,
+                "zoomField": "zoom",
+                "zoom": app_settings.GEO_WIDGET_ZOOM,
+                "srid": 4326,
+                "defaultLocation": {"lat": "59.3293", "lng": "18.0686"},
+            },
+        )
+
     def test_streamfield_widget_uses_empty_id_prefix(self):
         """Test that StreamField widgets use empty id_prefix."""
 
@@ -346,3 +394,138 @@ class GeocoderFieldTestCase(TestCase):
             html,
         )
         self.assertIn(escape('language": "en'), html)
+
+    def test_telepath_adapter_reads_translations_from_shared_config(self):
+        widget = GeocoderField(geocoder=geocoders.MAPBOX)
+
+        result = GeocoderFieldAdapter().js_args(widget)
+
+        self.assertEqual(result[-2], geocoders.MAPBOX)
+        self.assertNotIn(translations, result)
+        self.assertIn('id="wagtailgeowidget-config"', str(widget.media))
+
+
+class SharedConfigTestCase(TestCase):
+    def test_shared_config_is_emitted_once_with_field_media(self):
+        media = (
+            LeafletField().media
+            + LeafletField().media
+            + GeocoderField(geocoder=geocoders.NOMINATIM).media
+        )
+
+        html = str(media)
+
+        self.assertEqual(html.count('id="wagtailgeowidget-config"'), 1)
+        self.assertEqual(html.count('id="wagtailgeowidget-config-leaflet"'), 1)
+        self.assertIn(json.dumps(translations["enter_location"]), html)
+        self.assertLess(
+            html.index('id="wagtailgeowidget-config"'),
+            html.index("geo-widget-config.js"),
+        )
+
+    def test_google_maps_config_is_only_emitted_for_google_fields(self):
+        leaflet_media = str(
+            LeafletField().media + GeocoderField(geocoder=geocoders.MAPBOX).media
+        )
+        google_media = str(
+            GeocoderField(geocoder=geocoders.GOOGLE_MAPS_PLACES_NEW).media
+        )
+
+        self.assertNotIn("wagtailgeowidget-config-google-maps", leaflet_media)
+        self.assertNotIn("maps.google.com", leaflet_media)
+        self.assertIn("wagtailgeowidget-config-google-maps", google_media)
+
+    def test_shared_config_is_built_when_media_is_rendered(self):
+        with mock.patch("wagtailgeowidget.widgets.get_google_maps_api_key") as key:
+            key.return_value = "key"
+            media = GoogleMapsField().media
+            key.assert_not_called()
+
+            self.assertIn("js?key=key", str(media))
+
+    def test_shared_config_contains_common_options(self):
+        config = get_shared_config()
+
+        self.assertEqual(config["translations"], translations)
+        self.assertEqual(
+            get_leaflet_config()["tileLayer"],
+            app_settings.GEO_WIDGET_LEAFLET_TILE_LAYER,
+        )
+
+    def test_google_maps_api_url_without_key(self):
+        with override_settings(GOOGLE_MAPS_V3_APIKEY=None):
+            url = get_google_maps_config()["googleMapsApiUrl"]
+
+        self.assertNotIn("key=", url)
+
+    def test_tile_layer_falls_back_without_public_urls(self):
+        with (
+            mock.patch.object(app_settings, "GEO_WIDGET_TILE_PROXY", True),
+            mock.patch("wagtailgeowidget.widgets.reverse", side_effect=NoReverseMatch),
+        ):
+            tile_layer = get_leaflet_config()["tileLayer"]
+
+        self.assertEqual(tile_layer, app_settings.GEO_WIDGET_LEAFLET_TILE_LAYER)
+
+    def test_field_options_do_not_repeat_shared_config(self):
+        widgets = [
+            (GoogleMapsField(srid=4326), "data-google-maps-field-options-value"),
+            (LeafletField(srid=4326), "data-leaflet-field-options-value"),
+            (GeocoderField(), "data-geocoder-field-options-value"),
+        ]
+
+        for widget, attr in widgets:
+            options = json.loads(widget.build_attrs({})[attr])
+
+            self.assertNotIn("translations", options)
+            self.assertNotIn("tileLayerOptions", options)
+
+
+class LeafletAssetsTestCase(TestCase):
+    def test_leaflet_is_served_from_static_by_default(self):
+        from django.contrib.staticfiles import finders
+
+        assets = get_leaflet_assets()
+
+        self.assertTrue(
+            assets["leafletJs"].endswith(
+                "wagtailgeowidget/vendor/leaflet-1.9.4/leaflet.js"
+            )
+        )
+
+        with open(
+            finders.find("wagtailgeowidget/vendor/leaflet-1.9.4/leaflet.js"), "rb"
+        ) as fd:
+            digest = base64.b64encode(hashlib.sha384(fd.read()).digest())
+
+        self.assertEqual(
+            assets["leafletJsIntegrity"], "sha384-{}".format(digest.decode())
+        )
+
+    def test_marker_images_are_passed_as_served(self):
+        with mock.patch(
+            "wagtailgeowidget.widgets.static",
+            side_effect=lambda path: "/static/" + path.replace(".png", ".abc123.png"),
+        ):
+            icons = get_leaflet_assets()["leafletIcons"]
+
+        self.assertEqual(
+            icons["iconUrl"],
+            "/static/wagtailgeowidget/vendor/leaflet-1.9.4/images/marker-icon.abc123.png",
+        )
+        self.assertEqual(set(icons), {"iconUrl", "iconRetinaUrl", "shadowUrl"})
+
+    def test_leaflet_can_be_served_from_cdn(self):
+        with mock.patch.object(app_settings, "GEO_WIDGET_LEAFLET_USE_CDN", True):
+            assets = get_leaflet_assets()
+
+        self.assertEqual(
+            assets["leafletCss"], "https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"
+        )
+        self.assertTrue(assets["leafletCssIntegrity"].startswith("sha256-"))
+
+    def test_leaflet_is_not_part_of_widget_media(self):
+        media = str(LeafletField().media)
+
+        self.assertNotIn('leaflet.js"></script>', media)
+        self.assertIn("sdk-loader.js", media)
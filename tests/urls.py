@@ -0,0 +1,22 @@
+from django.urls import include, path
+from wagtail.admin import urls as wagtailadmin_urls
+
+from tests.geopage_nospatial.models import StandardPage
+from wagtailgeowidget.views import ClusterView, GeoJSONView, VectorTileView
+
+# Minimal url conf used by tests, the test settings lack django.contrib.admin
+urlpatterns = [
+    path("admin/", include(wagtailadmin_urls)),
+    path("geo-widget/", include("wagtailgeowidget.urls")),
+    path("clusters/", ClusterView.as_view(model=StandardPage), name="clusters"),
+    path(
+        "locations.geojson",
+        GeoJSONView.as_view(model=StandardPage, properties=["title", "address"]),
+        name="geojson",
+    ),
+    path(
+        "tiles/<int:z>/<int:x>/<int:y>.mvt",
+        VectorTileView.as_view(model=StandardPage),
+        name="vector_tile",
+    ),
+]
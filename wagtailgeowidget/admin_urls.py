@@ -0,0 +1,10 @@
+from django.urls import path
+
+from wagtailgeowidget import views
+
+app_name = "wagtailgeowidget"
+
+urlpatterns = [
+    path("geocode/", views.geocode, name="geocode"),
+    path("reverse-geocode/", views.reverse_geocode, name="reverse_geocode"),
+]
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from wagtailgeowidget import app_settings
+
+# Settings resolved by get_google_maps_api_key, reloaded when changed
+API_KEY_SETTINGS = {
+    "GOOGLE_MAPS_V3_APIKEY": None,
+    "GOOGLE_MAPS_V3_APIKEY_CALLBACK": None,
+    "GOOGLE_MAPS_V3_APIKEY_CACHE_TIMEOUT": 300,
+}
+
+
+class CachedResolver:
+    """
+    Caches the result of resolve in the process for timeout seconds. When it
+    expires a single thread calls resolve again, other threads wait for its
+    result instead of calling it at the same time.
+    """
+
+    def __init__(self, resolve: Callable[[], Any], get_timeout: Callable[[], float]):
+        self.resolve = resolve
+        self.get_timeout = get_timeout
+        # (value, expires at) replaced at once, so reads need no lock
+        self._entry: Optional[Tuple[Any, float]] = None
+        self._lock = threading.Lock()
+
+    def _get_fresh_entry(self):
+        entry = self._entry
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry
+        return None
+
+    def get(self) -> Any:
+        entry = self._get_fresh_entry()
+        if entry is not None:
+            return entry[0]
+
+        with self._lock:
+            # Resolved by another thread while waiting for the lock
+            entry = self._get_fresh_entry()
+            if entry is not None:
+                return entry[0]
+
+            value = self.resolve()
+            self._entry = (value, time.monotonic() + self.get_timeout())
+            return value
+
+    def clear(self) -> None:
+        self._entry = None
+
+
+def _call_google_maps_api_key_callback() -> Optional[str]:
+    callback = app_settings.GOOGLE_MAPS_V3_APIKEY_CALLBACK
+    if isinstance(callback, str):
+        callback = import_string(callback)
+
+    return callback()
+
+
+google_maps_api_key = CachedResolver(
+    _call_google_maps_api_key_callback,
+    lambda: app_settings.GOOGLE_MAPS_V3_APIKEY_CACHE_TIMEOUT,
+)
+
+
+def get_google_maps_api_key() -> Optional[str]:
+    """
+    Returns the Google Maps API key, from GOOGLE_MAPS_V3_APIKEY_CALLBACK when
+    set. Keys from the callback are cached in the process for
+    GOOGLE_MAPS_V3_APIKEY_CACHE_TIMEOUT seconds.
+    """
+
+    if not app_settings.GOOGLE_MAPS_V3_APIKEY_CALLBACK:
+        return app_settings.GOOGLE_MAPS_V3_APIKEY
+
+    return google_maps_api_key.get()
+
+
+def clear_google_maps_api_key() -> None:
+    """
+    Drops the cached Google Maps API key, call it when the key returned by
+    GOOGLE_MAPS_V3_APIKEY_CALLBACK changes.
+    """
+
+    google_maps_api_key.clear()
+
+
+def _setting_changed(sender, setting, value, enter, **kwargs):
+    if setting not in API_KEY_SETTINGS:
+        return
+
+    if value is None:
+        value = API_KEY_SETTINGS[setting]
+
+    setattr(app_settings, setting, value)
+    clear_google_maps_api_key()
+
+
+setting_changed.connect(_setting_changed, dispatch_uid="wagtailgeowidget_api_keys")
@@ -18,12 +18,56 @@ GEO_WIDGET_LEAFLET_TILE_LAYER_OPTIONS = getattr(
         "attribution": '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
     },
 )
+GEO_WIDGET_LEAFLET_USE_CDN = getattr(settings, "GEO_WIDGET_LEAFLET_USE_CDN", False)
 
 GOOGLE_MAPS_V3_APIKEY = getattr(settings, "GOOGLE_MAPS_V3_APIKEY", None)
 GOOGLE_MAPS_V3_APIKEY_CALLBACK = getattr(
     settings, "GOOGLE_MAPS_V3_APIKEY_CALLBACK", None
 )
+GOOGLE_MAPS_V3_APIKEY_CACHE_TIMEOUT = getattr(
+    settings, "GOOGLE_MAPS_V3_APIKEY_CACHE_TIMEOUT", 300
+)
 GOOGLE_MAPS_V3_LANGUAGE = getattr(settings, "GOOGLE_MAPS_V3_LANGUAGE", "en")
 
 MAPBOX_ACCESS_TOKEN = getattr(settings, "MAPBOX_ACCESS_TOKEN", None)
 MAPBOX_LANGUAGE = getattr(settings, "MAPBOX_LANGUAGE", "en")
+
+GEO_WIDGET_GEOCODER_PROXY = getattr(settings, "GEO_WIDGET_GEOCODER_PROXY", False)
+GEO_WIDGET_GEOCODER_CACHE = getattr(settings, "GEO_WIDGET_GEOCODER_CACHE", "default")
+GEO_WIDGET_GEOCODER_CACHE_TIMEOUT = getattr(
+    settings, "GEO_WIDGET_GEOCODER_CACHE_TIMEOUT", 60 * 60 * 24 * 30
+)
+GEO_WIDGET_REVERSE_GEOCODE = getattr(settings, "GEO_WIDGET_REVERSE_GEOCODE", False)
+GEO_WIDGET_REVERSE_GEOCODE_PRECISION = getattr(
+    settings, "GEO_WIDGET_REVERSE_GEOCODE_PRECISION", 4
+)
+GEO_WIDGET_NOMINATIM_URL = getattr(
+    settings, "GEO_WIDGET_NOMINATIM_URL", "https://nominatim.openstreetmap.org"
+)
+GEO_WIDGET_MAPBOX_URL = getattr(
+    settings, "GEO_WIDGET_MAPBOX_URL", "https://api.mapbox.com"
+)
+GEO_WIDGET_GOOGLE_MAPS_URL = getattr(
+    settings, "GEO_WIDGET_GOOGLE_MAPS_URL", "https://maps.googleapis.com"
+)
+GEO_WIDGET_GEOCODER_RATE_LIMITS = getattr(
+    settings, "GEO_WIDGET_GEOCODER_RATE_LIMITS", {}
+)
+
+GEO_WIDGET_TILE_PROXY = getattr(settings, "GEO_WIDGET_TILE_PROXY", False)
+GEO_WIDGET_TILE_CACHE_DIR = getattr(settings, "GEO_WIDGET_TILE_CACHE_DIR", None)
+GEO_WIDGET_TILE_CACHE_MAX_SIZE = getattr(
+    settings, "GEO_WIDGET_TILE_CACHE_MAX_SIZE", 512 * 1024 * 1024
+)
+GEO_WIDGET_TILE_CACHE_TIMEOUT = getattr(
+    settings, "GEO_WIDGET_TILE_CACHE_TIMEOUT", 60 * 60 * 24 * 7
+)
+GEO_WIDGET_TILE_PROXY_RATE_LIMIT = getattr(
+    settings, "GEO_WIDGET_TILE_PROXY_RATE_LIMIT", 10
+)
+GEO_WIDGET_TILE_ARCHIVE = getattr(settings, "GEO_WIDGET_TILE_ARCHIVE", None)
+
+GEO_WIDGET_INDEX_CACHE = getattr(settings, "GEO_WIDGET_INDEX_CACHE", "default")
+
+GEO_WIDGET_BLOCK_LOCATIONS = getattr(settings, "GEO_WIDGET_BLOCK_LOCATIONS", False)
+GEO_WIDGET_BLOCK_STORAGE = getattr(settings, "GEO_WIDGET_BLOCK_STORAGE", "ewkt")
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class WagtailgeowidgetConfig(AppConfig):
     name = "wagtailgeowidget"
+    default_auto_field = "django.db.models.AutoField"
+
+    def ready(self):
+        from wagtailgeowidget.block_locations import connect_signals
+
+        connect_signals()
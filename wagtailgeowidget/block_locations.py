@@ -0,0 +1,308 @@
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from wagtail.blocks import ListBlock, StreamBlock, StructBlock
+from wagtail.fields import StreamField
+from wagtail.models import Page
+from wagtail.signals import page_published, page_unpublished
+
+from wagtailgeowidget import app_settings
+from wagtailgeowidget.blocks import GoogleMapsBlock, LeafletBlock
+from wagtailgeowidget.bulk import DEFAULT_CHUNK_SIZE
+from wagtailgeowidget.helpers import ParsedPoint, parse_geosgeometry
+from wagtailgeowidget.models import BlockLocation
+
+MAP_BLOCKS = (GoogleMapsBlock, LeafletBlock)
+
+
+class ExtractedLocation(NamedTuple):
+    block_path: str
+    block_id: str
+    point: ParsedPoint
+    address: str
+    zoom: Optional[int]
+
+
+def parse_block_value(value) -> Optional[ParsedPoint]:
+    """
+    Returns the srid/x/y of a stored map block value, or None for empty and
+    unparseable values.
+    """
+
+    if not value:
+        return None
+
+    if isinstance(value, str):
+        return parse_geosgeometry(value)
+
+    if isinstance(value, (list, tuple)):
+        try:
+            lng, lat = value
+            return ParsedPoint(4326, float(lng), float(lat))
+        except (TypeError, ValueError):
+            return None
+
+    try:
+        return ParsedPoint(
+            int(value.get("srid") or 4326), float(value["lng"]), float(value["lat"])
+        )
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+# Block definitions are unhashable, results are keyed on id() and keep the
+# block alive so the id can't be reused
+_has_map_blocks = {}
+
+
+def has_map_blocks(block) -> bool:
+    cached = _has_map_blocks.get(id(block))
+    if cached is not None:
+        return cached[1]
+
+    if isinstance(block, MAP_BLOCKS):
+        result = True
+    elif isinstance(block, ListBlock):
+        result = has_map_blocks(block.child_block)
+    else:
+        result = any(
+            has_map_blocks(child)
+            for child in getattr(block, "child_blocks", {}).values()
+        )
+
+    _has_map_blocks[id(block)] = (block, result)
+    return result
+
+
+@lru_cache(maxsize=None)
+def get_map_block_fields(model) -> Tuple[str, ...]:
+    """
+    Returns the names of the StreamFields of model holding map blocks.
+    """
+
+    return tuple(
+        field.name
+        for field in model._meta.concrete_fields
+        if isinstance(field, StreamField) and has_map_blocks(field.stream_block)
+    )
+
+
+def find_map_block_models(pages_only: bool = True) -> List[Any]:
+    """
+    Finds all concrete page models, or all models, with map blocks in a
+    StreamField.
+    """
+
+    return [
+        model
+        for model in apps.get_models()
+        if (issubclass(model, Page) or not pages_only)
+        and not model._meta.proxy
+        and get_map_block_fields(model)
+    ]
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _walk_struct(
+    block: StructBlock, value, path: str, block_id: str
+) -> Iterator[ExtractedLocation]:
+    if not isinstance(value, dict):
+        return
+
+    for name, child in block.child_blocks.items():
+        child_path = "{}.{}".format(path, name)
+
+        if not isinstance(child, MAP_BLOCKS):
+            yield from _walk(child, value.get(name), child_path, block_id)
+            continue
+
+        point = parse_block_value(value.get(name))
+        if point is None:
+            continue
+
+        address = ""
+        if child.address_field:
+            address = value.get(child.address_field) or ""
+
+        zoom = None
+        if child.zoom_field:
+            zoom = _to_int(value.get(child.zoom_field))
+
+        yield ExtractedLocation(child_path, block_id, point, address, zoom)
+
+
+def _walk(block, value, path: str, block_id: str) -> Iterator[ExtractedLocation]:
+    """
+    Walks raw stream data alongside the block definitions, without
+    converting it to python values.
+    """
+
+    if not value:
+        return
+
+    if isinstance(block, MAP_BLOCKS):
+        point = parse_block_value(value)
+        if point is not None:
+            yield ExtractedLocation(path, block_id, point, "", None)
+
+    elif isinstance(block, StreamBlock):
+        for item in value:
+            child = block.child_blocks.get(item.get("type"))
+            if child is None or not has_map_blocks(child):
+                continue
+
+            child_path = "{}.{}".format(path, item["type"]) if path else item["type"]
+            yield from _walk(child, item.get("value"), child_path, item.get("id", ""))
+
+    elif isinstance(block, ListBlock):
+        for item in value:
+            # List items are stored as {"type": "item", "value": ..., "id": ...}
+            # since Wagtail 2.16, older data has plain values
+            item_id = block_id
+            if isinstance(item, dict) and item.get("type") == "item":
+                item_id = item.get("id", block_id)
+                item = item.get("value")
+            yield from _walk(block.child_block, item, path, item_id)
+
+    elif isinstance(block, StructBlock):
+        yield from _walk_struct(block, value, path, block_id)
+
+
+def extract_locations(stream_block, raw_data) -> List[ExtractedLocation]:
+    """
+    Returns the locations of every map block in the raw data of a
+    StreamField, along with the address and zoom of the struct holding it.
+    """
+
+    return list(_walk(stream_block, list(raw_data), "", ""))
+
+
+def get_raw_data(stream_value) -> list:
+    if stream_value is None:
+        return []
+
+    return list(getattr(stream_value, "raw_data", stream_value))
+
+
+def build_block_locations(
+    page_id, revision_id, fields: Iterable[Tuple[str, Any]], model
+) -> List[BlockLocation]:
+    rows = []
+    for field_name, stream_value in fields:
+        stream_block = model._meta.get_field(field_name).stream_block
+        for location in extract_locations(stream_block, get_raw_data(stream_value)):
+            rows.append(
+                BlockLocation(
+                    page_id=page_id,
+                    revision_id=revision_id,
+                    field_name=field_name,
+                    block_path=location.block_path,
+                    block_id=location.block_id or "",
+                    srid=location.point.srid,
+                    lat=location.point.y,
+                    lng=location.point.x,
+                    address=location.address,
+                    zoom=location.zoom,
+                )
+            )
+    return rows
+
+
+def replace_block_locations(page_ids: List[Any], rows: List[BlockLocation]) -> None:
+    with transaction.atomic():
+        BlockLocation.objects.filter(page_id__in=page_ids).delete()
+        BlockLocation.objects.bulk_create(rows, batch_size=DEFAULT_CHUNK_SIZE)
+
+
+def update_block_locations(page, revision=None) -> int:
+    """
+    Replaces the stored block locations of a live page, returning the number
+    of locations found.
+    """
+
+    fields = get_map_block_fields(type(page))
+    if not fields:
+        return 0
+
+    revision_id = revision.pk if revision is not None else page.live_revision_id
+    rows = build_block_locations(
+        page.pk,
+        revision_id,
+        [(name, getattr(page, name)) for name in fields],
+        type(page),
+    )
+    replace_block_locations([page.pk], rows)
+    return len(rows)
+
+
+def update_model_block_locations(
+    model, queryset=None, batch_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """
+    Rebuilds the block locations of every live page of model, reading the
+    raw StreamField data in batches. Returns the number of pages updated.
+    """
+
+    fields = get_map_block_fields(model)
+    if not fields:
+        return 0
+
+    if queryset is None:
+        queryset = model._default_manager.live()
+        # Drop locations left by pages unpublished while signals were off
+        BlockLocation.objects.filter(
+            page__content_type=ContentType.objects.get_for_model(model)
+        ).exclude(page__live=True).delete()
+
+    rows = queryset.order_by("pk").values_list("pk", "live_revision_id", *fields)
+
+    updated = 0
+    last_pk = None
+    while True:
+        batch_rows = rows
+        if last_pk is not None:
+            batch_rows = rows.filter(pk__gt=last_pk)
+
+        batch = list(batch_rows[:batch_size])
+        if not batch:
+            break
+
+        locations = []
+        for pk, revision_id, *values in batch:
+            locations.extend(
+                build_block_locations(pk, revision_id, zip(fields, values), model)
+            )
+
+        replace_block_locations([row[0] for row in batch], locations)
+        updated += len(batch)
+        last_pk = batch[-1][0]
+
+    return updated
+
+
+def _page_published(sender, instance, revision=None, **kwargs):
+    if app_settings.GEO_WIDGET_BLOCK_LOCATIONS:
+        update_block_locations(instance, revision)
+
+
+def _page_unpublished(sender, instance, **kwargs):
+    if app_settings.GEO_WIDGET_BLOCK_LOCATIONS and get_map_block_fields(type(instance)):
+        BlockLocation.objects.filter(page_id=instance.pk).delete()
+
+
+def connect_signals():
+    page_published.connect(
+        _page_published, dispatch_uid="wagtailgeowidget_block_locations"
+    )
+    page_unpublished.connect(
+        _page_unpublished, dispatch_uid="wagtailgeowidget_block_locations"
+    )
@@ -0,0 +1,171 @@
+import json
+from typing import Any, List, Tuple
+
+from django.contrib.contenttypes.models import ContentType
+from wagtail.blocks import ListBlock, StreamBlock, StructBlock
+from wagtail.blocks.stream_block import StreamValue
+from wagtail.models import Revision
+
+from wagtailgeowidget.block_locations import (
+    MAP_BLOCKS,
+    find_map_block_models,
+    get_map_block_fields,
+    get_raw_data,
+    has_map_blocks,
+)
+from wagtailgeowidget.blocks import get_storage_value
+from wagtailgeowidget.bulk import DEFAULT_CHUNK_SIZE
+
+
+def _convert(block, value, storage: str) -> Tuple[Any, bool]:
+    """
+    Returns the raw value of block with its map blocks in storage format,
+    and whether anything changed. Containers are updated in place.
+    """
+
+    if not value:
+        return value, False
+
+    if isinstance(block, MAP_BLOCKS):
+        converted = get_storage_value(value, storage)
+        return converted, converted != value
+
+    changed = False
+
+    if isinstance(block, StreamBlock):
+        for item in value:
+            child = block.child_blocks.get(item.get("type"))
+            if child is not None and has_map_blocks(child):
+                item["value"], item_changed = _convert(
+                    child, item.get("value"), storage
+                )
+                changed |= item_changed
+
+    elif isinstance(block, ListBlock):
+        for i, item in enumerate(value):
+            if isinstance(item, dict) and item.get("type") == "item":
+                item["value"], item_changed = _convert(
+                    block.child_block, item.get("value"), storage
+                )
+            else:
+                value[i], item_changed = _convert(block.child_block, item, storage)
+            changed |= item_changed
+
+    elif isinstance(block, StructBlock) and isinstance(value, dict):
+        for name, child in block.child_blocks.items():
+            if name in value and has_map_blocks(child):
+                value[name], item_changed = _convert(child, value[name], storage)
+                changed |= item_changed
+
+    return value, changed
+
+
+def convert_stream_data(stream_block, raw_data: list, storage: str) -> bool:
+    """
+    Rewrites the map block values in the raw data of a StreamField to the
+    storage format in place, returning whether anything changed.
+    """
+
+    _value, changed = _convert(stream_block, raw_data, storage)
+    return changed
+
+
+def migrate_model_block_storage(
+    model, storage: str, batch_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """
+    Rewrites the map blocks in the StreamFields of every row of model in
+    batches, returning the number of rows changed.
+    """
+
+    fields = get_map_block_fields(model)
+    manager = model._default_manager
+    rows = manager.order_by("pk").values_list("pk", *fields)
+
+    updated = 0
+    last_pk = None
+    while True:
+        batch_rows = rows
+        if last_pk is not None:
+            batch_rows = rows.filter(pk__gt=last_pk)
+
+        batch = list(batch_rows[:batch_size])
+        if not batch:
+            break
+
+        changed = []
+        for pk, *values in batch:
+            instance = model(pk=pk)
+            instance_changed = False
+            for name, value in zip(fields, values):
+                stream_block = model._meta.get_field(name).stream_block
+                raw_data = get_raw_data(value)
+                if convert_stream_data(stream_block, raw_data, storage):
+                    instance_changed = True
+                setattr(
+                    instance, name, StreamValue(stream_block, raw_data, is_lazy=True)
+                )
+
+            if instance_changed:
+                changed.append(instance)
+
+        if changed:
+            manager.bulk_update(changed, fields)
+            updated += len(changed)
+
+        last_pk = batch[-1][0]
+
+    return updated
+
+
+def migrate_revision_block_storage(
+    model, storage: str, batch_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """
+    Rewrites the map blocks stored in the revisions of model in batches,
+    returning the number of revisions changed.
+    """
+
+    fields = get_map_block_fields(model)
+    revisions = Revision.objects.filter(
+        content_type=ContentType.objects.get_for_model(model)
+    ).order_by("pk")
+
+    updated = 0
+    last_pk = None
+    while True:
+        batch_revisions = revisions
+        if last_pk is not None:
+            batch_revisions = revisions.filter(pk__gt=last_pk)
+
+        batch = list(batch_revisions.only("pk", "content")[:batch_size])
+        if not batch:
+            break
+
+        changed = []
+        for revision in batch:
+            revision_changed = False
+            for name in fields:
+                value = revision.content.get(name)
+                if not value:
+                    continue
+
+                # Revisions hold StreamFields serialized as a JSON string
+                raw_data = json.loads(value) if isinstance(value, str) else value
+                stream_block = model._meta.get_field(name).stream_block
+                if convert_stream_data(stream_block, raw_data, storage):
+                    revision.content[name] = (
+                        json.dumps(raw_data) if isinstance(value, str) else raw_data
+                    )
+                    revision_changed = True
+
+            if revision_changed:
+                changed.append(revision)
+
+        if changed:
+            Revision.objects.bulk_update(changed, ["content"])
+            updated += len(changed)
+
+        last_pk = batch[-1].pk
+
+    return updated
@@ -1,11 +1,222 @@
+from typing import Dict, List, Optional
+
 from django import forms
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.functional import cached_property
 from wagtail.blocks import FieldBlock, IntegerBlock
 
-from wagtailgeowidget import geocoders
-from wagtailgeowidget.helpers import geosgeometry_str_to_struct
+from wagtailgeowidget import app_settings, geocoders
+from wagtailgeowidget.helpers import ParsedPoint, parse_geosgeometry
 from wagtailgeowidget.widgets import GeocoderField, GoogleMapsField, LeafletField
 
+# Formats map block values are stored in, see GEO_WIDGET_BLOCK_STORAGE
+BLOCK_STORAGE_EWKT = "ewkt"
+BLOCK_STORAGE_OBJECT = "object"
+BLOCK_STORAGE_ARRAY = "array"
+BLOCK_STORAGE_CHOICES = (BLOCK_STORAGE_EWKT, BLOCK_STORAGE_OBJECT, BLOCK_STORAGE_ARRAY)
+
+
+class GeoPointValue:
+    """
+    Immutable value of GoogleMapsBlock and LeafletBlock, with float lat/lng
+    and an int srid. Supports item access (value["lat"]) like the dicts
+    previously returned by the blocks.
+    """
+
+    __slots__ = ("_lat", "_lng", "_srid", "_ewkt", "_point")
+
+    KEYS = ("lat", "lng", "srid")
+
+    def __init__(self, lat: float, lng: float, srid: int = 4326):
+        self._lat = float(lat)
+        self._lng = float(lng)
+        self._srid = int(srid)
+        self._ewkt = None
+        self._point = None
+
+    @classmethod
+    def from_parsed(
+        cls, point: ParsedPoint, ewkt: Optional[str] = None
+    ) -> "GeoPointValue":
+        """
+        Creates a value from a parsed point, keeping the EWKT string it was
+        parsed from so it is stored unchanged.
+        """
+
+        value = cls.__new__(cls)
+        value._lat = point.y
+        value._lng = point.x
+        value._srid = point.srid
+        value._ewkt = ewkt
+        value._point = None
+        return value
+
+    @classmethod
+    def from_dict(cls, value: dict) -> "GeoPointValue":
+        return cls(value["lat"], value["lng"], value.get("srid") or 4326)
+
+    @property
+    def lat(self) -> float:
+        return self._lat
+
+    @property
+    def lng(self) -> float:
+        return self._lng
+
+    @property
+    def srid(self) -> int:
+        return self._srid
+
+    @property
+    def ewkt(self) -> str:
+        if self._ewkt is None:
+            self._ewkt = "SRID={};POINT({} {})".format(self._srid, self._lng, self._lat)
+        return self._ewkt
+
+    @property
+    def point(self):
+        """
+        The location as a GEOS Point, requires GeoDjango.
+        """
+
+        if self._point is None:
+            from django.contrib.gis.geos import Point
+
+            self._point = Point(self._lng, self._lat, srid=self._srid)
+        return self._point
+
+    def as_dict(self) -> dict:
+        return {"lat": self._lat, "lng": self._lng, "srid": self._srid}
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.KEYS:
+            return default
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def keys(self):
+        return self.KEYS
+
+    def values(self):
+        return (self._lat, self._lng, self._srid)
+
+    def items(self):
+        return zip(self.KEYS, self.values())
+
+    def __eq__(self, other):
+        if isinstance(other, GeoPointValue):
+            return self.values() == other.values()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.values())
+
+    def __repr__(self):
+        return "<GeoPointValue {}>".format(self.ewkt)
+
+    def __str__(self):
+        return self.ewkt
+
+
+def to_geo_point_value(value) -> GeoPointValue:
+    """
+    Converts a stored map block value, an EWKT string, a lat/lng dict or a
+    [lng, lat] list, to a GeoPointValue.
+    """
+
+    if isinstance(value, str):
+        point = parse_geosgeometry(value)
+        if point is not None:
+            return GeoPointValue.from_parsed(point, value)
+
+    elif isinstance(value, GeoPointValue):
+        return value
+
+    elif isinstance(value, dict):
+        return GeoPointValue.from_dict(value)
+
+    elif isinstance(value, (list, tuple)) and len(value) == 2:
+        return GeoPointValue(value[1], value[0])
+
+    raise Exception("Error: Cannot parse '{}' into struct".format(value))
+
+
+def get_storage_value(value, storage: Optional[str] = None):
+    """
+    Returns the map block value to store in the StreamField, in the
+    GEO_WIDGET_BLOCK_STORAGE format unless storage is given. Empty and
+    unparseable values are returned as is.
+    """
+
+    if storage is None:
+        storage = app_settings.GEO_WIDGET_BLOCK_STORAGE
+
+    if storage not in BLOCK_STORAGE_CHOICES:
+        raise ImproperlyConfigured(
+            "Unknown map block storage '{}', use one of {}".format(
+                storage, ", ".join(BLOCK_STORAGE_CHOICES)
+            )
+        )
+
+    if not value:
+        return value
+
+    if storage == BLOCK_STORAGE_EWKT and isinstance(value, str):
+        return value
+
+    try:
+        point_value = to_geo_point_value(value)
+    except Exception:
+        return value
+
+    if storage == BLOCK_STORAGE_EWKT:
+        return point_value.ewkt
+
+    if storage == BLOCK_STORAGE_ARRAY and point_value.srid == 4326:
+        return [point_value.lng, point_value.lat]
+
+    return point_value.as_dict()
+
+
+def bulk_to_geo_point_values(values) -> List[GeoPointValue]:
+    """
+    Converts the stored values of the map blocks in a stream in one pass,
+    blocks with the same location share a GeoPointValue.
+    """
+
+    converted: Dict[str, GeoPointValue] = {}
+    result = []
+    append = result.append
+    from_parsed = GeoPointValue.from_parsed
+
+    for value in values:
+        if value.__class__ is not str:
+            append(to_geo_point_value(value))
+            continue
+
+        point_value = converted.get(value)
+        if point_value is None:
+            point = parse_geosgeometry(value)
+            if point is None:
+                raise Exception("Error: Cannot parse '{}' into struct".format(value))
+            point_value = converted[value] = from_parsed(point, value)
+        append(point_value)
+
+    return result
+
 
 class GeoAddressBlock(FieldBlock):
     class Meta:
@@ -84,6 +295,8 @@ class GoogleMapsBlock(FieldBlock):
                 value["lng"],
                 value["lat"],
             )
+        elif isinstance(value, GeoPointValue):
+            value = value.ewkt
 
         return super().render_form(value, prefix, errors)
 
@@ -97,6 +310,9 @@ class GoogleMapsBlock(FieldBlock):
         if value and isinstance(value, str):
             return value
 
+        if isinstance(value, GeoPointValue) and value.srid == 4326:
+            return value.ewkt
+
         val = "SRID={};POINT({} {})".format(
             4326,
             value["lng"],
@@ -105,20 +321,19 @@ class GoogleMapsBlock(FieldBlock):
         return val
 
     def to_python(self, value):
-        if isinstance(value, dict):
-            return value
+        return super().to_python(to_geo_point_value(value))
 
-        value = geosgeometry_str_to_struct(value)
-        if not value:
-            raise Exception("Error: Cannot parse '{}' into struct".format(value))
+    def bulk_to_python(self, values):
+        return bulk_to_geo_point_values(values)
 
-        value = {
-            "lat": value["y"],
-            "lng": value["x"],
-            "srid": value["srid"],
-        }
+    def get_prep_value(self, value):
+        return super().get_prep_value(get_storage_value(value))
+
+    def get_api_representation(self, value, context=None):
+        if isinstance(value, GeoPointValue):
+            return value.as_dict()
 
-        return super().to_python(value)
+        return super().get_api_representation(value, context)
 
 
 class LeafletBlock(FieldBlock):
@@ -161,6 +376,8 @@ class LeafletBlock(FieldBlock):
                 value["lng"],
                 value["lat"],
             )
+        elif isinstance(value, GeoPointValue):
+            value = value.ewkt
 
         return super().render_form(value, prefix, errors)
 
@@ -174,6 +391,9 @@ class LeafletBlock(FieldBlock):
         if value and isinstance(value, str):
             return value
 
+        if isinstance(value, GeoPointValue) and value.srid == 4326:
+            return value.ewkt
+
         val = "SRID={};POINT({} {})".format(
             4326,
             value["lng"],
@@ -182,14 +402,16 @@ class LeafletBlock(FieldBlock):
         return val
 
     def to_python(self, value):
-        if isinstance(value, dict):
-            return value
+        return super().to_python(to_geo_point_value(value))
 
-        value = geosgeometry_str_to_struct(value)
-        value = {
-            "lat": value["y"],
-            "lng": value["x"],
-            "srid": value["srid"],
-        }
+    def bulk_to_python(self, values):
+        return bulk_to_geo_point_values(values)
+
+    def get_prep_value(self, value):
+        return super().get_prep_value(get_storage_value(value))
+
+    def get_api_representation(self, value, context=None):
+        if isinstance(value, GeoPointValue):
+            return value.as_dict()
 
-        return super().to_python(value)
+        return super().get_api_representation(value, context)
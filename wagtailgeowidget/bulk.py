@@ -0,0 +1,112 @@
+import math
+from array import array
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # NOQA
+    np = None
+
+from wagtailgeowidget.helpers import ParsedPoint, parse_geosgeometry, parse_many
+
+DEFAULT_CHUNK_SIZE = 2000
+
+LOCATION_DTYPE = [("srid", "i4"), ("lng", "f8"), ("lat", "f8")]
+
+
+def location_columns(
+    queryset, field_name: str = "location", chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Union["np.ndarray", Dict[str, array]]:
+    """
+    Loads the srid/lng/lat of every row in queryset into columns without
+    building model instances. Supports both PointField and the nospatial
+    CharField storage (SRID=4326;POINT(lng lat)), rows without a parseable
+    location are skipped.
+
+    Returns a NumPy structured array with the fields srid, lng and lat, or
+    a dict with the same keys holding array columns when NumPy is missing.
+    Both can be indexed as result["lng"].
+    """
+
+    srids = array("l")
+    lngs = array("d")
+    lats = array("d")
+
+    values = queryset.values_list(field_name, flat=True).iterator(chunk_size=chunk_size)
+
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= chunk_size:
+            _append_chunk(chunk, srids, lngs, lats)
+            chunk = []
+
+    if chunk:
+        _append_chunk(chunk, srids, lngs, lats)
+
+    if np is None:
+        return {"srid": srids, "lng": lngs, "lat": lats}
+
+    result = np.empty(len(lngs), dtype=LOCATION_DTYPE)
+    result["srid"] = np.frombuffer(srids, dtype=srids.typecode)
+    result["lng"] = np.frombuffer(lngs, dtype="f8")
+    result["lat"] = np.frombuffer(lats, dtype="f8")
+    return result
+
+
+def _append_chunk(chunk, srids: array, lngs: array, lats: array) -> None:
+    if all(isinstance(value, str) for value in chunk):
+        chunk_srids, chunk_lngs, chunk_lats = parse_many(chunk)
+        if not any(map(math.isnan, chunk_lngs)):
+            srids.extend(chunk_srids)
+            lngs.extend(chunk_lngs)
+            lats.extend(chunk_lats)
+            return
+
+        # parse_many keeps unparseable rows as NaN, drop them here
+        for srid, lng, lat in zip(chunk_srids, chunk_lngs, chunk_lats):
+            if not math.isnan(lng):
+                srids.append(srid)
+                lngs.append(lng)
+                lats.append(lat)
+        return
+
+    # PointField values are GEOS points, mixed with None for empty rows
+    for value in chunk:
+        point = parse_location(value)
+        if point is None:
+            continue
+
+        srids.append(point.srid)
+        lngs.append(point.x)
+        lats.append(point.y)
+
+
+def parse_location(value) -> Optional[ParsedPoint]:
+    """
+    Returns the srid/x/y of a PointField or nospatial location value, or
+    None for empty and unparseable values.
+    """
+
+    if not value:
+        return None
+
+    if isinstance(value, str):
+        return parse_geosgeometry(value)
+
+    return ParsedPoint(value.srid or 0, value.x, value.y)
+
+
+def iter_locations(
+    queryset, field_name: str = "location", chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Tuple[Any, float, float]]:
+    """
+    Yields (pk, lng, lat) for every row in queryset with a parseable
+    location, without building model instances.
+    """
+
+    values = queryset.values_list("pk", field_name).iterator(chunk_size=chunk_size)
+    for pk, value in values:
+        point = parse_location(value)
+        if point is not None:
+            yield pk, point.x, point.y
@@ -0,0 +1,287 @@
+import math
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from wagtailgeowidget.helpers import split_bbox
+from wagtailgeowidget.indexes import IndexedSource, register_source
+
+# Cluster radius in pixels and the last zoom level points are clustered at,
+# above it every point is returned on its own
+DEFAULT_RADIUS = 60
+DEFAULT_MAX_ZOOM = 16
+
+TILE_SIZE = 256
+
+MAX_LATITUDE = 85.0511287798066
+
+
+def lng_to_x(lng: float) -> float:
+    return lng / 360.0 + 0.5
+
+
+def lat_to_y(lat: float) -> float:
+    """
+    Returns the Web Mercator y of lat, between 0 (north) and 1 (south).
+    """
+
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    sin = math.sin(math.radians(lat))
+    return 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+
+
+def x_to_lng(x: float) -> float:
+    return (x - 0.5) * 360.0
+
+
+def y_to_lat(y: float) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+def iter_cells(cells: dict, scale: float, min_x, min_y, max_x, max_y):
+    """
+    Yields the values of a {(cx, cy): value} grid of cells 1 / scale wide
+    overlapping the area between min_x/min_y and max_x/max_y.
+    """
+
+    min_cx, max_cx = int(min_x * scale), int(max_x * scale)
+    min_cy, max_cy = int(min_y * scale), int(max_y * scale)
+
+    # Scanning all cells is cheaper than looking up an area larger than
+    # the occupied cells
+    if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(cells):
+        for (cx, cy), cell in cells.items():
+            if min_cx <= cx <= max_cx and min_cy <= cy <= max_cy:
+                yield cell
+        return
+
+    for cx in range(min_cx, max_cx + 1):
+        for cy in range(min_cy, max_cy + 1):
+            cell = cells.get((cx, cy))
+            if cell is not None:
+                yield cell
+
+
+class Cluster(NamedTuple):
+    lng: float
+    lat: float
+    count: int
+    # Primary key of the object when the cluster is a single point
+    pk: Any = None
+
+
+class ClusterIndex:
+    """
+    Grid clusters of a set of points for every zoom level up to max_zoom.
+
+    Each zoom level maps grid cells of radius pixels to the count and the
+    coordinate sums of the points inside them, so points are added and
+    removed in O(max_zoom) and a viewport is answered by looking up the
+    cells it covers, then merging clusters split by cell borders. Cells
+    also hold the XOR of their point slots, which is the slot of the
+    remaining point once a cell is down to one.
+    """
+
+    def __init__(self, radius: int = DEFAULT_RADIUS, max_zoom: int = DEFAULT_MAX_ZOOM):
+        self.radius = radius
+        self.max_zoom = max_zoom
+        self.scales = [TILE_SIZE * 2**zoom / radius for zoom in range(max_zoom + 1)]
+        self.grids: List[Dict[Tuple[int, int], list]] = [
+            {} for _zoom in range(max_zoom + 1)
+        ]
+        # Slots of the points in the cells of the last zoom level, used for
+        # returning single points above max_zoom
+        self.members: Dict[Tuple[int, int], set] = {}
+
+        self.points: Dict[Any, Tuple[int, float, float]] = {}
+        self.slots: List[Any] = []
+        self.free_slots: List[int] = []
+        self.version = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, pk, lng: float, lat: float) -> None:
+        if pk in self.points:
+            self.remove(pk)
+
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.slots[slot] = pk
+        else:
+            slot = len(self.slots)
+            self.slots.append(pk)
+
+        x = lng_to_x(max(min(lng, 180.0), -180.0))
+        y = lat_to_y(lat)
+        self.points[pk] = (slot, x, y)
+
+        for scale, grid in zip(self.scales, self.grids):
+            key = (int(x * scale), int(y * scale))
+            cell = grid.get(key)
+            if cell is None:
+                grid[key] = [1, x, y, slot]
+            else:
+                cell[0] += 1
+                cell[1] += x
+                cell[2] += y
+                cell[3] ^= slot
+
+        self.members.setdefault(key, set()).add(slot)
+
+    def remove(self, pk) -> None:
+        point = self.points.pop(pk, None)
+        if point is None:
+            return
+
+        slot, x, y = point
+        self.slots[slot] = None
+        self.free_slots.append(slot)
+
+        for scale, grid in zip(self.scales, self.grids):
+            key = (int(x * scale), int(y * scale))
+            cell = grid[key]
+            if cell[0] == 1:
+                del grid[key]
+            else:
+                cell[0] -= 1
+                cell[1] -= x
+                cell[2] -= y
+                cell[3] ^= slot
+
+        members = self.members[key]
+        members.discard(slot)
+        if not members:
+            del self.members[key]
+
+    def get_clusters(
+        self, bbox: Tuple[float, float, float, float], zoom: int
+    ) -> List[Cluster]:
+        """
+        Returns the clusters with their centroid inside bbox at zoom, bbox
+        may extend past the antimeridian as Leaflet bounds do.
+        """
+
+        zoom = max(int(zoom), 0)
+        points = []
+        for min_lng, min_lat, max_lng, max_lat in split_bbox(bbox):
+            min_x, max_x = lng_to_x(min_lng), lng_to_x(max_lng)
+            min_y, max_y = lat_to_y(max_lat), lat_to_y(min_lat)
+            if zoom > self.max_zoom:
+                self._add_points(points, min_x, min_y, max_x, max_y)
+            else:
+                self._add_clusters(points, zoom, min_x, min_y, max_x, max_y)
+
+        if zoom <= self.max_zoom:
+            points = self._merge_neighbours(points, self.scales[zoom])
+
+        return [
+            Cluster(x_to_lng(x), y_to_lat(y), count, pk) for x, y, count, pk in points
+        ]
+
+    def _add_clusters(self, points: list, zoom: int, min_x, min_y, max_x, max_y):
+        cells = iter_cells(
+            self.grids[zoom], self.scales[zoom], min_x, min_y, max_x, max_y
+        )
+        for count, sum_x, sum_y, slot in cells:
+            x = sum_x / count
+            y = sum_y / count
+            if min_x <= x <= max_x and min_y <= y <= max_y:
+                points.append((x, y, count, self.slots[slot] if count == 1 else None))
+
+    def _add_points(self, points: list, min_x, min_y, max_x, max_y):
+        cells = iter_cells(self.members, self.scales[-1], min_x, min_y, max_x, max_y)
+        for slots in cells:
+            for slot in slots:
+                pk = self.slots[slot]
+                _slot, x, y = self.points[pk]
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    points.append((x, y, 1, pk))
+
+    def _merge_neighbours(self, points: list, scale: float) -> list:
+        """
+        Merges clusters closer than the radius, which grid cells split when
+        their points are on both sides of a cell border.
+        """
+
+        if len(points) < 2:
+            return points
+
+        # Largest clusters absorb their neighbours
+        points.sort(key=lambda point: -point[2])
+
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        for i, (x, y, _count, _pk) in enumerate(points):
+            buckets.setdefault((int(x * scale), int(y * scale)), []).append(i)
+
+        radius_sq = (1 / scale) ** 2
+        merged = [False] * len(points)
+        result = []
+
+        for i, (x, y, count, pk) in enumerate(points):
+            if merged[i]:
+                continue
+            merged[i] = True
+
+            cx, cy = int(x * scale), int(y * scale)
+            sum_x, sum_y, total = x * count, y * count, count
+            for nx in range(cx - 1, cx + 2):
+                for ny in range(cy - 1, cy + 2):
+                    for j in buckets.get((nx, ny), ()):
+                        if merged[j]:
+                            continue
+
+                        other_x, other_y, other_count, _pk = points[j]
+                        if (other_x - x) ** 2 + (other_y - y) ** 2 <= radius_sq:
+                            merged[j] = True
+                            sum_x += other_x * other_count
+                            sum_y += other_y * other_count
+                            total += other_count
+
+            if total == count:
+                result.append((x, y, count, pk))
+            else:
+                result.append((sum_x / total, sum_y / total, total, None))
+
+        return result
+
+
+class ClusterSource(IndexedSource):
+    """
+    A model location field clustered for front end maps.
+    """
+
+    name = "clusters"
+
+    def __init__(
+        self,
+        model,
+        location_field: str = "location",
+        queryset=None,
+        radius: int = DEFAULT_RADIUS,
+        max_zoom: int = DEFAULT_MAX_ZOOM,
+    ):
+        super().__init__(model, location_field, queryset=queryset)
+        self.radius = radius
+        self.max_zoom = max_zoom
+
+    def create_index(self) -> ClusterIndex:
+        return ClusterIndex(radius=self.radius, max_zoom=self.max_zoom)
+
+    def add_to_index(self, index, pk, lng, lat, values):
+        index.add(pk, lng, lat)
+
+    def get_clusters(
+        self, bbox: Tuple[float, float, float, float], zoom: int
+    ) -> List[Cluster]:
+        with self._lock:
+            return self.get_index().get_clusters(bbox, zoom)
+
+
+def register_cluster_source(
+    model, location_field: str = "location", **options
+) -> ClusterSource:
+    """
+    Registers a location field for clustering, returning the existing source
+    when it was already registered.
+    """
+
+    return register_source(ClusterSource, model, location_field, **options)
@@ -0,0 +1,91 @@
+from typing import Iterator, List, NamedTuple, Optional, Type
+
+from django.apps import apps
+from django.db import models
+from wagtail.admin.panels import get_edit_handler
+from wagtail.models import Page
+
+from wagtailgeowidget import geocoders
+from wagtailgeowidget.panels import GeoAddressPanel, GoogleMapsPanel, LeafletPanel
+
+
+class LocationSource(NamedTuple):
+    model: Type[models.Model]
+    location_field: str
+    address_field: Optional[str]
+    zoom_field: Optional[str]
+    geocoder: Optional[str]
+
+
+def _walk_panels(panel) -> Iterator:
+    yield panel
+
+    for child in getattr(panel, "children", []):
+        yield from _walk_panels(child)
+
+
+def get_model_edit_handler(model):
+    if issubclass(model, Page):
+        return model.get_edit_handler()
+
+    return get_edit_handler(model)
+
+
+def get_location_sources(model) -> List[LocationSource]:
+    """
+    Returns the location fields edited with GoogleMapsPanel/LeafletPanel on
+    model, along with the linked address field and its geocoder.
+    """
+
+    panels = list(_walk_panels(get_model_edit_handler(model)))
+
+    address_geocoders = {
+        panel.field_name: panel.geocoder
+        for panel in panels
+        if isinstance(panel, GeoAddressPanel)
+    }
+
+    sources = []
+    for panel in panels:
+        if not isinstance(panel, (GoogleMapsPanel, LeafletPanel)):
+            continue
+
+        address_field = panel.address_field or None
+        geocoder = None
+        if address_field:
+            geocoder = address_geocoders.get(address_field, geocoders.NOMINATIM)
+
+        sources.append(
+            LocationSource(
+                model=model,
+                location_field=panel.field_name,
+                address_field=address_field,
+                zoom_field=panel.zoom_field or None,
+                geocoder=geocoder,
+            )
+        )
+
+    return sources
+
+
+def find_location_sources() -> List[LocationSource]:
+    """
+    Finds all concrete models using GoogleMapsPanel/LeafletPanel.
+    """
+
+    sources = []
+    for model in apps.get_models():
+        if model._meta.abstract or model._meta.proxy:
+            continue
+
+        if model is Page:
+            continue
+
+        # Only pages and models with explicit panels can use the geo panels
+        has_panels = hasattr(model, "panels") or hasattr(model, "edit_handler")
+        if not issubclass(model, Page) and not has_panels:
+            continue
+
+        sources.extend(get_location_sources(model))
+
+    return sources
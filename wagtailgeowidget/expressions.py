@@ -0,0 +1,60 @@
+import math
+from typing import Tuple
+
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import (
+    ASin,
+    Cast,
+    Cos,
+    Least,
+    Length,
+    NullIf,
+    Power,
+    Radians,
+    Sin,
+    Sqrt,
+    StrIndex,
+    Substr,
+)
+
+from wagtailgeowidget.helpers import EARTH_RADIUS
+
+
+def location_coordinates(field_name: str, condition=None) -> Tuple[Case, Case]:
+    """
+    Returns expressions reading the lng and lat of the nospatial location
+    strings (SRID=4326;POINT(lng lat)) in field_name in the database. Rows
+    not matching the condition (a Q) are skipped and get NULL, so only rows
+    known to hold a location are cast.
+    """
+
+    # "lng lat)"
+    coords = Substr(F(field_name), StrIndex(F(field_name), Value("(")) + 1)
+    space = StrIndex(coords, Value(" "))
+
+    def to_float(value):
+        number = Cast(NullIf(value, Value("")), FloatField())
+        if condition is None:
+            return number
+        return Case(When(condition, then=number), output_field=FloatField())
+
+    lng = Substr(coords, 1, space - 1)
+    lat = Substr(coords, space + 1, Length(coords) - space - 1)
+    return to_float(lng), to_float(lat)
+
+
+def haversine_distance(lat: float, lng: float, lat_expression, lng_expression):
+    """
+    Returns an expression computing the great circle distance in meters
+    from lat/lng, with the same formula as helpers.distance.
+    """
+
+    lat_rad = math.radians(lat)
+    lng_rad = math.radians(lng)
+    point_lat = Radians(lat_expression)
+    point_lng = Radians(lng_expression)
+
+    a = Power(Sin((point_lat - lat_rad) / 2), 2) + math.cos(lat_rad) * Cos(
+        point_lat
+    ) * Power(Sin((point_lng - lng_rad) / 2), 2)
+    return 2 * EARTH_RADIUS * ASin(Least(Sqrt(a), Value(1.0)))
@@ -1,5 +1,272 @@
+import json
+import threading
+from typing import Dict, List
+
+from wagtailgeowidget.upstream import (
+    SingleFlight,
+    UpstreamError,
+    get_rate_limiter,
+    pool,
+)
+
 NOMINATIM = "nominatim"
 GOOGLE_MAPS = "google_maps"
 GOOGLE_MAPS_PLACES = "google_maps_places"
 GOOGLE_MAPS_PLACES_NEW = "google_maps_places_new"
 MAPBOX = "mapbox"
+
+
+class GeocoderError(Exception):
+    pass
+
+
+class Geocoder:
+    """
+    Base class for server side geocoder clients. Requests share a rate
+    limiter per provider, a connection pool and are coalesced so concurrent
+    identical queries result in a single upstream call.
+    """
+
+    provider = None
+    rate = 1.0
+    burst = 1
+
+    def __init__(self):
+        self.single_flight = SingleFlight()
+
+    @property
+    def rate_limiter(self):
+        from wagtailgeowidget import app_settings
+
+        rate = app_settings.GEO_WIDGET_GEOCODER_RATE_LIMITS.get(
+            self.provider, self.rate
+        )
+        return get_rate_limiter(self.provider, rate, self.burst)
+
+    def get_json(self, url: str, params: Dict, payload_type=dict):
+        self.rate_limiter.acquire()
+
+        try:
+            response = pool.request(
+                "GET", url, params=params, headers={"Accept": "application/json"}
+            )
+        except UpstreamError as e:
+            raise GeocoderError(str(e))
+
+        if response.status != 200:
+            raise GeocoderError(
+                "{} responded with status {}".format(self.provider, response.status)
+            )
+
+        try:
+            data = json.loads(response.body.decode("utf-8"))
+        except ValueError as e:
+            raise GeocoderError(str(e))
+
+        if not isinstance(data, payload_type):
+            raise GeocoderError(
+                "Unexpected response from {}: {}".format(
+                    self.provider, type(data).__name__
+                )
+            )
+
+        return data
+
+    def parse(self, parser, data):
+        """
+        Returns parser(data), payloads missing the expected keys or values
+        are reported like other provider errors. Only reading the payload is
+        guarded, so programming errors elsewhere still surface.
+        """
+
+        try:
+            return parser(data)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise GeocoderError(
+                "Unexpected response from {}: {!r}".format(self.provider, e)
+            )
+
+    def geocode(self, query: str) -> List[Dict]:
+        """
+        Returns a list of {"lat", "lng", "address"} dicts matching query.
+        """
+
+        return self.single_flight.do(("geocode", query), lambda: self._geocode(query))
+
+    def _geocode(self, query: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def reverse(self, lat: float, lng: float) -> str:
+        """
+        Returns the address at lat/lng, or an empty string when there is none.
+        """
+
+        return self.single_flight.do(
+            ("reverse", lat, lng), lambda: self._reverse(lat, lng)
+        )
+
+    def _reverse(self, lat: float, lng: float) -> str:
+        raise NotImplementedError
+
+
+class NominatimGeocoder(Geocoder):
+    provider = NOMINATIM
+
+    def _geocode(self, query):
+        from wagtailgeowidget import app_settings
+
+        data = self.get_json(
+            "{}/search".format(app_settings.GEO_WIDGET_NOMINATIM_URL),
+            {"q": query, "format": "json", "limit": 1},
+            payload_type=list,
+        )
+
+        return self.parse(
+            lambda items: [
+                {
+                    "lat": float(item["lat"]),
+                    "lng": float(item["lon"]),
+                    "address": item.get("display_name", ""),
+                }
+                for item in items
+            ],
+            data,
+        )
+
+    def _reverse(self, lat, lng):
+        from wagtailgeowidget import app_settings
+
+        data = self.get_json(
+            "{}/reverse".format(app_settings.GEO_WIDGET_NOMINATIM_URL),
+            {"lat": lat, "lon": lng, "format": "json"},
+        )
+
+        # Locations without an address, such as the sea, respond with an error
+        return data.get("display_name", "")
+
+
+class GoogleMapsGeocoder(Geocoder):
+    provider = GOOGLE_MAPS
+    rate = 50.0
+    burst = 10
+
+    def get_results(self, params: Dict) -> List[Dict]:
+        from wagtailgeowidget import app_settings
+        from wagtailgeowidget.api_keys import get_google_maps_api_key
+
+        data = self.get_json(
+            "{}/maps/api/geocode/json".format(app_settings.GEO_WIDGET_GOOGLE_MAPS_URL),
+            {
+                **params,
+                "key": get_google_maps_api_key(),
+                "language": app_settings.GOOGLE_MAPS_V3_LANGUAGE,
+            },
+        )
+
+        status = data.get("status")
+
+        if status == "ZERO_RESULTS":
+            return []
+
+        if status != "OK":
+            raise GeocoderError(data.get("error_message", status or "No status"))
+
+        return data.get("results", [])
+
+    def _geocode(self, query):
+        return self.parse(
+            lambda results: [
+                {
+                    "lat": float(item["geometry"]["location"]["lat"]),
+                    "lng": float(item["geometry"]["location"]["lng"]),
+                    "address": item.get("formatted_address", ""),
+                }
+                for item in results
+            ],
+            self.get_results({"address": query}),
+        )
+
+    def _reverse(self, lat, lng):
+        return self.parse(
+            lambda results: results[0].get("formatted_address", "") if results else "",
+            self.get_results({"latlng": "{},{}".format(lat, lng)}),
+        )
+
+
+class MapboxGeocoder(Geocoder):
+    provider = MAPBOX
+    rate = 10.0
+    burst = 5
+
+    def get_features(self, endpoint: str, params: Dict) -> List[Dict]:
+        from wagtailgeowidget import app_settings
+
+        data = self.get_json(
+            "{}/search/geocode/v6/{}".format(
+                app_settings.GEO_WIDGET_MAPBOX_URL, endpoint
+            ),
+            {
+                **params,
+                "access_token": app_settings.MAPBOX_ACCESS_TOKEN,
+                "language": app_settings.MAPBOX_LANGUAGE,
+            },
+        )
+
+        # https://docs.mapbox.com/api/search/geocoding/#geocoding-api-errors
+        if "message" in data:
+            raise GeocoderError(data["message"])
+
+        return data.get("features", [])
+
+    def _geocode(self, query):
+        return self.parse(
+            lambda features: [
+                {
+                    "lat": float(feature["geometry"]["coordinates"][1]),
+                    "lng": float(feature["geometry"]["coordinates"][0]),
+                    "address": get_full_address(feature),
+                }
+                for feature in features
+            ],
+            self.get_features("forward", {"q": query, "limit": 1}),
+        )
+
+    def _reverse(self, lat, lng):
+        return self.parse(
+            lambda features: get_full_address(features[0]) if features else "",
+            self.get_features("reverse", {"latitude": lat, "longitude": lng}),
+        )
+
+
+def get_full_address(feature: Dict) -> str:
+    return feature.get("properties", {}).get("full_address", "")
+
+
+geocoder_classes = {
+    NOMINATIM: NominatimGeocoder,
+    GOOGLE_MAPS: GoogleMapsGeocoder,
+    GOOGLE_MAPS_PLACES: GoogleMapsGeocoder,
+    GOOGLE_MAPS_PLACES_NEW: GoogleMapsGeocoder,
+    MAPBOX: MapboxGeocoder,
+}
+
+_geocoders: Dict[str, Geocoder] = {}
+_geocoders_lock = threading.Lock()
+
+
+def get_geocoder(name: str) -> Geocoder:
+    """
+    Returns the shared client for the geocoder constant name.
+    """
+
+    with _geocoders_lock:
+        geocoder = _geocoders.get(name)
+        if geocoder is None:
+            try:
+                geocoder_class = geocoder_classes[name]
+            except KeyError:
+                raise GeocoderError("Unknown geocoder '{}'".format(name))
+
+            geocoder = _geocoders[name] = geocoder_class()
+
+    return geocoder
@@ -0,0 +1,262 @@
+from typing import List, Optional, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models import F, Q
+from wagtail.query import PageQuerySet
+
+from wagtailgeowidget.bulk import DEFAULT_CHUNK_SIZE, iter_locations, parse_location
+from wagtailgeowidget.expressions import haversine_distance, location_coordinates
+from wagtailgeowidget.geojson import filter_bbox, is_point_field
+from wagtailgeowidget.helpers import (
+    GEOHASH_ALPHABET,
+    GEOHASH_MAX_PRECISION,
+    geohash_cell,
+    geohash_cell_to_str,
+    geohash_encode,
+    geohash_encode_many,
+    get_radius_bbox,
+    split_bbox,
+)
+
+# Max geohash cells a bbox is covered with, neighbouring cells are then
+# merged into fewer ranges
+DEFAULT_MAX_CELLS = 32
+
+
+def next_prefix(prefix: str) -> Optional[str]:
+    """
+    Returns the first geohash sorting after every geohash starting with
+    prefix, or None when there is none.
+    """
+
+    prefix = prefix.rstrip(GEOHASH_ALPHABET[-1])
+    if not prefix:
+        return None
+
+    next_char = GEOHASH_ALPHABET[GEOHASH_ALPHABET.index(prefix[-1]) + 1]
+    return prefix[:-1] + next_char
+
+
+def get_geohash_ranges(
+    bbox: Tuple[float, float, float, float],
+    max_cells: int = DEFAULT_MAX_CELLS,
+    max_precision: int = GEOHASH_MAX_PRECISION,
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Covers bbox with the longest geohashes that take at most max_cells
+    cells, and returns them as sorted (start, end) ranges of geohashes,
+    end excluded and None when unbounded.
+    """
+
+    parts = split_bbox(bbox)
+
+    precision = 1
+    for candidate in range(2, max_precision + 1):
+        count = 0
+        for min_lng, min_lat, max_lng, max_lat in parts:
+            min_x, min_y = geohash_cell(min_lat, min_lng, candidate)
+            max_x, max_y = geohash_cell(max_lat, max_lng, candidate)
+            count += (max_x - min_x + 1) * (max_y - min_y + 1)
+
+        if count > max_cells:
+            break
+        precision = candidate
+
+    cells = set()
+    for min_lng, min_lat, max_lng, max_lat in parts:
+        min_x, min_y = geohash_cell(min_lat, min_lng, precision)
+        max_x, max_y = geohash_cell(max_lat, max_lng, precision)
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                cells.add(geohash_cell_to_str(x, y, precision))
+
+    ranges: List[Tuple[str, Optional[str]]] = []
+    for cell in sorted(cells):
+        # Cells following each other on the curve share one range
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], next_prefix(cell))
+        else:
+            ranges.append((cell, next_prefix(cell)))
+
+    return ranges
+
+
+def get_geohash_query(field_name: str, ranges) -> Q:
+    query = Q()
+    for start, end in ranges:
+        lookup = {"{}__gte".format(field_name): start}
+        if end is not None:
+            lookup["{}__lt".format(field_name)] = end
+        query |= Q(**lookup)
+    return query
+
+
+class GeohashField(models.CharField):
+    """
+    Stores the geohash of the location in location_field, updated every time
+    the model is saved. Indexed by default, so bbox and radius queries can
+    look up prefix ranges instead of scanning every location.
+    """
+
+    description = "Geohash of a location field"
+
+    def __init__(
+        self,
+        *args,
+        location_field: str = "location",
+        precision: int = GEOHASH_MAX_PRECISION,
+        **kwargs
+    ):
+        self.location_field = location_field
+        self.precision = precision
+
+        kwargs.setdefault("max_length", precision)
+        kwargs.setdefault("db_index", True)
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("blank", True)
+        kwargs.setdefault("null", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["location_field"] = self.location_field
+        kwargs["precision"] = self.precision
+        return name, path, args, kwargs
+
+    def get_geohash(self, model_instance) -> Optional[str]:
+        point = parse_location(getattr(model_instance, self.location_field, None))
+        if point is None:
+            return None
+        return geohash_encode(point.y, point.x, self.precision)
+
+    def pre_save(self, model_instance, add):
+        value = self.get_geohash(model_instance)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def get_geohash_field(model, field_name: Optional[str] = None) -> GeohashField:
+    if field_name:
+        field = model._meta.get_field(field_name)
+        if isinstance(field, GeohashField):
+            return field
+    else:
+        for field in model._meta.concrete_fields:
+            if isinstance(field, GeohashField):
+                return field
+
+    raise ImproperlyConfigured(
+        "{} has no GeohashField {}".format(model._meta.label, field_name or "")
+    )
+
+
+def update_geohashes(
+    queryset, field_name: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """
+    Fills the GeohashField of every row in queryset, for models the field was
+    added to or rows changed with update()/bulk_update(), which don't run
+    pre_save and leave the geohash stale. Returns the number of rows
+    updated.
+    """
+
+    field = get_geohash_field(queryset.model, field_name)
+    manager = queryset.model._default_manager
+
+    # Read before writing, so updates don't interleave with an open cursor
+    rows = list(iter_locations(queryset, field.location_field, chunk_size))
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        geohashes = geohash_encode_many(
+            [lat for _pk, _lng, lat in chunk],
+            [lng for _pk, lng, _lat in chunk],
+            field.precision,
+        )
+        manager.bulk_update(
+            [
+                queryset.model(pk=pk, **{field.attname: geohash})
+                for (pk, _lng, _lat), geohash in zip(chunk, geohashes)
+            ],
+            [field.name],
+        )
+
+    return len(rows)
+
+
+class GeohashQuerySetMixin:
+    """
+    Adds bbox and radius filtering using the GeohashField of the model, the
+    rows in the covering geohash ranges are filtered exactly on their
+    coordinates in the same query.
+    """
+
+    def _filter_geohash_ranges(self, bbox, field: GeohashField):
+        # Cells bigger than the field precision can't be looked up
+        ranges = get_geohash_ranges(bbox, max_precision=field.precision)
+        return self.filter(get_geohash_query(field.attname, ranges))
+
+    def _alias_coordinates(self, field: GeohashField):
+        # Rows with a geohash hold a parseable location
+        lng, lat = location_coordinates(
+            field.location_field, Q(**{"{}__isnull".format(field.attname): False})
+        )
+        return self.alias(geohash_lng=lng, geohash_lat=lat)
+
+    def within_bbox(
+        self, bbox: Tuple[float, float, float, float], field_name: Optional[str] = None
+    ):
+        """
+        Returns the objects located inside min_lng, min_lat, max_lng, max_lat.
+        """
+
+        field = get_geohash_field(self.model, field_name)
+        queryset = self._filter_geohash_ranges(bbox, field)
+
+        if is_point_field(self.model, field.location_field):
+            return filter_bbox(queryset, field.location_field, bbox)
+
+        query = Q()
+        for min_lng, min_lat, max_lng, max_lat in split_bbox(bbox):
+            query |= Q(
+                geohash_lng__gte=min_lng,
+                geohash_lng__lte=max_lng,
+                geohash_lat__gte=min_lat,
+                geohash_lat__lte=max_lat,
+            )
+        return queryset._alias_coordinates(field).filter(query)
+
+    def within_distance(
+        self, lat: float, lng: float, radius: float, field_name: Optional[str] = None
+    ):
+        """
+        Returns the objects located within radius meters of lat/lng.
+        """
+
+        field = get_geohash_field(self.model, field_name)
+        queryset = self._filter_geohash_ranges(get_radius_bbox(lat, lng, radius), field)
+
+        if is_point_field(self.model, field.location_field):
+            from django.contrib.gis.geos import Point
+            from django.contrib.gis.measure import D
+
+            lookup = "{}__distance_lte".format(field.location_field)
+            return queryset.filter(
+                **{lookup: (Point(lng, lat, srid=4326), D(m=radius))}
+            )
+
+        queryset = queryset._alias_coordinates(field)
+        return queryset.alias(
+            geohash_distance=haversine_distance(
+                lat, lng, F("geohash_lat"), F("geohash_lng")
+            )
+        ).filter(geohash_distance__lte=radius)
+
+
+class GeohashQuerySet(GeohashQuerySetMixin, models.QuerySet):
+    pass
+
+
+class GeohashPageQuerySet(GeohashQuerySetMixin, PageQuerySet):
+    pass
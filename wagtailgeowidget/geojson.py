@@ -0,0 +1,169 @@
+import logging
+from functools import lru_cache
+from typing import Iterator, Optional, Sequence, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from wagtailgeowidget.bulk import DEFAULT_CHUNK_SIZE, parse_location
+from wagtailgeowidget.helpers import ParsedPoint, split_bbox
+
+FEATURE_COLLECTION_START = '{"type":"FeatureCollection","features":['
+FEATURE_COLLECTION_END = "]}"
+
+logger = logging.getLogger(__name__)
+
+
+def is_point_field(model, field_name: str) -> bool:
+    return model._meta.get_field(field_name).get_internal_type() == "PointField"
+
+
+@lru_cache(maxsize=None)
+def _load_transform():
+    # Loading the GDAL and GEOS libraries fails when they aren't installed
+    try:
+        from django.contrib.gis.gdal.error import GDALException, SRSException
+        from django.contrib.gis.geos import GEOSException, Point
+    except (ImportError, ImproperlyConfigured):
+        return None
+
+    return Point, (GDALException, SRSException, GEOSException)
+
+
+def to_wgs84(point: ParsedPoint) -> Optional[ParsedPoint]:
+    """
+    Returns point in the lng/lat coordinates of GeoJSON (srid 4326), points
+    without an srid are assumed to already be. Returns None when the point
+    can't be transformed, such as when GDAL isn't installed.
+    """
+
+    if point.srid in (0, 4326):
+        return point
+
+    transform = _load_transform()
+    if transform is None:
+        return None
+
+    Point, errors = transform
+    try:
+        geometry = Point(point.x, point.y, srid=point.srid)
+        geometry.transform(4326)
+    except errors:
+        return None
+
+    return ParsedPoint(4326, geometry.x, geometry.y)
+
+
+def filter_bbox(queryset, field_name: str, bbox: Tuple[float, float, float, float]):
+    """
+    Limits a queryset with a PointField to the locations inside bbox, using
+    the spatial index.
+    """
+
+    from django.contrib.gis.geos import Polygon
+
+    query = Q()
+    for part in split_bbox(bbox):
+        polygon = Polygon.from_bbox(part)
+        polygon.srid = 4326
+        query |= Q(**{"{}__bboverlaps".format(field_name): polygon})
+
+    return queryset.filter(query)
+
+
+def iter_geojson(
+    queryset,
+    location_field: str = "location",
+    properties: Sequence[str] = (),
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[str]:
+    """
+    Yields a GeoJSON FeatureCollection of the rows in queryset in chunks of
+    features, reading rows with a server side cursor where the database
+    supports it. Features have the object pk as id and the fields listed in
+    properties as properties, rows without a location are skipped.
+
+    With a PointField, bbox is filtered and locations are transformed to
+    srid 4326 in the database, the nospatial CharField storage is filtered
+    and transformed while parsing. Locations that can't be transformed are
+    skipped and logged, as the response has already started.
+    """
+
+    column = location_field
+    if is_point_field(queryset.model, location_field):
+        if bbox is not None:
+            queryset = filter_bbox(queryset, location_field, bbox)
+            bbox = None
+
+        if queryset.model._meta.get_field(location_field).srid != 4326:
+            from django.contrib.gis.db.models.functions import Transform
+
+            column = Transform(location_field, 4326)
+
+    parts = split_bbox(bbox) if bbox is not None else None
+
+    rows = queryset.values_list("pk", column, *properties).iterator(
+        chunk_size=chunk_size
+    )
+    encode = DjangoJSONEncoder(separators=(",", ":")).encode
+
+    yield FEATURE_COLLECTION_START
+
+    separator = ""
+    chunk = []
+    skipped = 0
+    for pk, location, *values in rows:
+        point = parse_location(location)
+        if point is None:
+            continue
+
+        point = to_wgs84(point)
+        if point is None:
+            skipped += 1
+            continue
+
+        if parts is not None and not any(
+            min_lng <= point.x <= max_lng and min_lat <= point.y <= max_lat
+            for min_lng, min_lat, max_lng, max_lat in parts
+        ):
+            continue
+
+        chunk.append(
+            separator
+            + encode(
+                {
+                    "type": "Feature",
+                    "id": pk,
+                    "geometry": {"type": "Point", "coordinates": [point.x, point.y]},
+                    "properties": dict(zip(properties, values)),
+                }
+            )
+        )
+        separator = ","
+
+        if len(chunk) >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+
+    if chunk:
+        yield "".join(chunk)
+
+    if skipped:
+        logger.warning(
+            "Skipped %d %s locations that could not be transformed to srid 4326%s",
+            skipped,
+            queryset.model._meta.label,
+            "" if _load_transform() else ", GDAL is not installed",
+        )
+
+    yield FEATURE_COLLECTION_END
+
+
+def dumps_geojson(*args, **kwargs) -> str:
+    """
+    Returns the FeatureCollection of iter_geojson as a string.
+    """
+
+    return "".join(iter_geojson(*args, **kwargs))
@@ -1,10 +1,425 @@
+import math
 import re
-from typing import Dict, Optional
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
+try:
+    import numpy as np
+except ImportError:  # NOQA
+    np = None
+
+# Kept for backwards compatibility, parsing is done by _scan_geosgeometry
 geos_ptrn = re.compile(
     r"^SRID=([0-9]{1,});POINT\s?\((-?[0-9\.]{1,})\s(-?[0-9\.]{1,})\)$"
 )
 
+PARSE_CACHE_SIZE = 4096
+
+# Mean earth radius in meters
+EARTH_RADIUS = 6371008.8
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_MAX_PRECISION = 12
+_GEOHASH_VALUES = {char: value for value, char in enumerate(GEOHASH_ALPHABET)}
+
+_DIGITS = frozenset("0123456789")
+_COORD_CHARS = frozenset("0123456789.")
+
+
+class ParsedPoint(NamedTuple):
+    srid: int
+    x: float
+    y: float
+
+
+def _scan_number(value: str, pos: int, end: int, allowed) -> int:
+    """
+    Returns the index after the run of allowed chars starting at pos.
+    """
+
+    start = pos
+    while pos < end and value[pos] in allowed:
+        pos += 1
+
+    if pos == start:
+        return -1
+
+    return pos
+
+
+def _scan_geosgeometry(value: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Hand written scanner accepting the same grammar as geos_ptrn,
+    returning the raw srid, x and y substrings.
+    """
+
+    end = len(value)
+
+    # Mirror re's "$" which also matches before a single trailing newline
+    if end and value[end - 1] == "\n":
+        end -= 1
+
+    if not value.startswith("SRID="):
+        return None
+
+    srid_start = 5
+    pos = _scan_number(value, srid_start, end, _DIGITS)
+    if pos == -1:
+        return None
+    srid = value[srid_start:pos]
+
+    if not value.startswith(";POINT", pos):
+        return None
+    pos += 6
+
+    if pos < end and value[pos].isspace():
+        pos += 1
+
+    if pos >= end or value[pos] != "(":
+        return None
+    pos += 1
+
+    x_start = pos
+    if pos < end and value[pos] == "-":
+        pos += 1
+    pos = _scan_number(value, pos, end, _COORD_CHARS)
+    if pos == -1:
+        return None
+    x = value[x_start:pos]
+
+    if pos >= end or not value[pos].isspace():
+        return None
+    pos += 1
+
+    y_start = pos
+    if pos < end and value[pos] == "-":
+        pos += 1
+    pos = _scan_number(value, pos, end, _COORD_CHARS)
+    if pos == -1:
+        return None
+    y = value[y_start:pos]
+
+    if pos != end - 1 or value[pos] != ")":
+        return None
+
+    return srid, x, y
+
+
+def _to_parsed_point(result) -> Optional[ParsedPoint]:
+    if not result:
+        return None
+
+    srid, x, y = result
+
+    try:
+        return ParsedPoint(int(srid), float(x), float(y))
+    except ValueError:
+        return None
+
+
+# The only parse cache, holding both the raw substrings and the immutable
+# typed point. Callers check for str first since lru_cache can't hash other
+# values
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _cached_parse_geosgeometry(
+    value: str,
+) -> Tuple[Optional[Tuple[str, str, str]], Optional[ParsedPoint]]:
+    result = _scan_geosgeometry(value)
+    return result, _to_parsed_point(result)
+
+
+def parse_geosgeometry(value: str) -> Optional[ParsedPoint]:
+    """
+    Parses a geosgeometry string into a typed ParsedPoint, memoized on the
+    raw string.
+
+    Example:
+        SRID=5432;POINT(12.0 13.0)
+    Returns:
+        >> ParsedPoint(srid=5432, x=12.0, y=13.0)
+    """
+
+    if not isinstance(value, str):
+        return None
+
+    return _cached_parse_geosgeometry(value)[1]
+
+
+def parse_many(values: Iterable[str]) -> Tuple[array, array, array]:
+    """
+    Parses an iterable of geosgeometry strings into parallel srid, x and y
+    columns aligned with the input, values that can't be parsed get srid 0
+    and NaN coordinates. Bulk rows are mostly seen once, so they bypass the
+    parse cache instead of evicting hot entries.
+
+    Example:
+        ["SRID=4326;POINT(12.0 13.0)", "invalid"]
+    Returns:
+        >> (array('l', [4326, 0]), array('d', [12.0, nan]), array('d', [13.0, nan]))
+    """
+
+    srids = array("l")
+    xs = array("d")
+    ys = array("d")
+
+    scan = _scan_geosgeometry
+    for value in values:
+        point = _to_parsed_point(scan(value)) if isinstance(value, str) else None
+        if point is None:
+            srids.append(0)
+            xs.append(math.nan)
+            ys.append(math.nan)
+            continue
+
+        srids.append(point.srid)
+        xs.append(point.x)
+        ys.append(point.y)
+
+    return srids, xs, ys
+
+
+def parse_bbox(value: str) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Parses a min_lng,min_lat,max_lng,max_lat bounding box, as sent by
+    Leaflet's LatLngBounds.toBBoxString(). Returns None for invalid values.
+
+    Example:
+        "17.7,59.2,18.3,59.5"
+    Returns:
+        >> (17.7, 59.2, 18.3, 59.5)
+    """
+
+    try:
+        bbox = tuple(float(part) for part in value.split(","))
+    except (AttributeError, ValueError):
+        return None
+
+    if len(bbox) != 4 or not all(math.isfinite(part) for part in bbox):
+        return None
+
+    if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        return None
+
+    return bbox
+
+
+def split_bbox(
+    bbox: Tuple[float, float, float, float]
+) -> List[Tuple[float, float, float, float]]:
+    """
+    Wraps the longitudes of bbox into -180..180, splitting it in two when
+    it crosses the antimeridian. Leaflet bounds keep growing past 180 when
+    the map is panned around the world.
+
+    Example:
+        (170.0, 40.0, 200.0, 70.0)
+    Returns:
+        >> [(170.0, 40.0, 180.0, 70.0), (-180.0, 40.0, -160.0, 70.0)]
+    """
+
+    min_lng, min_lat, max_lng, max_lat = bbox
+
+    if max_lng - min_lng >= 360:
+        return [(-180.0, min_lat, 180.0, max_lat)]
+
+    min_lng = ((min_lng + 180) % 360) - 180
+    max_lng = ((max_lng + 180) % 360) - 180
+    if max_lng == -180.0 and bbox[2] > bbox[0]:
+        max_lng = 180.0
+
+    if min_lng <= max_lng:
+        return [(min_lng, min_lat, max_lng, max_lat)]
+
+    return [(min_lng, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lng, max_lat)]
+
+
+def distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Returns the great circle distance in meters between two points.
+    """
+
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(math.sqrt(a), 1.0))
+
+
+def get_radius_bbox(
+    lat: float, lng: float, radius: float
+) -> Tuple[float, float, float, float]:
+    """
+    Returns a bbox holding every point within radius meters of lat/lng.
+    """
+
+    lat_delta = math.degrees(radius / EARTH_RADIUS)
+    min_lat = max(lat - lat_delta, -90.0)
+    max_lat = min(lat + lat_delta, 90.0)
+
+    cos = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    if cos <= 0 or lat_delta / cos >= 180:
+        return (-180.0, min_lat, 180.0, max_lat)
+
+    lng_delta = lat_delta / cos
+    return (lng - lng_delta, min_lat, lng + lng_delta, max_lat)
+
+
+def _geohash_bits(precision: int) -> Tuple[int, int]:
+    # Longitude takes the even bits, so it gets the extra one of odd totals
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+
+def _spread_bits(value: int, bits: int) -> int:
+    result = 0
+    for i in range(bits):
+        result |= ((value >> i) & 1) << (2 * i)
+    return result
+
+
+def geohash_cell_to_str(lng_index: int, lat_index: int, precision: int) -> str:
+    """
+    Returns the geohash of the cell at lng_index/lat_index of the grid of
+    geohashes of length precision.
+    """
+
+    lng_bits, lat_bits = _geohash_bits(precision)
+    total = lng_bits + lat_bits
+    # The first bit is a longitude bit, placed at the top of the code
+    code = _spread_bits(lng_index, lng_bits) << (total - 2 * lng_bits + 1)
+    code |= _spread_bits(lat_index, lat_bits) << (total - 2 * lat_bits)
+
+    return "".join(
+        GEOHASH_ALPHABET[(code >> (5 * (precision - 1 - i))) & 31]
+        for i in range(precision)
+    )
+
+
+def geohash_cell(lat: float, lng: float, precision: int) -> Tuple[int, int]:
+    """
+    Returns the lng_index/lat_index of the geohash cell holding lat/lng.
+    """
+
+    lng_bits, lat_bits = _geohash_bits(precision)
+    lng_index = int((lng + 180.0) / 360.0 * (1 << lng_bits))
+    lat_index = int((lat + 90.0) / 180.0 * (1 << lat_bits))
+
+    return (
+        min(max(lng_index, 0), (1 << lng_bits) - 1),
+        min(max(lat_index, 0), (1 << lat_bits) - 1),
+    )
+
+
+def geohash_encode(
+    lat: float, lng: float, precision: int = GEOHASH_MAX_PRECISION
+) -> str:
+    """
+    Encodes a lat/lng as a geohash of precision characters.
+
+    Example:
+        geohash_encode(57.64911, 10.40744, 11)
+    Returns:
+        >> "u4pruydqqvj"
+    """
+
+    return geohash_cell_to_str(*geohash_cell(lat, lng, precision), precision)
+
+
+def geohash_encode_many(
+    lats: Sequence[float], lngs: Sequence[float], precision: int = GEOHASH_MAX_PRECISION
+) -> List[str]:
+    """
+    Encodes columns of lat/lng as geohashes, vectorized with NumPy when it
+    is installed.
+    """
+
+    if np is None or not 0 < precision <= GEOHASH_MAX_PRECISION:
+        return [geohash_encode(lat, lng, precision) for lat, lng in zip(lats, lngs)]
+
+    lng_bits, lat_bits = _geohash_bits(precision)
+    total = lng_bits + lat_bits
+
+    lng_index = np.floor(
+        (np.asarray(lngs, dtype="f8") + 180.0) / 360.0 * (1 << lng_bits)
+    )
+    lat_index = np.floor(
+        (np.asarray(lats, dtype="f8") + 90.0) / 180.0 * (1 << lat_bits)
+    )
+    lng_index = np.clip(lng_index, 0, (1 << lng_bits) - 1).astype("u8")
+    lat_index = np.clip(lat_index, 0, (1 << lat_bits) - 1).astype("u8")
+
+    code = np.zeros(len(lng_index), dtype="u8")
+    for i in range(lng_bits):
+        bit = (lng_index >> np.uint64(lng_bits - 1 - i)) & np.uint64(1)
+        code |= bit << np.uint64(total - 1 - 2 * i)
+    for i in range(lat_bits):
+        bit = (lat_index >> np.uint64(lat_bits - 1 - i)) & np.uint64(1)
+        code |= bit << np.uint64(total - 2 - 2 * i)
+
+    alphabet = np.frombuffer(GEOHASH_ALPHABET.encode("ascii"), dtype="S1")
+    chars = np.empty((len(code), precision), dtype="S1")
+    for i in range(precision):
+        chars[:, i] = alphabet[
+            ((code >> np.uint64(5 * (precision - 1 - i))) & np.uint64(31)).astype("i8")
+        ]
+
+    return [
+        value.decode("ascii") for value in chars.view("S{}".format(precision))[:, 0]
+    ]
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    Returns the min_lng, min_lat, max_lng, max_lat of the geohash cell.
+
+    Raises ValueError on invalid geohashes.
+    """
+
+    code = 0
+    for char in geohash.lower():
+        if char not in _GEOHASH_VALUES:
+            raise ValueError("Invalid geohash '{}'".format(geohash))
+        code = (code << 5) | _GEOHASH_VALUES[char]
+
+    precision = len(geohash)
+    lng_bits, lat_bits = _geohash_bits(precision)
+    total = lng_bits + lat_bits
+
+    lng_index = 0
+    lat_index = 0
+    for i in range(total):
+        bit = (code >> (total - 1 - i)) & 1
+        if i % 2 == 0:
+            lng_index = (lng_index << 1) | bit
+        else:
+            lat_index = (lat_index << 1) | bit
+
+    lng_size = 360.0 / (1 << lng_bits)
+    lat_size = 180.0 / (1 << lat_bits)
+
+    return (
+        -180.0 + lng_index * lng_size,
+        -90.0 + lat_index * lat_size,
+        -180.0 + (lng_index + 1) * lng_size,
+        -90.0 + (lat_index + 1) * lat_size,
+    )
+
+
+def geohash_decode(geohash: str) -> Tuple[float, float]:
+    """
+    Returns the lat/lng of the center of the geohash cell.
+
+    Example:
+        geohash_decode("u4pruydqqvj")
+    Returns:
+        >> (57.64911063015461, 10.407439693808556)
+    """
+
+    min_lng, min_lat, max_lng, max_lat = geohash_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
 
 def geosgeometry_str_to_struct(value: str) -> Optional[Dict]:
     """
@@ -13,16 +428,19 @@ def geosgeometry_str_to_struct(value: str) -> Optional[Dict]:
     Example:
         SRID=5432;POINT(12.0 13.0)
     Returns:
-        >> [5432, 12.0, 13.0]
+        >> {"srid": "5432", "x": "12.0", "y": "13.0"}
     """
 
-    result = geos_ptrn.match(value)
+    if not isinstance(value, str):
+        return None
+
+    result = _cached_parse_geosgeometry(value)[0]
 
     if not result:
         return None
 
     return {
-        "srid": result.group(1),
-        "x": result.group(2),
-        "y": result.group(3),
+        "srid": result[0],
+        "x": result[1],
+        "y": result[2],
     }
@@ -0,0 +1,284 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from wagtail.models import Page
+from wagtail.signals import page_published, page_unpublished
+
+from wagtailgeowidget import app_settings
+from wagtailgeowidget.bulk import DEFAULT_CHUNK_SIZE, parse_location
+
+# How long changes are kept for other processes to replay
+CHANGE_LOG_TIMEOUT = 60 * 60 * 24
+
+# How long a process uses the change log version it read last, changes
+# recorded by other processes show up after at most this many seconds
+VERSION_CHECK_INTERVAL = 1.0
+
+_UNCHECKED = (float("-inf"), 0)
+
+
+class IndexedSource(ABC):
+    """
+    A model location field with an in memory index for front end maps. The
+    index is built on first use, then kept up to date with the changes
+    recorded in the GEO_WIDGET_INDEX_CACHE cache when objects are published,
+    unpublished, saved or deleted, so every process replays them instead of
+    rebuilding. Changes are recorded once the transaction commits, an index
+    built in between would otherwise be tagged with the change while still
+    holding the old row.
+
+    Subclasses implement create_index and add_to_index.
+    """
+
+    name = "index"
+
+    def __init__(
+        self,
+        model,
+        location_field: str = "location",
+        queryset=None,
+        properties: Sequence[str] = (),
+    ):
+        self.model = model
+        self.location_field = location_field
+        self.queryset = queryset
+        self.properties = tuple(properties)
+        self.key = "{}.{}".format(model._meta.label_lower, location_field)
+        self.is_page = issubclass(model, Page)
+
+        self._index = None
+        self._lock = threading.Lock()
+        # (time.monotonic() of the check, version)
+        self._version = _UNCHECKED
+
+    @property
+    def cache(self):
+        return caches[app_settings.GEO_WIDGET_INDEX_CACHE]
+
+    def get_cache_key(self, name) -> str:
+        return "wagtailgeowidget:{}:{}:{}".format(self.name, self.key, name)
+
+    def get_queryset(self):
+        if self.queryset is not None:
+            return self.queryset.all()
+
+        queryset = self.model._default_manager.all()
+        if self.is_page:
+            queryset = queryset.live()
+        return queryset
+
+    @abstractmethod
+    def create_index(self):
+        pass
+
+    @abstractmethod
+    def add_to_index(self, index, pk, lng: float, lat: float, values: tuple) -> None:
+        pass
+
+    def get_version(self) -> int:
+        checked_at, version = self._version
+        now = time.monotonic()
+        if now - checked_at >= VERSION_CHECK_INTERVAL:
+            version = self.cache.get(self.get_cache_key("version"), 0)
+            self._version = (now, version)
+        return version
+
+    def build_index(self):
+        index = self.create_index()
+        # Read before loading, changes made while loading are replayed later
+        index.version = self.get_version()
+
+        rows = (
+            self.get_queryset()
+            .values_list("pk", self.location_field, *self.properties)
+            .iterator(chunk_size=DEFAULT_CHUNK_SIZE)
+        )
+        for pk, location, *values in rows:
+            point = parse_location(location)
+            if point is not None:
+                self.add_to_index(index, pk, point.x, point.y, tuple(values))
+
+        return index
+
+    def get_index(self):
+        """
+        Returns the index with the changes recorded since it was built, the
+        caller must hold the source lock.
+        """
+
+        version = self.get_version()
+        index = self._index
+
+        if index is not None and index.version < version:
+            keys = [
+                self.get_cache_key(number)
+                for number in range(index.version + 1, version + 1)
+            ]
+            changes = self.cache.get_many(keys)
+
+            if len(changes) == len(keys):
+                for key in keys:
+                    pk, lng, lat, values = changes[key]
+                    if lng is None:
+                        index.remove(pk)
+                    else:
+                        self.add_to_index(index, pk, lng, lat, values)
+                index.version = version
+            else:
+                # Part of the change log expired, start over
+                index = None
+        elif index is not None and index.version > version:
+            # The cache was cleared
+            index = None
+
+        if index is None:
+            index = self._index = self.build_index()
+
+        return index
+
+    def record_change(
+        self, pk, lng: Optional[float], lat: Optional[float], values: tuple = ()
+    ) -> int:
+        """
+        Appends an added, moved (lng/lat) or removed (None) point to the
+        change log read by get_index, returning the new version.
+        """
+
+        version_key = self.get_cache_key("version")
+        self.cache.add(version_key, 0, None)
+        try:
+            version = self.cache.incr(version_key)
+        except ValueError:
+            # Evicted since it was added, indexes will be rebuilt
+            self.cache.set(version_key, 1, None)
+            version = 1
+
+        self.cache.set(
+            self.get_cache_key(version), (pk, lng, lat, values), CHANGE_LOG_TIMEOUT
+        )
+        self._version = (time.monotonic(), version)
+        return version
+
+    def handles(self, instance) -> bool:
+        return isinstance(instance, self.model)
+
+    def update(self, instance) -> None:
+        if self.queryset is not None:
+            # Also tells whether the object is part of the queryset
+            rows = list(
+                self.get_queryset()
+                .filter(pk=instance.pk)
+                .values_list(self.location_field, flat=True)[:1]
+            )
+            point = parse_location(rows[0]) if rows else None
+        elif not self.is_page or instance.live:
+            point = parse_location(getattr(instance, self.location_field, None))
+        else:
+            point = None
+
+        if point is None:
+            change = (instance.pk, None, None)
+        else:
+            values = tuple(
+                instance.serializable_value(name) for name in self.properties
+            )
+            change = (instance.pk, point.x, point.y, values)
+
+        transaction.on_commit(
+            lambda: self.record_change(*change), using=instance._state.db
+        )
+
+    def remove(self, instance) -> None:
+        pk = instance.pk
+        transaction.on_commit(
+            lambda: self.record_change(pk, None, None), using=instance._state.db
+        )
+
+
+_sources: Dict[Tuple[str, str], IndexedSource] = {}
+_sources_lock = threading.Lock()
+
+
+def register_source(
+    source_class: Type[IndexedSource],
+    model,
+    location_field: str = "location",
+    **options
+) -> Any:
+    """
+    Registers a location field for an index, returning the existing source
+    when it was already registered.
+    """
+
+    key = (source_class.name, "{}.{}".format(model._meta.label_lower, location_field))
+
+    with _sources_lock:
+        source = _sources.get(key)
+        if source is None:
+            source = _sources[key] = source_class(model, location_field, **options)
+            _connect_signals()
+
+    return source
+
+
+def get_source(
+    source_class: Type[IndexedSource], model, location_field: str = "location"
+) -> Optional[Any]:
+    """
+    Returns the source registered for a location field, or None.
+    """
+
+    key = (source_class.name, "{}.{}".format(model._meta.label_lower, location_field))
+    return _sources.get(key)
+
+
+def get_sources(instance) -> List[IndexedSource]:
+    return [source for source in list(_sources.values()) if source.handles(instance)]
+
+
+def clear_indexes() -> None:
+    """
+    Drops the built indexes of all sources and the versions they last read,
+    they are rebuilt on next use.
+    """
+
+    for source in list(_sources.values()):
+        with source._lock:
+            source._index = None
+            source._version = _UNCHECKED
+
+
+def _page_published(sender, instance, **kwargs):
+    for source in get_sources(instance):
+        source.update(instance)
+
+
+def _page_unpublished(sender, instance, **kwargs):
+    for source in get_sources(instance):
+        source.remove(instance)
+
+
+def _post_save(sender, instance, raw=False, **kwargs):
+    # Pages are handled when published, saving a draft doesn't change them
+    if raw or isinstance(instance, Page):
+        return
+
+    for source in get_sources(instance):
+        source.update(instance)
+
+
+def _post_delete(sender, instance, **kwargs):
+    for source in get_sources(instance):
+        source.remove(instance)
+
+
+def _connect_signals():
+    page_published.connect(_page_published, dispatch_uid="wagtailgeowidget_indexes")
+    page_unpublished.connect(_page_unpublished, dispatch_uid="wagtailgeowidget_indexes")
+    post_save.connect(_post_save, dispatch_uid="wagtailgeowidget_indexes")
+    post_delete.connect(_post_delete, dispatch_uid="wagtailgeowidget_indexes")
@@ -0,0 +1,256 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from wagtail.models import Revision
+
+from wagtailgeowidget.discovery import find_location_sources
+from wagtailgeowidget.geocoders import get_geocoder
+from wagtailgeowidget.geohash import GeohashField
+
+
+def _build_location(field, lat, lng):
+    if field.get_internal_type() == "PointField":
+        from django.contrib.gis.geos import Point
+
+        return Point(lng, lat, srid=4326)
+
+    return "SRID=4326;POINT({} {})".format(lng, lat)
+
+
+def get_revision_fields(model):
+    """
+    Returns the names of the revision foreign keys of model, latest_revision
+    and live_revision for pages.
+    """
+
+    names = []
+    for name in ["latest_revision", "live_revision"]:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+
+        if field.related_model is Revision:
+            names.append(name)
+    return names
+
+
+def _is_empty(value):
+    return value is None or value == ""
+
+
+def save_locations(model, location_field, instances, revision_fields) -> None:
+    """
+    Writes the locations of instances along with the geohashes derived from
+    them, bulk_update skips pre_save. The locations are also written to the
+    latest and live revisions still lacking one, so publishing them later
+    doesn't revert the location.
+    """
+
+    geohash_fields = [
+        field
+        for field in model._meta.concrete_fields
+        if isinstance(field, GeohashField)
+        and field.location_field == location_field.name
+    ]
+
+    revision_ids = set()
+    for instance in instances:
+        for field in geohash_fields:
+            field.pre_save(instance, False)
+
+        for name in revision_fields:
+            revision_id = getattr(instance, "{}_id".format(name))
+            if revision_id is not None:
+                revision_ids.add(revision_id)
+
+    by_pk = {str(instance.pk): instance for instance in instances}
+    revisions = []
+    for revision in Revision.objects.filter(pk__in=revision_ids):
+        instance = by_pk.get(revision.object_id)
+        content = revision.content
+        if instance is None or not _is_empty(content.get(location_field.name)):
+            continue
+
+        content[location_field.name] = location_field.value_to_string(instance)
+        for field in geohash_fields:
+            content[field.attname] = getattr(instance, field.attname)
+        revisions.append(revision)
+
+    with transaction.atomic():
+        model._default_manager.bulk_update(
+            instances, [location_field.name, *[field.name for field in geohash_fields]]
+        )
+        Revision.objects.bulk_update(revisions, ["content"])
+
+
+class Command(BaseCommand):
+    """
+    Geocode the address of rows lacking a location, for all models using
+    GeoAddressPanel together with GoogleMapsPanel/LeafletPanel
+
+    Example:
+        manage.py geocode_addresses --workers=4 --checkpoint=geocode.json
+    """
+
+    help = "Fill empty locations by geocoding their address field"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            dest="models",
+            help="Limit to model (app_label.ModelName), can be repeated",
+        )
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--checkpoint",
+            help="Path to a file storing progress, used to resume interrupted runs",
+        )
+
+    def handle(self, *args, **options):
+        sources = [source for source in find_location_sources() if source.address_field]
+
+        if options["models"]:
+            models = {label.lower() for label in options["models"]}
+            sources = [
+                source for source in sources if source.model._meta.label_lower in models
+            ]
+
+        if not sources:
+            raise CommandError("No models with a geocoded address field found")
+
+        self.checkpoint_path = options["checkpoint"]
+        self.checkpoint = self.load_checkpoint()
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for source in sources:
+                updated, failed = self.geocode_source(
+                    source, executor, options["batch_size"]
+                )
+                self.stdout.write(
+                    "{}.{}: {} locations updated, {} failed".format(
+                        source.model._meta.label, source.location_field, updated, failed
+                    )
+                )
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+
+        with open(self.checkpoint_path) as fd:
+            return json.load(fd)
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+
+        tmp_path = "{}.tmp".format(self.checkpoint_path)
+        with open(tmp_path, "w") as fd:
+            json.dump(self.checkpoint, fd)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def geocode_source(self, source, executor, batch_size):
+        model = source.model
+        location_field = model._meta.get_field(source.location_field)
+        checkpoint_key = "{}.{}".format(model._meta.label_lower, source.location_field)
+        geocoder = get_geocoder(source.geocoder)
+        revision_fields = get_revision_fields(model)
+
+        empty_location = Q(**{"{}__isnull".format(source.location_field): True})
+        if location_field.get_internal_type() != "PointField":
+            empty_location |= Q(**{source.location_field: ""})
+
+        queryset = (
+            model._default_manager.filter(empty_location)
+            .exclude(**{"{}__isnull".format(source.address_field): True})
+            .exclude(**{source.address_field: ""})
+            .only(
+                "pk",
+                source.address_field,
+                source.location_field,
+                *["{}_id".format(name) for name in revision_fields],
+            )
+            .order_by("pk")
+        )
+
+        def geocode(instance):
+            address = getattr(instance, source.address_field)
+            try:
+                results = geocoder.geocode(address)
+            except Exception as e:
+                # Retried on the next run, other rows carry on
+                self.stderr.write("Could not geocode '{}': {}".format(address, e))
+                return False
+
+            return results[0] if results else None
+
+        def save_batch(batch):
+            changed = []
+            failed = []
+            for instance, result in zip(batch, executor.map(geocode, batch)):
+                if result is False:
+                    failed.append(instance.pk)
+                    continue
+
+                if not result:
+                    continue
+
+                setattr(
+                    instance,
+                    source.location_field,
+                    _build_location(location_field, result["lat"], result["lng"]),
+                )
+                changed.append(instance)
+
+            if changed:
+                save_locations(model, location_field, changed, revision_fields)
+
+            return len(changed), failed
+
+        progress = self.checkpoint.get(checkpoint_key)
+        if not isinstance(progress, dict):
+            # Checkpoints of earlier versions only hold the last pk
+            progress = {"last_pk": progress, "failed": []}
+        self.checkpoint[checkpoint_key] = progress
+
+        updated = 0
+        failed = []
+
+        # Retry the rows that failed in an earlier run first
+        retry_pks = progress["failed"]
+        for start in range(0, len(retry_pks), batch_size):
+            batch = list(queryset.filter(pk__in=retry_pks[start : start + batch_size]))
+            batch_updated, batch_failed = save_batch(batch)
+            updated += batch_updated
+            failed.extend(batch_failed)
+
+        progress["failed"] = list(failed)
+        self.save_checkpoint()
+
+        while True:
+            batch_queryset = queryset
+            if progress["last_pk"] is not None:
+                batch_queryset = queryset.filter(pk__gt=progress["last_pk"])
+
+            batch = list(batch_queryset[:batch_size])
+            if not batch:
+                break
+
+            batch_updated, batch_failed = save_batch(batch)
+            updated += batch_updated
+            failed.extend(batch_failed)
+
+            # Rows without results are skipped on the next batch, rows that
+            # failed are kept apart to be retried
+            progress["last_pk"] = batch[-1].pk
+            progress["failed"].extend(batch_failed)
+            self.save_checkpoint()
+
+        return updated, len(failed)
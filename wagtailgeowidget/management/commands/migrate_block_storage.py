@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wagtailgeowidget import app_settings
+from wagtailgeowidget.block_locations import find_map_block_models
+from wagtailgeowidget.block_storage import (
+    migrate_model_block_storage,
+    migrate_revision_block_storage,
+)
+from wagtailgeowidget.blocks import BLOCK_STORAGE_CHOICES
+from wagtailgeowidget.bulk import DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    """
+    Rewrite the values of GoogleMapsBlock/LeafletBlock stored in StreamFields
+    and their revisions to the GEO_WIDGET_BLOCK_STORAGE format
+
+    Example:
+        manage.py migrate_block_storage --format=object
+    """
+
+    help = "Rewrite stored map block values to another storage format"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=BLOCK_STORAGE_CHOICES,
+            help="Storage format, defaults to GEO_WIDGET_BLOCK_STORAGE",
+        )
+        parser.add_argument(
+            "--model",
+            action="append",
+            dest="models",
+            help="Limit to model (app_label.ModelName), can be repeated",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--skip-revisions",
+            action="store_true",
+            help="Only rewrite the current data, not the revisions",
+        )
+
+    def handle(self, *args, **options):
+        storage = options["format"] or app_settings.GEO_WIDGET_BLOCK_STORAGE
+        if storage not in BLOCK_STORAGE_CHOICES:
+            raise CommandError("Unknown map block storage '{}'".format(storage))
+
+        models = find_map_block_models(pages_only=False)
+
+        if options["models"]:
+            labels = {label.lower() for label in options["models"]}
+            models = [model for model in models if model._meta.label_lower in labels]
+
+        if not models:
+            raise CommandError("No models with map blocks found")
+
+        batch_size = options["batch_size"]
+        for model in models:
+            rows = migrate_model_block_storage(model, storage, batch_size)
+            revisions = 0
+            if not options["skip_revisions"]:
+                revisions = migrate_revision_block_storage(model, storage, batch_size)
+
+            self.stdout.write(
+                "{}: {} rows and {} revisions updated".format(
+                    model._meta.label, rows, revisions
+                )
+            )
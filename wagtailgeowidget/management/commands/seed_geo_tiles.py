@@ -0,0 +1,193 @@
+import itertools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wagtailgeowidget import app_settings
+from wagtailgeowidget.bulk import location_columns
+from wagtailgeowidget.discovery import find_location_sources
+from wagtailgeowidget.helpers import parse_bbox
+from wagtailgeowidget.tiles import (
+    MAX_ZOOM,
+    TileError,
+    TileProxy,
+    count_tiles_in_bbox,
+    get_tile_proxy,
+    tiles_in_bbox,
+)
+from wagtailgeowidget.upstream import RateLimiter
+
+
+class Command(BaseCommand):
+    """
+    Fetch the tile pyramid of an area into the tile proxy cache, so maps
+    load from the cache the first time editors open them.
+
+    Example:
+        manage.py seed_geo_tiles --bbox=17.7,59.2,18.3,59.5 --max-zoom=14
+    """
+
+    help = "Pre-fetch Leaflet tiles into the tile proxy cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bbox",
+            help="Area to seed as min_lng,min_lat,max_lng,max_lat",
+        )
+        parser.add_argument(
+            "--from-locations",
+            action="store_true",
+            help="Seed the bounding box of all stored locations",
+        )
+        parser.add_argument(
+            "--padding",
+            type=float,
+            default=0.5,
+            help="Degrees added around the default location or stored locations",
+        )
+        parser.add_argument("--min-zoom", type=int, default=0)
+        parser.add_argument("--max-zoom", type=int, default=12)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=2.0,
+            help="Max tile server requests per second",
+        )
+        parser.add_argument(
+            "--max-tiles",
+            type=int,
+            default=100000,
+            help="Refuse to seed areas with more tiles than this",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--checkpoint",
+            help="Path to a file storing progress, used to resume interrupted runs",
+        )
+
+    def handle(self, *args, **options):
+        if not app_settings.GEO_WIDGET_TILE_PROXY:
+            raise CommandError("Seeding tiles requires GEO_WIDGET_TILE_PROXY")
+
+        min_zoom = options["min_zoom"]
+        max_zoom = options["max_zoom"]
+        if not 0 <= min_zoom <= max_zoom <= MAX_ZOOM:
+            raise CommandError("Invalid zoom range {}-{}".format(min_zoom, max_zoom))
+
+        if not options["rate"] > 0:
+            raise CommandError("--rate must be positive")
+
+        bbox = self.get_bbox(options)
+        total = count_tiles_in_bbox(bbox, min_zoom, max_zoom)
+        if total > options["max_tiles"]:
+            raise CommandError(
+                "{} tiles to seed, raise --max-tiles to continue".format(total)
+            )
+
+        self.checkpoint_path = options["checkpoint"]
+        checkpoint_key = "{}:{}-{}".format(
+            ",".join(str(value) for value in bbox), min_zoom, max_zoom
+        )
+        done = resumed = self.load_checkpoint(checkpoint_key)
+
+        shared_proxy = get_tile_proxy()
+        proxy = TileProxy(
+            shared_proxy.cache,
+            shared_proxy.timeout,
+            rate_limiter=RateLimiter(options["rate"], burst=options["workers"]),
+        )
+
+        def seed(tile):
+            try:
+                proxy.get_tile(*tile)
+            except TileError as e:
+                self.stderr.write("Could not fetch tile {}/{}/{}: {}".format(*tile, e))
+                return False
+            return True
+
+        tiles = itertools.islice(tiles_in_bbox(bbox, min_zoom, max_zoom), done, None)
+        seeded = 0
+        failed = 0
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                batch = list(itertools.islice(tiles, options["batch_size"]))
+                if not batch:
+                    break
+
+                results = list(executor.map(seed, batch))
+                seeded += results.count(True)
+                failed += results.count(False)
+                done += len(batch)
+                self.save_checkpoint(checkpoint_key, done)
+
+        summary = "{} tiles seeded, {} failed".format(seeded, failed)
+        if resumed:
+            summary += ", {} seeded by an earlier run".format(resumed)
+        self.stdout.write(summary)
+
+    def get_bbox(self, options):
+        if options["bbox"]:
+            bbox = parse_bbox(options["bbox"])
+            if bbox is None:
+                raise CommandError(
+                    "Invalid bbox '{}', use min_lng,min_lat,max_lng,max_lat".format(
+                        options["bbox"]
+                    )
+                )
+            return bbox
+
+        padding = options["padding"]
+
+        if options["from_locations"]:
+            lngs = []
+            lats = []
+            for source in find_location_sources():
+                columns = location_columns(
+                    source.model._default_manager.all(), source.location_field
+                )
+                lngs.extend(columns["lng"])
+                lats.extend(columns["lat"])
+
+            if not lngs:
+                raise CommandError("No stored locations found")
+
+            return (
+                max(min(lngs) - padding, -180.0),
+                max(min(lats) - padding, -90.0),
+                min(max(lngs) + padding, 180.0),
+                min(max(lats) + padding, 90.0),
+            )
+
+        location = app_settings.GEO_WIDGET_DEFAULT_LOCATION
+        return (
+            location["lng"] - padding,
+            location["lat"] - padding,
+            location["lng"] + padding,
+            location["lat"] + padding,
+        )
+
+    def load_checkpoint(self, key):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+
+        with open(self.checkpoint_path) as fd:
+            checkpoint = json.load(fd)
+
+        # Progress of another area is not resumed
+        if checkpoint.get("key") != key:
+            return 0
+
+        return checkpoint.get("done", 0)
+
+    def save_checkpoint(self, key, done):
+        if not self.checkpoint_path:
+            return
+
+        tmp_path = "{}.tmp".format(self.checkpoint_path)
+        with open(tmp_path, "w") as fd:
+            json.dump({"key": key, "done": done}, fd)
+        os.replace(tmp_path, self.checkpoint_path)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wagtailgeowidget.block_locations import (
+    find_map_block_models,
+    update_model_block_locations,
+)
+from wagtailgeowidget.bulk import DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the stored locations of GoogleMapsBlock/LeafletBlock for all
+    live pages, for existing pages and after changing block definitions
+
+    Example:
+        manage.py update_block_locations --model=home.EventPage
+    """
+
+    help = "Store the locations of map blocks in live pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            dest="models",
+            help="Limit to model (app_label.ModelName), can be repeated",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        models = find_map_block_models()
+
+        if options["models"]:
+            labels = {label.lower() for label in options["models"]}
+            models = [model for model in models if model._meta.label_lower in labels]
+
+        if not models:
+            raise CommandError("No page models with map blocks found")
+
+        for model in models:
+            updated = update_model_block_locations(
+                model, batch_size=options["batch_size"]
+            )
+            self.stdout.write("{}: {} pages updated".format(model._meta.label, updated))
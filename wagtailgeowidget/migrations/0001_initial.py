@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("wagtailcore", "0094_alter_page_locale"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BlockLocation",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("field_name", models.CharField(max_length=255)),
+                ("block_path", models.CharField(max_length=255)),
+                ("block_id", models.CharField(blank=True, max_length=64)),
+                ("srid", models.IntegerField(default=4326)),
+                ("lat", models.FloatField()),
+                ("lng", models.FloatField()),
+                ("address", models.TextField(blank=True)),
+                ("zoom", models.SmallIntegerField(blank=True, null=True)),
+                (
+                    "page",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="geo_block_locations",
+                        to="wagtailcore.page",
+                    ),
+                ),
+                (
+                    "revision",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="wagtailcore.revision",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["lat", "lng"], name="wagtailgeowidget_bl_latlng"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+from typing import Tuple
+
+from django.db import models
+from django.db.models import F, Q
+
+from wagtailgeowidget.expressions import haversine_distance
+from wagtailgeowidget.helpers import get_radius_bbox, split_bbox
+
+
+class BlockLocationQuerySet(models.QuerySet):
+    def within_bbox(self, bbox: Tuple[float, float, float, float]):
+        """
+        Returns the locations inside min_lng, min_lat, max_lng, max_lat.
+        """
+
+        query = Q()
+        for min_lng, min_lat, max_lng, max_lat in split_bbox(bbox):
+            query |= Q(
+                lat__gte=min_lat, lat__lte=max_lat, lng__gte=min_lng, lng__lte=max_lng
+            )
+        return self.filter(query)
+
+    def within_distance(self, lat: float, lng: float, radius: float):
+        """
+        Returns the locations within radius meters of lat/lng, the candidates
+        inside the radius bbox are filtered exactly in the same query.
+        """
+
+        return (
+            self.within_bbox(get_radius_bbox(lat, lng, radius))
+            .alias(distance=haversine_distance(lat, lng, F("lat"), F("lng")))
+            .filter(distance__lte=radius)
+        )
+
+
+class BlockLocation(models.Model):
+    """
+    A location stored in a GoogleMapsBlock/LeafletBlock of a live page,
+    kept up to date on publish so block locations can be queried with SQL.
+    """
+
+    page = models.ForeignKey(
+        "wagtailcore.Page",
+        on_delete=models.CASCADE,
+        related_name="geo_block_locations",
+    )
+    revision = models.ForeignKey(
+        "wagtailcore.Revision",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    field_name = models.CharField(max_length=255)
+    block_path = models.CharField(max_length=255)
+    block_id = models.CharField(max_length=64, blank=True)
+    srid = models.IntegerField(default=4326)
+    lat = models.FloatField()
+    lng = models.FloatField()
+    address = models.TextField(blank=True)
+    zoom = models.SmallIntegerField(null=True, blank=True)
+
+    objects = BlockLocationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["lat", "lng"], name="wagtailgeowidget_bl_latlng"),
+        ]
+
+    def __str__(self):
+        return "{} {} ({}, {})".format(
+            self.page_id, self.block_path, self.lat, self.lng
+        )
+
+    @property
+    def ewkt(self) -> str:
+        return "SRID={};POINT({} {})".format(self.srid, self.lng, self.lat)
@@ -0,0 +1,265 @@
+import heapq
+import math
+from array import array
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from wagtailgeowidget.helpers import EARTH_RADIUS, distance, get_radius_bbox, split_bbox
+from wagtailgeowidget.indexes import IndexedSource, register_source
+
+DEFAULT_LEAF_SIZE = 64
+
+# Patches kept outside the tree before it is rebuilt, as a share of the
+# indexed points with a floor for small indexes
+REBUILD_RATIO = 0.1
+REBUILD_MIN = 256
+
+
+class KDTree:
+    """
+    Static 2d tree over lng/lat columns, stored as the columns sorted in
+    tree order: every range of positions is a node whose middle position
+    splits the rest by lng or lat in turn, ranges of up to leaf_size
+    positions are scanned.
+    """
+
+    def __init__(
+        self,
+        pks: Sequence[Any],
+        lngs: array,
+        lats: array,
+        leaf_size: int = DEFAULT_LEAF_SIZE,
+    ):
+        self.leaf_size = leaf_size
+        order = array("l", range(len(pks)))
+
+        stack = [(0, len(order) - 1, 0)]
+        while stack:
+            left, right, axis = stack.pop()
+            if right - left <= leaf_size:
+                continue
+
+            coords = lngs if axis == 0 else lats
+            order[left : right + 1] = array(
+                "l", sorted(order[left : right + 1], key=coords.__getitem__)
+            )
+
+            middle = (left + right) >> 1
+            stack.append((left, middle - 1, 1 - axis))
+            stack.append((middle + 1, right, 1 - axis))
+
+        self.pks = [pks[i] for i in order]
+        self.lngs = array("d", (lngs[i] for i in order))
+        self.lats = array("d", (lats[i] for i in order))
+
+    def __len__(self):
+        return len(self.pks)
+
+    def range(self, min_lng, min_lat, max_lng, max_lat) -> List[int]:
+        """
+        Returns the positions of the points inside the bbox.
+        """
+
+        lngs = self.lngs
+        lats = self.lats
+        result = []
+
+        stack = [(0, len(self.pks) - 1, 0)]
+        while stack:
+            left, right, axis = stack.pop()
+            if right < left:
+                continue
+
+            if right - left <= self.leaf_size:
+                for i in range(left, right + 1):
+                    if min_lng <= lngs[i] <= max_lng and min_lat <= lats[i] <= max_lat:
+                        result.append(i)
+                continue
+
+            middle = (left + right) >> 1
+            lng = lngs[middle]
+            lat = lats[middle]
+            if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat:
+                result.append(middle)
+
+            if axis == 0:
+                low, high, coord = min_lng, max_lng, lng
+            else:
+                low, high, coord = min_lat, max_lat, lat
+
+            if low <= coord:
+                stack.append((left, middle - 1, 1 - axis))
+            if high >= coord:
+                stack.append((middle + 1, right, 1 - axis))
+
+        return result
+
+
+class SpatialIndex:
+    """
+    Locations answering bbox and nearest lookups from a KDTree. Changes are
+    patched in without rebuilding it: moved and removed points are masked
+    in the tree, added and moved points are kept in a small buffer that is
+    scanned, and the tree is rebuilt lazily once the patches outgrow
+    REBUILD_RATIO.
+    """
+
+    def __init__(self, leaf_size: int = DEFAULT_LEAF_SIZE):
+        self.leaf_size = leaf_size
+        self.points: Dict[Any, Tuple[float, float]] = {}
+        self.tree: Optional[KDTree] = None
+        self.tree_pks: Set[Any] = set()
+        self.masked: Set[Any] = set()
+        self.buffer: Dict[Any, Tuple[float, float]] = {}
+        self.version = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, pk, lng: float, lat: float) -> None:
+        self.points[pk] = (lng, lat)
+
+        if self.tree is not None:
+            if pk in self.tree_pks:
+                self.masked.add(pk)
+            self.buffer[pk] = (lng, lat)
+            self._check_patches()
+
+    def remove(self, pk) -> None:
+        if self.points.pop(pk, None) is None:
+            return
+
+        if self.tree is not None:
+            self.buffer.pop(pk, None)
+            if pk in self.tree_pks:
+                self.masked.add(pk)
+            self._check_patches()
+
+    def _check_patches(self):
+        limit = max(REBUILD_MIN, len(self.points) * REBUILD_RATIO)
+        if len(self.buffer) + len(self.masked) > limit:
+            self.tree = None
+
+    def get_tree(self) -> KDTree:
+        if self.tree is None:
+            pks = list(self.points)
+            self.tree = KDTree(
+                pks,
+                array("d", (self.points[pk][0] for pk in pks)),
+                array("d", (self.points[pk][1] for pk in pks)),
+                leaf_size=self.leaf_size,
+            )
+            self.tree_pks = set(pks)
+            self.masked = set()
+            self.buffer = {}
+        return self.tree
+
+    def _bbox_points(self, bbox) -> List[Tuple[Any, float, float]]:
+        tree = self.get_tree()
+        masked = self.masked
+
+        result = []
+        for min_lng, min_lat, max_lng, max_lat in split_bbox(bbox):
+            for i in tree.range(min_lng, min_lat, max_lng, max_lat):
+                pk = tree.pks[i]
+                if pk not in masked:
+                    result.append((pk, tree.lngs[i], tree.lats[i]))
+
+            for pk, (lng, lat) in self.buffer.items():
+                if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat:
+                    result.append((pk, lng, lat))
+
+        return result
+
+    def in_bbox(self, bbox: Tuple[float, float, float, float]) -> List[Any]:
+        """
+        Returns the pks of the locations inside min_lng, min_lat, max_lng,
+        max_lat.
+        """
+
+        return [pk for pk, _lng, _lat in self._bbox_points(bbox)]
+
+    def nearest(
+        self, lat: float, lng: float, k: int = 1, max_distance: Optional[float] = None
+    ) -> List[Tuple[Any, float]]:
+        """
+        Returns up to k (pk, meters) of the locations closest to lat/lng,
+        closest first, optionally limited to max_distance meters.
+        """
+
+        if not self.points or k < 1:
+            return []
+
+        # Start from the radius holding k points if they were spread evenly
+        # over the earth, then grow it until k points are inside
+        radius = EARTH_RADIUS * math.sqrt(4 * k / len(self.points))
+        if max_distance is not None:
+            radius = min(radius, max_distance)
+
+        while True:
+            candidates = [
+                (distance(lat, lng, point_lat, point_lng), pk)
+                for pk, point_lng, point_lat in self._bbox_points(
+                    get_radius_bbox(lat, lng, radius)
+                )
+            ]
+            found = [item for item in candidates if item[0] <= radius]
+
+            exhausted = radius >= math.pi * EARTH_RADIUS
+            if max_distance is not None and radius >= max_distance:
+                exhausted = True
+
+            if len(found) >= k or exhausted:
+                found = heapq.nsmallest(k, found, key=itemgetter(0))
+                return [(pk, meters) for meters, pk in found]
+
+            radius *= 4
+            if max_distance is not None:
+                radius = min(radius, max_distance)
+
+
+class SpatialIndexSource(IndexedSource):
+    """
+    A model location field kept in a SpatialIndex in memory, for nearest and
+    bbox lookups without querying the database.
+    """
+
+    name = "spatial"
+
+    def __init__(
+        self,
+        model,
+        location_field: str = "location",
+        queryset=None,
+        leaf_size: int = DEFAULT_LEAF_SIZE,
+    ):
+        super().__init__(model, location_field, queryset=queryset)
+        self.leaf_size = leaf_size
+
+    def create_index(self) -> SpatialIndex:
+        return SpatialIndex(leaf_size=self.leaf_size)
+
+    def add_to_index(self, index, pk, lng, lat, values):
+        index.add(pk, lng, lat)
+
+    def in_bbox(self, bbox: Tuple[float, float, float, float]) -> List[Any]:
+        with self._lock:
+            return self.get_index().in_bbox(bbox)
+
+    def nearest(
+        self, lat: float, lng: float, k: int = 1, max_distance: Optional[float] = None
+    ) -> List[Tuple[Any, float]]:
+        with self._lock:
+            return self.get_index().nearest(lat, lng, k, max_distance)
+
+
+def register_spatial_index(
+    model, location_field: str = "location", **options
+) -> SpatialIndexSource:
+    """
+    Registers a location field for in memory spatial lookups, returning the
+    existing source when it was already registered. Call it when your app is
+    loaded, so every process records changes to the model.
+    """
+
+    return register_source(SpatialIndexSource, model, location_field, **options)
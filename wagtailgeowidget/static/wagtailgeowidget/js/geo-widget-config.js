@@ -0,0 +1,102 @@
+// This file must follow ES5
+(function () {
+    var config = {};
+    var pending = [
+        "wagtailgeowidget-config",
+        "wagtailgeowidget-config-google-maps",
+        "wagtailgeowidget-config-leaflet",
+    ];
+
+    // Options shared by all fields are emitted once per page with the
+    // media of the fields, looked up again until they have all been found
+    // since fields can be added to the page later on
+    function getConfig() {
+        pending = pending.filter(function (id) {
+            var el = document.getElementById(id);
+            if (!el) {
+                return true;
+            }
+
+            Object.assign(config, JSON.parse(el.textContent));
+            return false;
+        });
+
+        return config;
+    }
+
+    function withConfig(options) {
+        var merged = Object.assign({}, getConfig());
+
+        Object.keys(options || {}).forEach(function (key) {
+            if (options[key] !== null && options[key] !== undefined) {
+                merged[key] = options[key];
+            }
+        });
+
+        return merged;
+    }
+
+    var googleGeocoders = [
+        "google_maps",
+        "google_maps_places",
+        "google_maps_places_new",
+    ];
+
+    // Resolves to the address at lat/lng with the Maps JavaScript API, as
+    // the browser key is usually restricted to the referrers of the admin
+    function reverseGeocodeGoogle(lat, lng) {
+        return window.wagtailGeoWidget.loadGoogleMaps().then(function () {
+            return new Promise(function (resolve, reject) {
+                var geocoder = new google.maps.Geocoder();
+
+                geocoder.geocode(
+                    { location: { lat: lat, lng: lng } },
+                    function (results, status) {
+                        if (status === google.maps.GeocoderStatus.ZERO_RESULTS) {
+                            resolve("");
+                            return;
+                        }
+
+                        if (status !== google.maps.GeocoderStatus.OK) {
+                            reject(new Error(status));
+                            return;
+                        }
+
+                        resolve(results.length ? results[0].formatted_address : "");
+                    }
+                );
+            });
+        });
+    }
+
+    // Resolves to the address at lat/lng from the reverse geocoding view,
+    // an empty string when there is none
+    function reverseGeocode(url, geocoder, lat, lng) {
+        if (googleGeocoders.indexOf(geocoder) !== -1) {
+            return reverseGeocodeGoogle(lat, lng);
+        }
+
+        var query = new URLSearchParams({
+            geocoder: geocoder,
+            lat: lat,
+            lng: lng,
+        });
+
+        return fetch(url + "?" + query, { credentials: "same-origin" })
+            .then(function (response) {
+                return response.json();
+            })
+            .then(function (data) {
+                if (data.error) {
+                    throw new Error(data.error);
+                }
+                return data.address;
+            });
+    }
+
+    window.wagtailGeoWidget = Object.assign(window.wagtailGeoWidget || {}, {
+        getConfig: getConfig,
+        withConfig: withConfig,
+        reverseGeocode: reverseGeocode,
+    });
+})();
@@ -1,18 +1,16 @@
 // This file must follow ES5
 (function () {
-    function GeocoderFieldWrap(html, geocoder, translations, params) {
+    function GeocoderFieldWrap(html, geocoder, params) {
         this.html = html;
 
         // In Wagtail < 7.1 argument 2 was id
         // TODO: Remove when Wagtail 6 is EOL
         if (arguments[1] === "__ID__") {
             geocoder= arguments[2]
-            translations = arguments[3]
-            params = arguments[4]
+            params = arguments[3]
         }
 
         this.geocoder = geocoder;
-        this.translations = translations;
         this.params = params;
     }
 
@@ -37,7 +35,6 @@
 
         var geocoderField = new Field({
             id: id,
-            translations: this.translations,
             params: this.params,
         });
         geocoderField.setState(initialState);
@@ -2,6 +2,8 @@
 "use strict";
 
 function GeocoderField(options) {
+    options = window.wagtailGeoWidget.withConfig(options);
+
     var self = this;
     var id = options.id;
     var $el = $("#" + id);
@@ -9,6 +11,7 @@ function GeocoderField(options) {
     this.translations = options.translations;
     this.field = $el;
     this.delayTime = 1000;
+    this.proxyUrl = (options.params || {}).proxyUrl;
 
     $el.on("input", function (_e) {
         clearTimeout(self._timeoutId);
@@ -44,6 +47,69 @@ GeocoderField.prototype.geocodeSearch = function (_query) {
     throw Exception("geocodeSearch not implemented");
 };
 
+GeocoderField.prototype.proxySearch = function (geocoder, query) {
+    var self = this;
+
+    var url =
+        this.proxyUrl +
+        "?" +
+        new URLSearchParams({
+            geocoder: geocoder,
+            q: query,
+        });
+
+    fetch(url, { credentials: "same-origin" })
+        .then((response) => response.json())
+        .then((data) => {
+            if (data.error) {
+                self.displayWarning("Geocoder Error: " + data.error, {
+                    field: self.field,
+                });
+                return;
+            }
+
+            if (!data.results.length) {
+                self.displayWarning(
+                    self.translations.error_could_not_geocode_address.replace(
+                        "%s",
+                        query
+                    ),
+                    {
+                        field: self.field,
+                    }
+                );
+                return;
+            }
+
+            self.displaySuccess(self.translations.success_address_geocoded, {
+                field: self.field,
+            });
+
+            var location = data.results[0];
+            self.field.trigger("searchGeocoded", [
+                { lat: location.lat, lng: location.lng },
+            ]);
+        })
+        .catch((error) => {
+            self.displayWarning("Geocoder Error: " + error, {
+                field: self.field,
+            });
+            throw error;
+        });
+};
+
+// Loads the Google Maps SDK on demand and returns a shared geocoder
+GeocoderField.prototype.getGoogleGeocoder = function () {
+    var self = this;
+
+    return window.wagtailGeoWidget.loadGoogleMaps().then(function () {
+        if (!self.geocoder) {
+            self.geocoder = new google.maps.Geocoder();
+        }
+        return self.geocoder;
+    });
+};
+
 GeocoderField.prototype.genMessageId = function (field) {
     return "wagtailgeowidget__" + field.attr("id") + "--warning";
 };
@@ -105,6 +171,11 @@ NominatimGeocoderField.prototype.constructor = GeocoderField;
 NominatimGeocoderField.prototype.geocodeSearch = function (query) {
     var self = this;
 
+    if (this.proxyUrl) {
+        this.proxySearch("nominatim", query);
+        return;
+    }
+
     var url =
         "https://nominatim.openstreetmap.org/search?" +
         new URLSearchParams({
@@ -150,7 +221,6 @@ function GoogleMapsGeocoderField(options) {
     GeocoderField.call(this, options);
 
     this.delayTime = 400;
-    this.geocoder = new google.maps.Geocoder();
 }
 
 GoogleMapsGeocoderField.prototype = Object.create(GeocoderField.prototype);
@@ -159,7 +229,24 @@ GoogleMapsGeocoderField.prototype.constructor = GeocoderField;
 GoogleMapsGeocoderField.prototype.geocodeSearch = function (query) {
     var self = this;
 
-    this.geocoder.geocode({ address: query }, function (results, status) {
+    this.getGoogleGeocoder()
+        .then(function (geocoder) {
+            self.googleGeocodeSearch(geocoder, query);
+        })
+        .catch(function (error) {
+            self.displayWarning("Google Maps Error: " + error, {
+                field: self.field,
+            });
+        });
+};
+
+GoogleMapsGeocoderField.prototype.googleGeocodeSearch = function (
+    geocoder,
+    query
+) {
+    var self = this;
+
+    geocoder.geocode({ address: query }, function (results, status) {
         if (
             status === google.maps.GeocoderStatus.ZERO_RESULTS ||
             !results.length
@@ -196,7 +283,7 @@ function GoogleMapsGeocoderPlacesNewField(options) {
     GeocoderField.call(this, options);
 
     this.delayTime = 400;
-    this.geocoder = new google.maps.Geocoder();
+    this.id = options.id;
 
     var self = this;
 
@@ -207,79 +294,63 @@ function GoogleMapsGeocoderPlacesNewField(options) {
         return
     }
 
-    var placeAutocomplete = new google.maps.places.PlaceAutocompleteElement();
-    placeAutocomplete.id = options.id+'-autocomplete';
-    this.field[0].after(placeAutocomplete);
-
-    placeAutocomplete.style.display = 'none';
-
     this.field[0].addEventListener('focus', function () {
-        self.field[0].style.display = 'none';
-
-        placeAutocomplete.style.display = 'block';
-        placeAutocomplete.focus();
-    });
-
-    placeAutocomplete.addEventListener("gmp-select", function (e) {
-        var place = e.placePrediction.toPlace();
-        place.fetchFields({
-            fields: ['displayName', 'formattedAddress', 'location']
-        }).then(function () {
-            if (!place.location) {
-                self.geocodeSearch(place.name);
-                return;
-            }
-
-            self.displaySuccess(self.translations.success_address_geocoded, {
-                field: self.field,
+        window.wagtailGeoWidget
+            .loadGoogleMaps()
+            .then(function () {
+                self.showPlaceAutocomplete();
+            })
+            .catch(function (error) {
+                self.displayWarning("Google Maps Error: " + error, {
+                    field: self.field,
+                });
             });
-
-            var placeInfo = place.toJSON();
-            self.field[0].value = placeInfo.formattedAddress;
-
-            var latLng = place.location
-            self.field.trigger("searchGeocoded", [
-                { lat: latLng.lat(), lng: latLng.lng() },
-            ]);
-        })
-    })
+    });
 }
 
-GoogleMapsGeocoderPlacesNewField.prototype = Object.create(GeocoderField.prototype);
+GoogleMapsGeocoderPlacesNewField.prototype = Object.create(GoogleMapsGeocoderField.prototype);
 GoogleMapsGeocoderPlacesNewField.prototype.constructor = GeocoderField;
 
-GoogleMapsGeocoderPlacesNewField.prototype.geocodeSearch = function (query) {
+GoogleMapsGeocoderPlacesNewField.prototype.showPlaceAutocomplete = function () {
     var self = this;
+    var placeAutocomplete = this.placeAutocomplete;
+
+    if (!placeAutocomplete) {
+        placeAutocomplete = new google.maps.places.PlaceAutocompleteElement();
+        placeAutocomplete.id = this.id+'-autocomplete';
+        this.field[0].after(placeAutocomplete);
+
+        placeAutocomplete.addEventListener("gmp-select", function (e) {
+            var place = e.placePrediction.toPlace();
+            place.fetchFields({
+                fields: ['displayName', 'formattedAddress', 'location']
+            }).then(function () {
+                if (!place.location) {
+                    self.geocodeSearch(place.name);
+                    return;
+                }
 
-    this.geocoder.geocode({ address: query }, function (results, status) {
-        if (
-            status === google.maps.GeocoderStatus.ZERO_RESULTS ||
-            !results.length
-        ) {
-            self.displayWarning(
-                self.translations.error_could_not_geocode_address.replace(
-                    "%s",
-                    query
-                ),
-                {
+                self.displaySuccess(self.translations.success_address_geocoded, {
                     field: self.field,
-                }
-            );
-            return;
-        }
+                });
 
-        if (status !== google.maps.GeocoderStatus.OK) {
-            self.displayWarning("Google Maps Error: " + status, {
-                field: self.field,
-            });
-            return;
-        }
+                var placeInfo = place.toJSON();
+                self.field[0].value = placeInfo.formattedAddress;
 
-        var latLng = results[0].geometry.location;
-        self.field.trigger("searchGeocoded", [
-            { lat: latLng.lat(), lng: latLng.lng() },
-        ]);
-    });
+                var latLng = place.location
+                self.field.trigger("searchGeocoded", [
+                    { lat: latLng.lat(), lng: latLng.lng() },
+                ]);
+            })
+        })
+
+        this.placeAutocomplete = placeAutocomplete;
+    }
+
+    this.field[0].style.display = 'none';
+
+    placeAutocomplete.style.display = 'block';
+    placeAutocomplete.focus();
 };
 
 // Google Maps With Places
@@ -287,71 +358,59 @@ function GoogleMapsGeocoderPlacesField(options) {
     GeocoderField.call(this, options);
 
     this.delayTime = 400;
-    this.geocoder = new google.maps.Geocoder();
 
     var self = this;
-    var autocomplete = new google.maps.places.Autocomplete(this.field[0]);
-
-    autocomplete.addListener("place_changed", function () {
-        var place = autocomplete.getPlace();
+    var loading = false;
 
-        if (!place.geometry) {
-            self.geocodeSearch(place.name);
+    // Set up the autocomplete on the first focus that loads the SDK, a
+    // failed load is retried on the next focus
+    this.field.on("focus", function onFocus() {
+        if (loading) {
             return;
         }
 
-        self.displaySuccess(self.translations.success_address_geocoded, {
-            field: self.field,
-        });
-
-        var latLng = place.geometry.location;
-        self.field.trigger("searchGeocoded", [
-            { lat: latLng.lat(), lng: latLng.lng() },
-        ]);
+        loading = true;
+        window.wagtailGeoWidget
+            .loadGoogleMaps()
+            .then(function () {
+                self.initAutocomplete();
+                self.field.off("focus", onFocus);
+            })
+            .catch(function (error) {
+                loading = false;
+                self.displayWarning("Google Maps Error: " + error, {
+                    field: self.field,
+                });
+            });
     });
 }
 
-GoogleMapsGeocoderPlacesField.prototype = Object.create(GeocoderField.prototype);
+GoogleMapsGeocoderPlacesField.prototype = Object.create(GoogleMapsGeocoderField.prototype);
 GoogleMapsGeocoderPlacesField.prototype.constructor = GeocoderField;
 
-GoogleMapsGeocoderPlacesField.prototype.geocodeSearch = function (query) {
+GoogleMapsGeocoderPlacesField.prototype.initAutocomplete = function () {
     var self = this;
+    var autocomplete = new google.maps.places.Autocomplete(this.field[0]);
 
-    this.geocoder.geocode({ address: query }, function (results, status) {
-        if (
-            status === google.maps.GeocoderStatus.ZERO_RESULTS ||
-            !results.length
-        ) {
-            self.displayWarning(
-                self.translations.error_could_not_geocode_address.replace(
-                    "%s",
-                    query
-                ),
-                {
-                    field: self.field,
-                }
-            );
-            return;
-        }
+    autocomplete.addListener("place_changed", function () {
+        var place = autocomplete.getPlace();
 
-        if (status !== google.maps.GeocoderStatus.OK) {
-            self.displayWarning("Google Maps Error: " + status, {
-                field: self.field,
-            });
+        if (!place.geometry) {
+            self.geocodeSearch(place.name);
             return;
         }
 
-        var latLng = results[0].geometry.location;
+        self.displaySuccess(self.translations.success_address_geocoded, {
+            field: self.field,
+        });
+
+        var latLng = place.geometry.location;
         self.field.trigger("searchGeocoded", [
             { lat: latLng.lat(), lng: latLng.lng() },
         ]);
     });
 };
 
-
-
-
-
 // Mapbox
 function MapboxGeocoderField(options) {
     GeocoderField.call(this, options);
@@ -368,6 +427,11 @@ MapboxGeocoderField.prototype.constructor = GeocoderField;
 MapboxGeocoderField.prototype.geocodeSearch = function (query) {
     var self = this;
 
+    if (this.proxyUrl) {
+        this.proxySearch("mapbox", query);
+        return;
+    }
+
     var url =
         "https://api.mapbox.com/search/geocode/v6/forward?" +
         new URLSearchParams({
@@ -2,14 +2,17 @@
 "use strict";
 
 function GoogleMapsField(options) {
+    options = window.wagtailGeoWidget.withConfig(options);
+
     var id = options.id;
     var self = this;
     var defaultLocation = options.defaultLocation;
 
-    this.defaultLocation = new google.maps.LatLng(
-        parseFloat(defaultLocation.lat),
-        parseFloat(defaultLocation.lng)
-    );
+    // Converted to a google.maps.LatLng once the SDK has loaded
+    this.defaultLocation = {
+        lat: parseFloat(defaultLocation.lat),
+        lng: parseFloat(defaultLocation.lng),
+    };
 
     this.translations = options.translations;
     this.mapEl = $("#" + id + "_map");
@@ -19,9 +22,9 @@ function GoogleMapsField(options) {
     this.addressField = $(options.addressSelector);
     this.zoomField = $(options.zoomSelector);
     this.latLngField = $("#" + id + "_latlng");
-    this.geocoder = new google.maps.Geocoder();
     this.showEmptyLocation = options.showEmptyLocation;
     this.mapId = options.mapId;
+    this.reverseGeocodeUrl = options.reverseGeocodeUrl;
 
     if (this.zoomField && this.zoomField.val()) {
         this.zoom = parseInt(this.zoomField.val());
@@ -46,29 +49,136 @@ function GoogleMapsField(options) {
             self.setup();
         });
     } else {
-        this.setup();
+        this.setupWhenVisible();
     }
 }
 
 GoogleMapsField.prototype.setup = function () {
-    if (this.hasSetup) {
+    if (this.hasSetup || this.isLoading) {
         return;
     }
+
     var self = this;
 
-    this.initMap(this.mapEl, this.defaultLocation);
+    this.isLoading = true;
+
+    // hasSetup is only set once the SDK has loaded, a failed load is
+    // retried the next time the map is shown or the field is focused
+    window.wagtailGeoWidget
+        .loadGoogleMaps()
+        .then(function () {
+            self.isLoading = false;
+            self.hasSetup = true;
+            self.clearFieldMessage({ field: self.latLngField });
+            self.initialize();
+        })
+        .catch(function (error) {
+            self.isLoading = false;
+            self.displayWarning(
+                self.translations.error_could_not_load_map.replace(
+                    "%s",
+                    error.message
+                ),
+                { field: self.latLngField }
+            );
+        });
+};
+
+GoogleMapsField.prototype.initialize = function () {
+    var self = this;
+
+    this.defaultLocation = new google.maps.LatLng(
+        this.defaultLocation.lat,
+        this.defaultLocation.lng
+    );
+    this.geocoder = new google.maps.Geocoder();
+
+    // Coordinates typed while the SDK was loading replace the stored location
+    var typedLocation = this.parseStrToLatLng(this.latLngField.val() || "");
+    var location = typedLocation || this.defaultLocation;
+
+    this.initMap(this.mapEl, location);
     this.initEvents();
-    this.setMapPosition(this.defaultLocation);
-    this.updateLatLng(this.defaultLocation);
+    this.setMapPosition(location);
+    this.updateLatLng(location);
 
-    this.checkVisibility(function () {
-        var coords = $(self.latLngField).val();
-        google.maps.event.trigger(self.map, "resize");
-        var latLng = self.parseStrToLatLng(coords);
-        self.updateMapFromCoords(latLng);
-    });
+    if (typedLocation) {
+        this.writeLocation(typedLocation);
+    }
+
+    // Without the visibility observer the map is redrawn on resize instead
+    if (!this.visibilityObserver) {
+        this.observeResize(function () {
+            self.redraw();
+        });
+    }
+};
+
+GoogleMapsField.prototype.redraw = function () {
+    var coords = $(this.latLngField).val();
+    google.maps.event.trigger(this.map, "resize");
+    var latLng = this.parseStrToLatLng(coords);
+    if (latLng) {
+        this.updateMapFromCoords(latLng);
+    }
+};
+
+// The Maps API has no way to release the tiles of a map, hidden maps are
+// only marked so they are redrawn when shown again
+GoogleMapsField.prototype.freeze = function () {
+    if (!this.map) {
+        return;
+    }
+
+    this.frozen = true;
+};
+
+GoogleMapsField.prototype.thaw = function () {
+    if (!this.map || !this.frozen) {
+        return;
+    }
+
+    this.frozen = false;
+    this.redraw();
+};
+
+// Delays creating the map until it is scrolled into view or its tab/panel
+// is opened, maps that are never shown never get created. Once created the
+// map is redrawn when shown again.
+GoogleMapsField.prototype.setupWhenVisible = function () {
+    var self = this;
+    var el = this.mapEl[0];
 
-    this.hasSetup = true;
+    if (!el || !window.IntersectionObserver) {
+        this.setup();
+        return;
+    }
+
+    this.visibilityObserver = new IntersectionObserver(
+        function (entries) {
+            var isVisible = entries.some(function (entry) {
+                return entry.isIntersecting;
+            });
+
+            if (!isVisible) {
+                self.freeze();
+            } else if (!self.hasSetup) {
+                self.setup();
+            } else {
+                self.thaw();
+            }
+        },
+        { rootMargin: "200px" }
+    );
+    this.visibilityObserver.observe(el);
+
+    // Searching an address or typing a location requires the map
+    this.addressField.on("focus", function () {
+        self.setup();
+    });
+    this.latLngField.on("focus", function () {
+        self.setup();
+    });
 };
 
 GoogleMapsField.prototype.initMap = function (mapEl, defaultLocation) {
@@ -99,6 +209,7 @@ GoogleMapsField.prototype.initEvents = function () {
         self.setMapPosition(event.latLng);
         self.updateLatLng(event.latLng);
         self.writeLocation(event.latLng);
+        self.reverseGeocode(event.latLng);
     });
 
     google.maps.event.addListener(this.map, "zoom_changed", function () {
@@ -107,6 +218,11 @@ GoogleMapsField.prototype.initEvents = function () {
     });
 
     if (this.hasAddressFieldOwnGeocoder()) {
+        // The editor is typing an address, keep it over a pending lookup
+        this.addressField.on("input", function (_e) {
+            self.cancelReverseGeocode();
+        });
+
         this.addressField.on("searchGeocoded", function (_e, latLng) {
             var gMLatLng = new google.maps.LatLng(
                 parseFloat(latLng.lat),
@@ -127,6 +243,7 @@ GoogleMapsField.prototype.initEvents = function () {
 
         this.addressField.on("input", function (_e) {
             clearTimeout(self._timeoutId);
+            self.cancelReverseGeocode();
 
             var query = $(this).val();
 
@@ -186,6 +303,45 @@ GoogleMapsField.prototype.initEvents = function () {
     });
 };
 
+// Fills the address field with the address at latLng once the marker has
+// stopped moving, responses for earlier positions are ignored
+GoogleMapsField.prototype.reverseGeocode = function (latLng) {
+    var self = this;
+
+    if (!this.reverseGeocodeUrl || !this.addressField.length) {
+        return;
+    }
+
+    this.cancelReverseGeocode();
+
+    var requestId = this._reverseRequestId;
+    var geocoder =
+        this.addressField.data("geocoder-field-geocoder-value") || "google_maps";
+
+    this._reverseTimeoutId = setTimeout(function () {
+        window.wagtailGeoWidget
+            .reverseGeocode(self.reverseGeocodeUrl, geocoder, latLng.lat(), latLng.lng())
+            .then(function (address) {
+                if (address && requestId === self._reverseRequestId) {
+                    self.clearFieldMessage({ field: self.addressField });
+                    self.addressField.val(address);
+                }
+            })
+            .catch(function (error) {
+                if (requestId === self._reverseRequestId) {
+                    self.displayWarning("Geocoder Error: " + error.message, {
+                        field: self.addressField,
+                    });
+                }
+            });
+    }, 500);
+};
+
+GoogleMapsField.prototype.cancelReverseGeocode = function () {
+    clearTimeout(this._reverseTimeoutId);
+    this._reverseRequestId = (this._reverseRequestId || 0) + 1;
+};
+
 GoogleMapsField.prototype.genMessageId = function (field) {
     return "wagtailgeowdidget__" + field.attr("id") + "--warning";
 };
@@ -244,17 +400,26 @@ GoogleMapsField.prototype.clearAllFieldMessages = function () {
     });
 };
 
-GoogleMapsField.prototype.checkVisibility = function (callback) {
-    var self = this;
-    var intervalId = setInterval(function () {
-        var visible = $(self.map.getDiv()).is(":visible");
-        if (!visible) {
-            return;
-        }
+// Calls callback when a hidden map is shown again, such as when switching
+// back to its tab, so it can be redrawn with the correct size
+GoogleMapsField.prototype.observeResize = function (callback) {
+    var el = this.map.getDiv();
+    var wasHidden = false;
+
+    if (!window.ResizeObserver) {
+        return;
+    }
+
+    this.resizeObserver = new ResizeObserver(function (entries) {
+        var rect = entries[entries.length - 1].contentRect;
+        var isHidden = rect.width === 0 || rect.height === 0;
 
-        clearInterval(intervalId);
-        callback();
-    }, 1000);
+        if (wasHidden && !isHidden) {
+            callback();
+        }
+        wasHidden = isHidden;
+    });
+    this.resizeObserver.observe(el);
 };
 
 GoogleMapsField.prototype.geocodeSearch = function (query) {
@@ -1,5 +1,7 @@
 // This file must follow ES5
 function LeafletField(options) {
+    options = window.wagtailGeoWidget.withConfig(options);
+
     var id = options.id;
     var self = this;
 
@@ -19,6 +21,7 @@ function LeafletField(options) {
     this.latLngField = $("#" + id + "_latlng");
     this.tileLayer = options.tileLayer;
     this.tileLayerOptions = options.tileLayerOptions;
+    this.reverseGeocodeUrl = options.reverseGeocodeUrl;
 
     if (this.zoomField && this.zoomField.val()) {
         this.zoom = parseInt(this.zoomField.val());
@@ -43,37 +46,139 @@ function LeafletField(options) {
             self.setup();
         });
     } else {
-        this.setup();
+        this.setupWhenVisible();
     }
 }
 
 LeafletField.prototype.setup = function () {
-    if (this.hasSetup) {
+    if (this.hasSetup || this.isLoading) {
         return;
     }
 
     var self = this;
 
-    this.initMap(this.mapEl, this.defaultLocation);
+    this.isLoading = true;
+
+    // hasSetup is only set once the SDK has loaded, a failed load is
+    // retried the next time the map is shown or the field is focused
+    window.wagtailGeoWidget
+        .loadLeaflet()
+        .then(function () {
+            self.isLoading = false;
+            self.hasSetup = true;
+            self.clearFieldMessage({ field: self.latLngField });
+            self.initialize();
+        })
+        .catch(function (error) {
+            self.isLoading = false;
+            self.displayWarning(
+                self.translations.error_could_not_load_map.replace(
+                    "%s",
+                    error.message
+                ),
+                { field: self.latLngField }
+            );
+        });
+};
+
+LeafletField.prototype.initialize = function () {
+    var self = this;
+
+    // Coordinates typed while the SDK was loading replace the stored location
+    var typedLocation = this.parseStrToLatLng(this.latLngField.val() || "");
+    var location = typedLocation || this.defaultLocation;
+
+    this.initMap(this.mapEl, location);
     this.initEvents();
-    this.setMapPosition(this.defaultLocation);
-    this.updateLatLng(this.defaultLocation);
+    this.setMapPosition(location);
+    this.updateLatLng(location);
 
-    this.checkVisibility(function () {
-        var coords = self.latLngField.val();
-        var latLng = self.parseStrToLatLng(coords);
+    if (typedLocation) {
+        this.writeLocation(typedLocation);
+    }
 
-        self.map.invalidateSize();
-        self.updateMapFromCoords(latLng);
-    });
+    // Without the visibility observer the map is redrawn on resize instead
+    if (!this.visibilityObserver) {
+        this.observeResize(function () {
+            self.redraw();
+        });
+    }
+};
+
+LeafletField.prototype.redraw = function () {
+    var coords = this.latLngField.val();
+    var latLng = this.parseStrToLatLng(coords);
+
+    this.map.invalidateSize();
+    if (latLng) {
+        this.updateMapFromCoords(latLng);
+    }
+};
+
+// Hidden maps drop their tiles, so they stop loading and holding them while
+// scrolled out of view or in a closed tab/panel
+LeafletField.prototype.freeze = function () {
+    if (!this.map || this.frozen) {
+        return;
+    }
+
+    this.frozen = true;
+    this.map.removeLayer(this.tiles);
+};
+
+LeafletField.prototype.thaw = function () {
+    if (!this.map || !this.frozen) {
+        return;
+    }
+
+    this.frozen = false;
+    this.redraw();
+    this.tiles.addTo(this.map);
+};
+
+// Delays creating the map until it is scrolled into view or its tab/panel
+// is opened, maps that are never shown never get created. Once created the
+// map is frozen while hidden and redrawn when shown again.
+LeafletField.prototype.setupWhenVisible = function () {
+    var self = this;
+    var el = this.mapEl[0];
 
-    this.hasSetup = true;
+    if (!el || !window.IntersectionObserver) {
+        this.setup();
+        return;
+    }
+
+    this.visibilityObserver = new IntersectionObserver(
+        function (entries) {
+            var isVisible = entries.some(function (entry) {
+                return entry.isIntersecting;
+            });
+
+            if (!isVisible) {
+                self.freeze();
+            } else if (!self.hasSetup) {
+                self.setup();
+            } else {
+                self.thaw();
+            }
+        },
+        { rootMargin: "200px" }
+    );
+    this.visibilityObserver.observe(el);
+
+    // Searching an address or typing a location requires the map
+    this.addressField.on("focus", function () {
+        self.setup();
+    });
+    this.latLngField.on("focus", function () {
+        self.setup();
+    });
 };
 
 LeafletField.prototype.initMap = function (mapEl, defaultLocation) {
     var map = L.map(mapEl[0]).setView(defaultLocation, this.zoom);
 
-    L.tileLayer(
+    var tiles = L.tileLayer(
         this.tileLayer,
         Object.assign(
             {},
@@ -87,6 +192,7 @@ LeafletField.prototype.initMap = function (mapEl, defaultLocation) {
     let marker = L.marker(defaultLocation, { draggable: true }).addTo(map);
 
     this.map = map;
+    this.tiles = tiles;
     this.marker = marker;
 };
 
@@ -99,6 +205,7 @@ LeafletField.prototype.initEvents = function () {
         self.setMapPosition(latLng);
         self.updateLatLng(latLng);
         self.writeLocation(latLng);
+        self.reverseGeocode(latLng);
     });
 
     self.map.on("zoomend", function (_e) {
@@ -151,6 +258,11 @@ LeafletField.prototype.initEvents = function () {
         self.updateZoomLevel(zoom);
     });
 
+    // The editor is typing an address, keep it over a pending lookup
+    this.addressField.on("input", function (_e) {
+        self.cancelReverseGeocode();
+    });
+
     this.addressField.on("searchGeocoded", function (_e, latLng) {
         self.setMapPosition(latLng);
         self.updateLatLng(latLng);
@@ -158,6 +270,45 @@ LeafletField.prototype.initEvents = function () {
     });
 };
 
+// Fills the address field with the address at latLng once the marker has
+// stopped moving, responses for earlier positions are ignored
+LeafletField.prototype.reverseGeocode = function (latLng) {
+    var self = this;
+
+    if (!this.reverseGeocodeUrl || !this.addressField.length) {
+        return;
+    }
+
+    this.cancelReverseGeocode();
+
+    var requestId = this._reverseRequestId;
+    var geocoder =
+        this.addressField.data("geocoder-field-geocoder-value") || "nominatim";
+
+    this._reverseTimeoutId = setTimeout(function () {
+        window.wagtailGeoWidget
+            .reverseGeocode(self.reverseGeocodeUrl, geocoder, latLng.lat, latLng.lng)
+            .then(function (address) {
+                if (address && requestId === self._reverseRequestId) {
+                    self.clearFieldMessage({ field: self.addressField });
+                    self.addressField.val(address);
+                }
+            })
+            .catch(function (error) {
+                if (requestId === self._reverseRequestId) {
+                    self.displayWarning("Geocoder Error: " + error.message, {
+                        field: self.addressField,
+                    });
+                }
+            });
+    }, 500);
+};
+
+LeafletField.prototype.cancelReverseGeocode = function () {
+    clearTimeout(this._reverseTimeoutId);
+    this._reverseRequestId = (this._reverseRequestId || 0) + 1;
+};
+
 LeafletField.prototype.displayWarning = function (msg, options) {
     var warningMsg;
     var field = options.field;
@@ -253,17 +404,26 @@ LeafletField.locationStringToStruct = function (locationString) {
     };
 };
 
-LeafletField.prototype.checkVisibility = function (callback) {
-    var self = this;
-    var intervalId = setInterval(function () {
-        var visible = self.mapEl.is(":visible");
-        if (!visible) {
-            return;
-        }
+// Calls callback when a hidden map is shown again, such as when switching
+// back to its tab, so it can be redrawn with the correct size
+LeafletField.prototype.observeResize = function (callback) {
+    var el = this.mapEl[0];
+    var wasHidden = false;
+
+    if (!window.ResizeObserver) {
+        return;
+    }
+
+    this.resizeObserver = new ResizeObserver(function (entries) {
+        var rect = entries[entries.length - 1].contentRect;
+        var isHidden = rect.width === 0 || rect.height === 0;
 
-        clearInterval(intervalId);
-        callback();
-    }, 1000);
+        if (wasHidden && !isHidden) {
+            callback();
+        }
+        wasHidden = isHidden;
+    });
+    this.resizeObserver.observe(el);
 };
 
 LeafletField.prototype.setState = function (newState) {
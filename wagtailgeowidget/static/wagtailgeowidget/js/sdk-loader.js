@@ -0,0 +1,98 @@
+// This file must follow ES5
+(function () {
+    var promises = {};
+
+    function setIntegrity(el, integrity) {
+        if (integrity) {
+            el.integrity = integrity;
+            el.crossOrigin = "anonymous";
+        }
+    }
+
+    function loadScript(src, integrity) {
+        return new Promise(function (resolve, reject) {
+            var script = document.createElement("script");
+            script.src = src;
+            script.async = true;
+            setIntegrity(script, integrity);
+            script.onload = resolve;
+            script.onerror = function () {
+                reject(new Error("Could not load " + src));
+            };
+            document.head.appendChild(script);
+        });
+    }
+
+    function loadStylesheet(href, integrity) {
+        if (document.querySelector('link[href="' + href + '"]')) {
+            return;
+        }
+
+        var link = document.createElement("link");
+        link.rel = "stylesheet";
+        link.href = href;
+        setIntegrity(link, integrity);
+        document.head.appendChild(link);
+    }
+
+    // Map SDKs are only requested once a field is about to be displayed,
+    // concurrent callers share the same promise
+    function once(name, load) {
+        if (!promises[name]) {
+            promises[name] = load().catch(function (error) {
+                delete promises[name];
+                throw error;
+            });
+        }
+        return promises[name];
+    }
+
+    function loadGoogleMaps() {
+        return once("googleMaps", function () {
+            if (window.google && window.google.maps && window.google.maps.Map) {
+                return Promise.resolve();
+            }
+
+            var config = window.wagtailGeoWidget.getConfig();
+
+            return new Promise(function (resolve, reject) {
+                window.wagtailGeoWidgetGoogleMapsReady = resolve;
+
+                loadScript(
+                    config.googleMapsApiUrl +
+                        "&loading=async&callback=wagtailGeoWidgetGoogleMapsReady"
+                ).catch(reject);
+            });
+        });
+    }
+
+    function loadLeaflet() {
+        return once("leaflet", function () {
+            if (window.L && window.L.map) {
+                return Promise.resolve();
+            }
+
+            var config = window.wagtailGeoWidget.getConfig();
+
+            loadStylesheet(config.leafletCss, config.leafletCssIntegrity);
+            return loadScript(config.leafletJs, config.leafletJsIntegrity).then(
+                function () {
+                    // Markers use the image urls as served instead of
+                    // guessing them from leaflet.css
+                    L.Marker.prototype.options.icon = L.icon(
+                        Object.assign(
+                            {},
+                            L.Icon.Default.prototype.options,
+                            config.leafletIcons
+                        )
+                    );
+                }
+            );
+        });
+    }
+
+    window.wagtailGeoWidget = Object.assign(window.wagtailGeoWidget || {}, {
+        loadGoogleMaps: loadGoogleMaps,
+        loadLeaflet: loadLeaflet,
+    });
+})();
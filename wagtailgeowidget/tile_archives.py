@@ -0,0 +1,384 @@
+import gzip
+import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Union
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "avif": "image/avif",
+    "pbf": "application/vnd.mapbox-vector-tile",
+    "mvt": "application/vnd.mapbox-vector-tile",
+}
+
+DIRECTORY_CACHE_SIZE = 128
+
+logger = logging.getLogger(__name__)
+
+
+class TileArchiveError(Exception):
+    pass
+
+
+def get_stat_key(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise TileArchiveError(str(e))
+
+    return stat.st_size, stat.st_mtime_ns
+
+
+class TileArchive:
+    """
+    Read only access to a file holding a whole tile pyramid.
+    """
+
+    content_type = "image/png"
+    content_encoding: Optional[str] = None
+    max_zoom: Optional[int] = None
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stat_key = get_stat_key(path)
+
+        fingerprint = "{}:{}:{}".format(path, *self.stat_key)
+        self.version = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+    def get_tile(self, z: int, x: int, y: int) -> Optional[Union[bytes, memoryview]]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MBTilesArchive(TileArchive):
+    """
+    Reads tiles from a MBTiles (SQLite) file, the database is opened read
+    only with memory mapped I/O and one connection per thread.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        try:
+            metadata = dict(
+                self.connection.execute("SELECT name, value FROM metadata").fetchall()
+            )
+        except sqlite3.Error as e:
+            self.close()
+            raise TileArchiveError("{} is not a MBTiles file: {}".format(path, e))
+
+        tile_format = metadata.get("format", "png")
+        self.content_type = CONTENT_TYPES.get(tile_format, "application/octet-stream")
+        if tile_format == "pbf":
+            self.content_encoding = "gzip"
+
+        if "maxzoom" in metadata:
+            self.max_zoom = int(metadata["maxzoom"])
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            try:
+                # Connections are only used by their own thread, but closed
+                # from the thread replacing the archive
+                connection = sqlite3.connect(
+                    "file:{}?mode=ro&immutable=1".format(self.path),
+                    uri=True,
+                    check_same_thread=False,
+                )
+            except sqlite3.Error as e:
+                raise TileArchiveError(str(e))
+
+            with self._connections_lock:
+                self._connections.append(connection)
+
+            connection.execute("PRAGMA mmap_size={}".format(self.stat_key[0]))
+            self._local.connection = connection
+        return connection
+
+    def get_tile(self, z, x, y):
+        # MBTiles rows use the TMS scheme, with y counted from the bottom
+        row = self.connection.execute(
+            "SELECT tile_data FROM tiles "
+            "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, (1 << z) - 1 - y),
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+
+        for connection in connections:
+            connection.close()
+
+
+class PMTilesEntry(NamedTuple):
+    tile_id: int
+    offset: int
+    length: int
+    run_length: int
+
+
+PMTILES_HEADER = struct.Struct("<7sBQQQQQQQQQQQBBBBBBiiiiBii")
+
+PMTILES_COMPRESSION_NONE = 1
+PMTILES_COMPRESSION_GZIP = 2
+
+PMTILES_TILE_TYPES = {
+    1: "application/vnd.mapbox-vector-tile",
+    2: "image/png",
+    3: "image/jpeg",
+    4: "image/webp",
+    5: "image/avif",
+}
+
+# A tile is at most behind a root and three leaf directories
+PMTILES_MAX_DEPTH = 4
+
+
+def _read_varint(data: bytes, pos: int):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zxy_to_tile_id(z: int, x: int, y: int) -> int:
+    """
+    Returns the PMTiles id of a tile, its position on the Hilbert curve
+    after all tiles of the lower zoom levels.
+    """
+
+    tile_id = ((1 << (2 * z)) - 1) // 3
+    n = 1 << z
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        tile_id += s * s * ((3 * rx) ^ ry)
+
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+
+    return tile_id
+
+
+def deserialize_directory(data: bytes) -> List[PMTilesEntry]:
+    num_entries, pos = _read_varint(data, 0)
+
+    tile_ids = []
+    last_id = 0
+    for _ in range(num_entries):
+        delta, pos = _read_varint(data, pos)
+        last_id += delta
+        tile_ids.append(last_id)
+
+    run_lengths = []
+    for _ in range(num_entries):
+        run_length, pos = _read_varint(data, pos)
+        run_lengths.append(run_length)
+
+    lengths = []
+    for _ in range(num_entries):
+        length, pos = _read_varint(data, pos)
+        lengths.append(length)
+
+    entries = []
+    for i in range(num_entries):
+        offset, pos = _read_varint(data, pos)
+        if offset == 0 and i > 0:
+            # Zero means the data directly follows the previous entry
+            offset = entries[i - 1].offset + entries[i - 1].length
+        else:
+            offset -= 1
+
+        entries.append(PMTilesEntry(tile_ids[i], offset, lengths[i], run_lengths[i]))
+
+    return entries
+
+
+def find_entry(entries: List[PMTilesEntry], tile_id: int) -> Optional[PMTilesEntry]:
+    low = 0
+    high = len(entries) - 1
+    while low <= high:
+        middle = (low + high) >> 1
+        entry_id = entries[middle].tile_id
+        if tile_id > entry_id:
+            low = middle + 1
+        elif tile_id < entry_id:
+            high = middle - 1
+        else:
+            return entries[middle]
+
+    if high >= 0:
+        entry = entries[high]
+        # Leaf directory entries have a run length of zero
+        if entry.run_length == 0 or tile_id - entry.tile_id < entry.run_length:
+            return entry
+
+    return None
+
+
+class PMTilesArchive(TileArchive):
+    """
+    Reads tiles from a PMTiles v3 file mapped in memory, tiles are returned
+    as memoryview slices of the mapping. Decoded directories are kept in a
+    small LRU cache.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+
+        if self.stat_key[0] < PMTILES_HEADER.size:
+            raise TileArchiveError("{} is not a PMTiles file".format(path))
+
+        with open(path, "rb") as fd:
+            self._mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = PMTILES_HEADER.unpack_from(self._mmap, 0)
+        if header[0] != b"PMTiles" or header[1] != 3:
+            self._mmap.close()
+            raise TileArchiveError("{} is not a PMTiles v3 file".format(path))
+
+        self._view = memoryview(self._mmap)
+
+        (
+            self.root_offset,
+            self.root_length,
+            _metadata_offset,
+            _metadata_length,
+            self.leaf_offset,
+            _leaf_length,
+            self.data_offset,
+        ) = header[2:9]
+
+        self.internal_compression = header[14]
+        tile_compression = header[15]
+        self.content_type = PMTILES_TILE_TYPES.get(
+            header[16], "application/octet-stream"
+        )
+        if tile_compression == PMTILES_COMPRESSION_GZIP:
+            self.content_encoding = "gzip"
+        self.max_zoom = header[18]
+
+        self.get_directory = lru_cache(maxsize=DIRECTORY_CACHE_SIZE)(
+            self._read_directory
+        )
+
+    def _read_directory(self, offset: int, length: int) -> List[PMTilesEntry]:
+        data = self._mmap[offset : offset + length]
+
+        if self.internal_compression == PMTILES_COMPRESSION_GZIP:
+            data = gzip.decompress(data)
+        elif self.internal_compression != PMTILES_COMPRESSION_NONE:
+            raise TileArchiveError("Unsupported PMTiles directory compression")
+
+        return deserialize_directory(data)
+
+    def get_tile(self, z, x, y):
+        tile_id = zxy_to_tile_id(z, x, y)
+        offset, length = self.root_offset, self.root_length
+
+        for _depth in range(PMTILES_MAX_DEPTH):
+            entry = find_entry(self.get_directory(offset, length), tile_id)
+            if entry is None:
+                return None
+
+            if entry.run_length > 0:
+                start = self.data_offset + entry.offset
+                return self._view[start : start + entry.length]
+
+            offset, length = self.leaf_offset + entry.offset, entry.length
+
+        return None
+
+    def close(self):
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A tile is still being sent by another thread, the mapping is
+            # closed once its last slice is released
+            pass
+
+
+def open_archive(path: str) -> TileArchive:
+    if path.endswith(".mbtiles"):
+        return MBTilesArchive(path)
+
+    if path.endswith(".pmtiles"):
+        return PMTilesArchive(path)
+
+    raise TileArchiveError("Unsupported tile archive '{}'".format(path))
+
+
+_archive: Optional[TileArchive] = None
+_archive_lock = threading.Lock()
+
+# The archive that last failed to open, as (path, stat key)
+_failed_archive = None
+
+
+def get_tile_archive() -> Optional[TileArchive]:
+    """
+    Returns the archive set in GEO_WIDGET_TILE_ARCHIVE, reopened when the
+    file is replaced. Returns None when the archive can't be opened, the
+    error is logged once for every version of the file.
+    """
+
+    global _archive, _failed_archive
+    from wagtailgeowidget import app_settings
+
+    path = app_settings.GEO_WIDGET_TILE_ARCHIVE
+    if not path:
+        return None
+
+    try:
+        stat_key = get_stat_key(path)
+    except TileArchiveError:
+        stat_key = None
+
+    with _archive_lock:
+        if _archive and _archive.path == path and _archive.stat_key == stat_key:
+            return _archive
+
+        if _failed_archive == (path, stat_key):
+            return None
+
+        previous = _archive
+        _archive = None
+        if previous:
+            previous.close()
+
+        try:
+            _archive = open_archive(path)
+        except (TileArchiveError, OSError, ValueError):
+            _failed_archive = (path, stat_key)
+            logger.exception("Could not open the tile archive %s", path)
+
+        return _archive
@@ -0,0 +1,356 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+from wagtailgeowidget.upstream import (
+    RateLimiter,
+    SingleFlight,
+    UpstreamError,
+    get_rate_limiter,
+    pool,
+)
+
+MAX_ZOOM = 24
+
+# Web Mercator tiles stop at this latitude
+MAX_LATITUDE = 85.0511287798
+
+# Fraction of the max size the cache is trimmed to when evicting, so
+# eviction does not run on every write once the cache is full
+EVICTION_TARGET = 0.9
+
+# Seconds after which the size of the cache is read from disk again, to
+# account for the tiles written and evicted by other processes
+SIZE_SCAN_INTERVAL = 60
+
+# Tiles requested at once by a map filling the screen
+TILE_PROXY_BURST = 20
+
+
+class TileError(Exception):
+    pass
+
+
+class Tile(NamedTuple):
+    body: bytes
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched: float
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def lnglat_to_tile(lng: float, lat: float, z: int) -> Tuple[int, int]:
+    """
+    Returns the x/y of the Web Mercator tile containing lng/lat at zoom z.
+    """
+
+    n = 1 << z
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    lat_rad = math.radians(lat)
+
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bbox(
+    bbox: Tuple[float, float, float, float], min_zoom: int, max_zoom: int
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    Yields the z/x/y of every tile covering bbox (min_lng, min_lat, max_lng,
+    max_lat) from min_zoom to max_zoom, zoom level by zoom level.
+    """
+
+    min_lng, min_lat, max_lng, max_lat = bbox
+    for z in range(min_zoom, max_zoom + 1):
+        min_x, min_y = lnglat_to_tile(min_lng, max_lat, z)
+        max_x, max_y = lnglat_to_tile(max_lng, min_lat, z)
+
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                yield z, x, y
+
+
+def count_tiles_in_bbox(
+    bbox: Tuple[float, float, float, float], min_zoom: int, max_zoom: int
+) -> int:
+    min_lng, min_lat, max_lng, max_lat = bbox
+    count = 0
+    for z in range(min_zoom, max_zoom + 1):
+        min_x, min_y = lnglat_to_tile(min_lng, max_lat, z)
+        max_x, max_y = lnglat_to_tile(max_lng, min_lat, z)
+        count += (max_x - min_x + 1) * (max_y - min_y + 1)
+    return count
+
+
+def get_tile_url(template: str, z: int, x: int, y: int, subdomains="abc") -> str:
+    """
+    Formats a Leaflet style tile url template ({s}, {z}, {x}, {y}, {r}).
+    """
+
+    subdomain = subdomains[(x + y) % len(subdomains)] if subdomains else ""
+    return (
+        template.replace("{s}", subdomain)
+        .replace("{z}", str(z))
+        .replace("{x}", str(x))
+        .replace("{y}", str(y))
+        .replace("{r}", "")
+    )
+
+
+class TileCache:
+    """
+    On disk tile cache, sharded in directories by zoom level and hash to
+    keep directories small. The modification time of a file is bumped when
+    it is read and the least recently used tiles are evicted once the cache
+    grows above max_size bytes. The size is tracked between scans of the
+    disk, which run outside of the lock in the writing thread.
+
+    Each file holds a json header line with the upstream validators followed
+    by the tile body, and is written atomically.
+    """
+
+    def __init__(self, root: str, max_size: int):
+        self.root = root
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._scanned = 0.0
+        self._scanning = False
+
+    def get_path(self, z: int, x: int, y: int) -> str:
+        key = "{}/{}/{}".format(z, x, y)
+        shard = hashlib.sha1(key.encode("ascii")).hexdigest()[:2]
+        return os.path.join(self.root, str(z), shard, "{}-{}.tile".format(x, y))
+
+    def get(self, z: int, x: int, y: int) -> Optional[Tile]:
+        path = self.get_path(z, x, y)
+
+        try:
+            with open(path, "rb") as fd:
+                header = json.loads(fd.readline().decode("utf-8"))
+                body = fd.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        return Tile(body=body, **header)
+
+    def set(self, z: int, x: int, y: int, tile: Tile) -> None:
+        path = self.get_path(z, x, y)
+        header = json.dumps(
+            {
+                "content_type": tile.content_type,
+                "etag": tile.etag,
+                "last_modified": tile.last_modified,
+                "fetched": tile.fetched,
+            }
+        )
+        data = header.encode("utf-8") + b"\n" + tile.body
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            previous_size = os.path.getsize(path)
+        except OSError:
+            previous_size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data) - previous_size
+
+            scan = not self._scanning and (
+                self._size is None
+                or self._size > self.max_size
+                or time.monotonic() - self._scanned > SIZE_SCAN_INTERVAL
+            )
+            if scan:
+                self._scanning = True
+
+        if scan:
+            self._scan()
+
+    def touch(self, z: int, x: int, y: int, tile: Tile) -> Tile:
+        """
+        Marks a cached tile as fresh after a successful revalidation.
+        """
+
+        tile = tile._replace(fetched=time.time())
+        self.set(z, x, y, tile)
+        return tile
+
+    def _files(self):
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tile"):
+                    yield os.path.join(dirpath, filename)
+
+    def _scan(self) -> None:
+        size = None
+        try:
+            size = self._evict()
+        finally:
+            with self._lock:
+                self._size = size
+                self._scanned = time.monotonic()
+                self._scanning = False
+
+    def _evict(self) -> int:
+        """
+        Removes the least recently used tiles when the cache on disk is
+        above max_size and returns its size.
+        """
+
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        if size <= self.max_size:
+            return size
+
+        target = self.max_size * EVICTION_TARGET
+        for _mtime, file_size, path in sorted(entries):
+            if size <= target:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= file_size
+
+        return size
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in list(self._files()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+
+class TileProxy:
+    """
+    Fetches tiles from the upstream tile layer through the disk cache.
+    Stale tiles are revalidated with conditional requests and served as is
+    when the upstream can not be reached.
+    """
+
+    def __init__(
+        self,
+        cache: TileCache,
+        timeout: int,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.cache = cache
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.single_flight = SingleFlight()
+
+    def get_tile(self, z: int, x: int, y: int) -> Tile:
+        return self.single_flight.do((z, x, y), lambda: self._get_tile(z, x, y))
+
+    def _get_tile(self, z: int, x: int, y: int) -> Tile:
+        cached = self.cache.get(z, x, y)
+        if cached and time.time() - cached.fetched < self.timeout:
+            return cached
+
+        headers: Dict[str, str] = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        try:
+            response = pool.request(
+                "GET", self.get_upstream_url(z, x, y), headers=headers
+            )
+        except UpstreamError as e:
+            if cached:
+                return cached
+            raise TileError(str(e))
+
+        if response.status == 304 and cached:
+            return self.cache.touch(z, x, y, cached)
+
+        if response.status != 200:
+            if cached:
+                return cached
+            raise TileError(
+                "Tile server responded with status {}".format(response.status)
+            )
+
+        tile = Tile(
+            body=response.body,
+            content_type=response.headers.get("content-type", "image/png"),
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            fetched=time.time(),
+        )
+        self.cache.set(z, x, y, tile)
+        return tile
+
+    def get_upstream_url(self, z: int, x: int, y: int) -> str:
+        from wagtailgeowidget import app_settings
+
+        subdomains = app_settings.GEO_WIDGET_LEAFLET_TILE_LAYER_OPTIONS.get(
+            "subdomains", "abc"
+        )
+        return get_tile_url(
+            app_settings.GEO_WIDGET_LEAFLET_TILE_LAYER, z, x, y, subdomains
+        )
+
+
+_proxy: Optional[TileProxy] = None
+_proxy_lock = threading.Lock()
+
+
+def get_tile_proxy() -> TileProxy:
+    """
+    Returns the shared tile proxy configured from the settings.
+    """
+
+    global _proxy
+    from wagtailgeowidget import app_settings
+
+    root = app_settings.GEO_WIDGET_TILE_CACHE_DIR or os.path.join(
+        tempfile.gettempdir(), "wagtailgeowidget-tiles"
+    )
+
+    rate_limiter = get_rate_limiter(
+        "tiles", app_settings.GEO_WIDGET_TILE_PROXY_RATE_LIMIT, TILE_PROXY_BURST
+    )
+
+    with _proxy_lock:
+        if _proxy is None or _proxy.cache.root != root:
+            _proxy = TileProxy(
+                TileCache(root, app_settings.GEO_WIDGET_TILE_CACHE_MAX_SIZE),
+                app_settings.GEO_WIDGET_TILE_CACHE_TIMEOUT,
+                rate_limiter=rate_limiter,
+            )
+
+    return _proxy
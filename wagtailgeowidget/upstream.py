@@ -0,0 +1,239 @@
+import http.client
+import threading
+import time
+import urllib.parse
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from wagtailgeowidget import __version__
+
+USER_AGENT = "wagtailgeowidget/{}".format(__version__)
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_POOL_SIZE = 10
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class Response(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+class ConnectionPool:
+    """
+    Keeps idle keep-alive connections per host, so consecutive requests to
+    the same provider reuse the established TCP/TLS connection.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str, Optional[int]], list] = {}
+
+    def _new_connection(self, scheme: str, host: str, port: Optional[int]):
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _get(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+
+        return self._new_connection(*key), False
+
+    def _put(self, key, connection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+    ) -> Response:
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+
+        path = parts.path or "/"
+        query = parts.query
+        if params:
+            query = "&".join(filter(None, [query, urllib.parse.urlencode(params)]))
+        if query:
+            path = "{}?{}".format(path, query)
+
+        request_headers = {"User-Agent": USER_AGENT}
+        request_headers.update(headers or {})
+
+        connection, reused = self._get(key)
+        try:
+            response, body = self._send(connection, method, path, request_headers)
+        except (http.client.HTTPException, OSError) as e:
+            connection.close()
+            if not reused:
+                raise UpstreamError(
+                    "Could not connect to {}: {}".format(parts.netloc, e)
+                )
+
+            # Idle connections may have been closed by the server, retry once
+            connection = self._new_connection(*key)
+            try:
+                response, body = self._send(connection, method, path, request_headers)
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                raise UpstreamError(str(e))
+
+        result = Response(
+            status=response.status,
+            headers={k.lower(): v for k, v in response.getheaders()},
+            body=body,
+        )
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._put(key, connection)
+
+        return result
+
+    def _send(self, connection, method, path, headers):
+        # The body is read here so timeouts and resets while reading it are
+        # handled like connection errors
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        return response, response.read()
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+def validate_rate(rate: float, burst: int) -> None:
+    # A rate of zero would divide by zero, and a burst below one never
+    # fills up to a whole token
+    if not rate > 0:
+        raise ValueError("Rate limits must be positive, got {!r}".format(rate))
+
+    if burst < 1:
+        raise ValueError("Rate limit bursts must be at least 1, got {!r}".format(burst))
+
+
+class RateLimiter:
+    """
+    Token bucket allowing rate requests per second with bursts of up to
+    burst requests, acquire blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        validate_rate(rate, burst)
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, burst: int) -> None:
+        validate_rate(rate, burst)
+        with self._lock:
+            self.rate = rate
+            self.burst = burst
+            self._tokens = min(self._tokens, float(burst))
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key, only the first caller runs
+    the function while the others wait for and share its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict = {}
+
+    def do(self, key, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+        return call.result
+
+
+pool = ConnectionPool()
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, rate: float, burst: int = 1) -> RateLimiter:
+    """
+    Returns the limiter shared by all callers of name, updated to rate and
+    burst when they have changed since it was created.
+    """
+
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(name)
+        if limiter is None:
+            limiter = _rate_limiters[name] = RateLimiter(rate, burst)
+        elif limiter.rate != rate or limiter.burst != burst:
+            limiter.configure(rate, burst)
+
+    return limiter
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from wagtailgeowidget import views
+
+# Views that set their own caching headers, the Wagtail admin urls
+# are never cached
+app_name = "wagtailgeowidget_public"
+
+urlpatterns = [
+    path("tiles/<int:z>/<int:x>/<int:y>/", views.tile, name="tile"),
+    path(
+        "tiles/<str:version>/<int:z>/<int:x>/<int:y>/",
+        views.archive_tile,
+        name="archive_tile",
+    ),
+]
@@ -0,0 +1,351 @@
+import hashlib
+import struct
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from django.db import connections, models
+from django.db.models import F, Func
+
+from wagtailgeowidget.clustering import (
+    MAX_LATITUDE,
+    iter_cells,
+    lat_to_y,
+    lng_to_x,
+    x_to_lng,
+    y_to_lat,
+)
+from wagtailgeowidget.geojson import filter_bbox, is_point_field
+from wagtailgeowidget.indexes import IndexedSource, register_source
+
+CONTENT_TYPE = "application/vnd.mapbox-vector-tile"
+
+DEFAULT_EXTENT = 4096
+# Points this many tile units outside a tile are included, so markers on
+# tile borders aren't cut off
+DEFAULT_BUFFER = 64
+
+# Zoom level of the buckets of PointIndex
+INDEX_ZOOM = 12
+
+# How long rendered tiles are cached, the version in the cache key changes
+# whenever a location changes
+TILE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Protobuf wire types
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+
+GEOM_TYPE_POINT = 1
+# MoveTo command with a count of one
+MOVE_TO_ONE = (1 << 3) | 1
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _write_key(out: bytearray, field: int, wire_type: int) -> None:
+    _write_varint(out, (field << 3) | wire_type)
+
+
+def _write_bytes(out: bytearray, field: int, value: bytes) -> None:
+    _write_key(out, field, LENGTH_DELIMITED)
+    _write_varint(out, len(value))
+    out += value
+
+
+def encode_value(value) -> bytes:
+    """
+    Encodes a property as a vector tile Value message.
+    """
+
+    out = bytearray()
+    if isinstance(value, bool):
+        _write_key(out, 7, VARINT)
+        _write_varint(out, int(value))
+    elif isinstance(value, int) and value >= 0:
+        _write_key(out, 5, VARINT)
+        _write_varint(out, value)
+    elif isinstance(value, int):
+        _write_key(out, 6, VARINT)
+        _write_varint(out, _zigzag(value))
+    elif isinstance(value, float):
+        _write_key(out, 3, FIXED64)
+        out += struct.pack("<d", value)
+    else:
+        _write_bytes(out, 1, str(value).encode("utf-8"))
+    return bytes(out)
+
+
+def encode_tile(
+    layer_name: str,
+    features: Iterable[Tuple[Any, int, int, Dict[str, Any]]],
+    extent: int = DEFAULT_EXTENT,
+) -> bytes:
+    """
+    Encodes point features (id, x, y, properties) as a Mapbox Vector Tile
+    with a single layer, x and y are in tile units from the top left.
+    Returns an empty tile when there are no features.
+    """
+
+    keys: Dict[str, int] = {}
+    values: Dict[bytes, int] = {}
+    layer = bytearray()
+
+    _write_key(layer, 15, VARINT)
+    _write_varint(layer, 2)
+    _write_bytes(layer, 1, layer_name.encode("utf-8"))
+
+    empty = True
+    for feature_id, x, y, properties in features:
+        empty = False
+        feature = bytearray()
+
+        # Ids are unsigned integers, other primary keys are left out
+        if isinstance(feature_id, int) and not isinstance(feature_id, bool):
+            if feature_id >= 0:
+                _write_key(feature, 1, VARINT)
+                _write_varint(feature, feature_id)
+
+        tags = bytearray()
+        for name, value in properties.items():
+            if value is None:
+                continue
+            _write_varint(tags, keys.setdefault(name, len(keys)))
+            encoded = encode_value(value)
+            _write_varint(tags, values.setdefault(encoded, len(values)))
+        if tags:
+            _write_bytes(feature, 2, tags)
+
+        _write_key(feature, 3, VARINT)
+        _write_varint(feature, GEOM_TYPE_POINT)
+
+        geometry = bytearray()
+        _write_varint(geometry, MOVE_TO_ONE)
+        _write_varint(geometry, _zigzag(x))
+        _write_varint(geometry, _zigzag(y))
+        _write_bytes(feature, 4, geometry)
+
+        _write_bytes(layer, 2, feature)
+
+    if empty:
+        return b""
+
+    for name in keys:
+        _write_bytes(layer, 3, name.encode("utf-8"))
+    for value in values:
+        _write_bytes(layer, 4, value)
+
+    _write_key(layer, 5, VARINT)
+    _write_varint(layer, extent)
+
+    tile = bytearray()
+    _write_bytes(tile, 3, layer)
+    return bytes(tile)
+
+
+def get_tile_bounds(z: int, x: int, y: int, margin: float = 0.0):
+    """
+    Returns the Web Mercator min_x, min_y, max_x, max_y of a tile between
+    0 and 1, grown by margin tiles on every side.
+    """
+
+    size = 1.0 / (1 << z)
+    return (
+        (x - margin) * size,
+        (y - margin) * size,
+        (x + 1 + margin) * size,
+        (y + 1 + margin) * size,
+    )
+
+
+class PointIndex:
+    """
+    Points bucketed by their tile at INDEX_ZOOM, for finding the points of
+    a tile without scanning all of them.
+    """
+
+    def __init__(self):
+        self.scale = 1 << INDEX_ZOOM
+        self.buckets: Dict[Tuple[int, int], Dict[Any, tuple]] = {}
+        self.points: Dict[Any, Tuple[int, int]] = {}
+        self.version = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, pk, lng: float, lat: float, values: tuple = ()) -> None:
+        if pk in self.points:
+            self.remove(pk)
+
+        x = lng_to_x(max(min(lng, 180.0), -180.0))
+        y = lat_to_y(lat)
+        key = (
+            min(int(x * self.scale), self.scale - 1),
+            min(int(y * self.scale), self.scale - 1),
+        )
+        self.buckets.setdefault(key, {})[pk] = (x, y, values)
+        self.points[pk] = key
+
+    def remove(self, pk) -> None:
+        key = self.points.pop(pk, None)
+        if key is None:
+            return
+
+        bucket = self.buckets[key]
+        del bucket[pk]
+        if not bucket:
+            del self.buckets[key]
+
+    def query(
+        self, min_x, min_y, max_x, max_y
+    ) -> Iterable[Tuple[Any, float, float, tuple]]:
+        for bucket in iter_cells(self.buckets, self.scale, min_x, min_y, max_x, max_y):
+            for pk, (x, y, values) in bucket.items():
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    yield pk, x, y, values
+
+
+class AsMVTGeom(Func):
+    function = "ST_AsMVTGeom"
+    template = (
+        "%(function)s(ST_Transform(%(expressions)s, 3857), "
+        "ST_TileEnvelope(%(z)d, %(x)d, %(y)d), %(extent)d, %(buffer)d, true)"
+    )
+    output_field = models.BinaryField()
+
+
+class VectorTileSource(IndexedSource):
+    """
+    A model location field served as vector tiles. Tiles are rendered with
+    ST_AsMVT on PostGIS and from an in memory PointIndex otherwise, then
+    cached in GEO_WIDGET_INDEX_CACHE until a location changes.
+    """
+
+    name = "vector_tiles"
+
+    def __init__(
+        self,
+        model,
+        location_field: str = "location",
+        queryset=None,
+        properties: Sequence[str] = (),
+        layer_name: Optional[str] = None,
+        extent: int = DEFAULT_EXTENT,
+        buffer: int = DEFAULT_BUFFER,
+    ):
+        super().__init__(
+            model, location_field, queryset=queryset, properties=properties
+        )
+        self.layer_name = layer_name or model._meta.model_name
+        self.extent = extent
+        self.buffer = buffer
+
+    def create_index(self) -> PointIndex:
+        return PointIndex()
+
+    def add_to_index(self, index, pk, lng, lat, values):
+        index.add(pk, lng, lat, values)
+
+    def uses_postgis(self, queryset) -> bool:
+        return (
+            is_point_field(self.model, self.location_field)
+            and connections[queryset.db].vendor == "postgresql"
+        )
+
+    def get_tile(self, z: int, x: int, y: int) -> Tuple[bytes, str]:
+        """
+        Returns the encoded tile and its ETag.
+        """
+
+        cache_key = self.get_cache_key(
+            "tile:{}:{}:{}:{}".format(self.get_version(), z, x, y)
+        )
+        result = self.cache.get(cache_key)
+        if result is None:
+            data = self.render_tile(z, x, y)
+            etag = '"{}"'.format(hashlib.sha1(data).hexdigest()[:16])
+            result = (data, etag)
+            self.cache.set(cache_key, result, TILE_CACHE_TIMEOUT)
+
+        return result
+
+    def render_tile(self, z: int, x: int, y: int) -> bytes:
+        queryset = self.get_queryset()
+        if self.uses_postgis(queryset):
+            return self.render_postgis_tile(queryset, z, x, y)
+
+        min_x, min_y, max_x, max_y = get_tile_bounds(
+            z, x, y, margin=self.buffer / self.extent
+        )
+        scale = (1 << z) * self.extent
+
+        with self._lock:
+            points = list(self.get_index().query(min_x, min_y, max_x, max_y))
+
+        features = (
+            (
+                pk,
+                round(point_x * scale) - x * self.extent,
+                round(point_y * scale) - y * self.extent,
+                dict(zip(self.properties, values)),
+            )
+            for pk, point_x, point_y, values in points
+        )
+        return encode_tile(self.layer_name, features, self.extent)
+
+    def render_postgis_tile(self, queryset, z: int, x: int, y: int) -> bytes:
+        min_x, min_y, max_x, max_y = get_tile_bounds(
+            z, x, y, margin=self.buffer / self.extent
+        )
+        bbox = (
+            max(x_to_lng(min_x), -180.0),
+            max(y_to_lat(max_y), -MAX_LATITUDE),
+            min(x_to_lng(max_x), 180.0),
+            min(y_to_lat(min_y), MAX_LATITUDE),
+        )
+
+        rows = (
+            filter_bbox(queryset, self.location_field, bbox)
+            .annotate(
+                mvt_id=F("pk"),
+                mvt_geom=AsMVTGeom(
+                    F(self.location_field),
+                    z=z,
+                    x=x,
+                    y=y,
+                    extent=self.extent,
+                    buffer=self.buffer,
+                ),
+            )
+            .values("mvt_id", "mvt_geom", *self.properties)
+        )
+        sql, params = rows.query.sql_with_params()
+
+        with connections[rows.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT ST_AsMVT(tile, %s, %s, 'mvt_geom', 'mvt_id') "
+                "FROM ({}) AS tile".format(sql),
+                [self.layer_name, self.extent, *params],
+            )
+            row = cursor.fetchone()
+
+        return bytes(row[0]) if row and row[0] else b""
+
+
+def register_vector_tile_source(
+    model, location_field: str = "location", **options
+) -> VectorTileSource:
+    """
+    Registers a location field for vector tiles, returning the existing
+    source when it was already registered.
+    """
+
+    return register_source(VectorTileSource, model, location_field, **options)
@@ -0,0 +1,407 @@
+import calendar
+import functools
+import hashlib
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Max
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+from django.views.generic import View
+from wagtail.models import Page
+
+from wagtailgeowidget import app_settings, geocoders
+from wagtailgeowidget.bulk import DEFAULT_CHUNK_SIZE
+from wagtailgeowidget.clustering import ClusterSource
+from wagtailgeowidget.geocoders import GeocoderError, get_geocoder
+from wagtailgeowidget.geojson import iter_geojson
+from wagtailgeowidget.helpers import parse_bbox
+from wagtailgeowidget.indexes import get_source
+from wagtailgeowidget.tile_archives import get_tile_archive
+from wagtailgeowidget.tiles import TileError, get_tile_proxy, is_valid_tile
+from wagtailgeowidget.vector_tiles import CONTENT_TYPE, VectorTileSource
+
+PROXY_GEOCODERS = (geocoders.NOMINATIM, geocoders.MAPBOX)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+def get_cache_key(prefix: str, geocoder: str, query: str) -> str:
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+    return "wagtailgeowidget:{}:{}:{}".format(prefix, geocoder, digest)
+
+
+@require_GET
+def geocode(request):
+    """
+    Geocodes the query in the q parameter with the geocoder in the geocoder
+    parameter, results are cached and only fetched upstream on cache miss.
+    """
+
+    geocoder = request.GET.get("geocoder", geocoders.NOMINATIM)
+    query = normalize_query(request.GET.get("q", ""))
+
+    if geocoder not in PROXY_GEOCODERS:
+        return JsonResponse(
+            {"error": "Unsupported geocoder '{}'".format(geocoder)}, status=400
+        )
+
+    if not query:
+        return JsonResponse({"results": []})
+
+    cache = caches[app_settings.GEO_WIDGET_GEOCODER_CACHE]
+    cache_key = get_cache_key("geocode", geocoder, query)
+
+    results = cache.get(cache_key)
+    if results is None:
+        try:
+            results = get_geocoder(geocoder).geocode(query)
+        except GeocoderError as e:
+            return JsonResponse({"error": str(e)}, status=502)
+
+        cache.set(cache_key, results, app_settings.GEO_WIDGET_GEOCODER_CACHE_TIMEOUT)
+
+    return JsonResponse({"results": results})
+
+
+@require_GET
+def reverse_geocode(request):
+    """
+    Returns the address at the lat and lng parameters. Coordinates are
+    rounded to GEO_WIDGET_REVERSE_GEOCODE_PRECISION decimals first, so
+    markers dragged to nearby spots share a cached address.
+    """
+
+    geocoder = request.GET.get("geocoder", geocoders.NOMINATIM)
+
+    # Google Maps is reverse geocoded in the browser, with the Maps key
+    # restricted to the referrers of the admin
+    if geocoder not in PROXY_GEOCODERS:
+        return JsonResponse(
+            {"error": "Unsupported geocoder '{}'".format(geocoder)}, status=400
+        )
+
+    try:
+        lat = float(request.GET["lat"])
+        lng = float(request.GET["lng"])
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Invalid location"}, status=400)
+
+    # Also rejects nan and inf
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return JsonResponse({"error": "Invalid location"}, status=400)
+
+    precision = app_settings.GEO_WIDGET_REVERSE_GEOCODE_PRECISION
+    lat = round(lat, precision)
+    lng = round(lng, precision)
+
+    cache = caches[app_settings.GEO_WIDGET_GEOCODER_CACHE]
+    cache_key = get_cache_key(
+        "reverse", geocoder, "{:.{p}f},{:.{p}f}".format(lat, lng, p=precision)
+    )
+
+    address = cache.get(cache_key)
+    if address is None:
+        try:
+            address = get_geocoder(geocoder).reverse(lat, lng)
+        except GeocoderError as e:
+            return JsonResponse({"error": str(e)}, status=502)
+
+        cache.set(cache_key, address, app_settings.GEO_WIDGET_GEOCODER_CACHE_TIMEOUT)
+
+    return JsonResponse({"address": address})
+
+
+def require_admin_user(view_func):
+    @functools.wraps(view_func)
+    def decorated_view(request, *args, **kwargs):
+        if not request.user.has_perm("wagtailadmin.access_admin"):
+            return HttpResponseForbidden()
+
+        return view_func(request, *args, **kwargs)
+
+    return decorated_view
+
+
+@require_GET
+@require_admin_user
+def tile(request, z, x, y):
+    """
+    Serves a tile of the Leaflet tile layer from the local tile cache,
+    fetching it upstream when missing or stale.
+    """
+
+    if not app_settings.GEO_WIDGET_TILE_PROXY or not is_valid_tile(z, x, y):
+        raise Http404
+
+    try:
+        tile = get_tile_proxy().get_tile(z, x, y)
+    except TileError as e:
+        return HttpResponse(str(e), status=502, content_type="text/plain")
+
+    if tile.etag and request.headers.get("If-None-Match") == tile.etag:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(tile.body, content_type=tile.content_type)
+
+    if tile.etag:
+        response["ETag"] = tile.etag
+    response["Cache-Control"] = "private, max-age={}".format(
+        app_settings.GEO_WIDGET_TILE_CACHE_TIMEOUT
+    )
+    return response
+
+
+@require_GET
+@require_admin_user
+def archive_tile(request, version, z, x, y):
+    """
+    Serves a tile from the archive in GEO_WIDGET_TILE_ARCHIVE, the archive
+    version is part of the url so responses can be cached forever.
+    """
+
+    archive = get_tile_archive()
+    if archive is None or not is_valid_tile(z, x, y):
+        raise Http404
+
+    data = archive.get_tile(z, x, y)
+    if data is None:
+        raise Http404
+
+    response = HttpResponse(data, content_type=archive.content_type)
+    if archive.content_encoding:
+        response["Content-Encoding"] = archive.content_encoding
+
+    if version == archive.version:
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "no-cache"
+    return response
+
+
+def get_registered_source(source_class, register_name, model, location_field):
+    # Sources registered with the url conf would be missing from processes
+    # that don't load it, such as publish_scheduled, which then wouldn't
+    # record their changes
+    source = get_source(source_class, model, location_field)
+    if source is None:
+        raise ImproperlyConfigured(
+            "Call {}({}, location_field={!r}) in the ready() method of your "
+            "app config".format(register_name, model.__name__, location_field)
+        )
+    return source
+
+
+class ClusterView(View):
+    """
+    Returns the clusters of a model location field inside the bbox parameter
+    at the zoom parameter as a GeoJSON FeatureCollection. Single points have
+    the object pk as feature id. The location field must be registered with
+    register_cluster_source when the app is loaded.
+
+    Example:
+        path("map/clusters/", ClusterView.as_view(model=EventPage))
+    """
+
+    http_method_names = ["get"]
+
+    model = None
+    location_field = "location"
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        get_registered_source(
+            ClusterSource,
+            "register_cluster_source",
+            initkwargs.get("model", cls.model),
+            initkwargs.get("location_field", cls.location_field),
+        )
+        return super().as_view(**initkwargs)
+
+    def get(self, request):
+        bbox = parse_bbox(request.GET.get("bbox", ""))
+        try:
+            zoom = int(request.GET.get("zoom", ""))
+        except ValueError:
+            zoom = None
+
+        if bbox is None or zoom is None or zoom < 0:
+            return JsonResponse(
+                {"error": "bbox and zoom parameters are required"}, status=400
+            )
+
+        source = get_source(ClusterSource, self.model, self.location_field)
+        features = []
+        for cluster in source.get_clusters(bbox, zoom):
+            feature = {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [cluster.lng, cluster.lat],
+                },
+                "properties": {
+                    "cluster": cluster.pk is None,
+                    "point_count": cluster.count,
+                },
+            }
+            if cluster.pk is not None:
+                feature["id"] = cluster.pk
+            features.append(feature)
+
+        return JsonResponse({"type": "FeatureCollection", "features": features})
+
+
+class GeoJSONView(View):
+    """
+    Streams the locations of a model as a GeoJSON FeatureCollection, with
+    the bbox parameter limiting the area and the properties parameter
+    picking which of the allowed properties are included. Page models get
+    ETag and Last-Modified headers from the newest last_published_at.
+
+    Example:
+        path("map/events.geojson", GeoJSONView.as_view(
+            model=EventPage, properties=["title", "url_path"]
+        ))
+    """
+
+    http_method_names = ["get", "head"]
+
+    model = None
+    location_field = "location"
+    queryset = None
+    properties = ()
+    last_modified_field = None
+    chunk_size = DEFAULT_CHUNK_SIZE
+
+    def get_queryset(self):
+        if self.queryset is not None:
+            return self.queryset.all()
+
+        queryset = self.model._default_manager.all()
+        if issubclass(self.model, Page):
+            queryset = queryset.live()
+        return queryset
+
+    def get_last_modified_field(self):
+        if self.last_modified_field:
+            return self.last_modified_field
+
+        if issubclass(self.model, Page):
+            return "last_published_at"
+
+        return None
+
+    def get(self, request):
+        bbox = None
+        if "bbox" in request.GET:
+            bbox = parse_bbox(request.GET["bbox"])
+            if bbox is None:
+                return JsonResponse({"error": "Invalid bbox"}, status=400)
+
+        properties = list(self.properties)
+        if "properties" in request.GET:
+            properties = [name for name in request.GET["properties"].split(",") if name]
+            unknown = set(properties) - set(self.properties)
+            if unknown:
+                return JsonResponse(
+                    {
+                        "error": "Unknown properties {}".format(
+                            ", ".join(sorted(unknown))
+                        )
+                    },
+                    status=400,
+                )
+
+        queryset = self.get_queryset()
+
+        response = None
+        etag = None
+        last_modified = None
+        last_modified_field = self.get_last_modified_field()
+        if last_modified_field:
+            # The count changes when objects are unpublished or deleted
+            stats = queryset.aggregate(
+                newest=Max(last_modified_field), count=Count("pk")
+            )
+            if stats["newest"]:
+                last_modified = calendar.timegm(stats["newest"].utctimetuple())
+
+            fingerprint = "{}:{}:{}".format(
+                stats["newest"], stats["count"], request.get_full_path()
+            )
+            etag = '"{}"'.format(hashlib.sha1(fingerprint.encode("utf-8")).hexdigest())
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+
+        if response is None:
+            response = StreamingHttpResponse(
+                iter_geojson(
+                    queryset,
+                    self.location_field,
+                    properties=properties,
+                    bbox=bbox,
+                    chunk_size=self.chunk_size,
+                ),
+                content_type="application/geo+json",
+            )
+
+        if etag:
+            response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class VectorTileView(View):
+    """
+    Serves the locations of a model as Mapbox Vector Tiles, with the object
+    pk as feature id. The location field must be registered with
+    register_vector_tile_source when the app is loaded.
+
+    Example:
+        path("map/events/<int:z>/<int:x>/<int:y>.mvt", VectorTileView.as_view(
+            model=EventPage
+        ))
+    """
+
+    http_method_names = ["get", "head"]
+
+    model = None
+    location_field = "location"
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        get_registered_source(
+            VectorTileSource,
+            "register_vector_tile_source",
+            initkwargs.get("model", cls.model),
+            initkwargs.get("location_field", cls.location_field),
+        )
+        return super().as_view(**initkwargs)
+
+    def get(self, request, z, x, y):
+        if not is_valid_tile(z, x, y):
+            raise Http404
+
+        source = get_source(VectorTileSource, self.model, self.location_field)
+        data, etag = source.get_tile(z, x, y)
+
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(data, content_type=CONTENT_TYPE)
+
+        response["ETag"] = etag
+        return response
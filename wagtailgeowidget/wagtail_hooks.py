@@ -0,0 +1,11 @@
+from django.urls import include, path
+from wagtail import hooks
+
+from wagtailgeowidget import admin_urls
+
+
+@hooks.register("register_admin_urls")
+def register_admin_urls():
+    return [
+        path("geo-widget/", include(admin_urls, namespace="wagtailgeowidget")),
+    ]
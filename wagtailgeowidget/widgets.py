@@ -1,10 +1,15 @@
+import base64
+import hashlib
 import json
 import uuid
+from functools import lru_cache
 
 from django import forms
 from django.forms import widgets
+from django.templatetags.static import static
+from django.urls import NoReverseMatch, reverse
 from django.utils.functional import cached_property
-from django.utils.html import format_html
+from django.utils.html import format_html, json_script
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
 from wagtail import VERSION as WAGTAIL_VERSION
@@ -22,10 +27,10 @@ except:  # NOQA
     Point = None
 
 from wagtailgeowidget import geocoders
+from wagtailgeowidget.api_keys import get_google_maps_api_key
 from wagtailgeowidget.app_settings import (
     GEO_WIDGET_DEFAULT_LOCATION,
     GEO_WIDGET_EMPTY_LOCATION,
-    GEO_WIDGET_LEAFLET_TILE_LAYER,
     GEO_WIDGET_LEAFLET_TILE_LAYER_OPTIONS,
     GEO_WIDGET_ZOOM,
 )
@@ -41,9 +46,238 @@ translations = {
     ),
     "enter_location": _("Enter a location"),
     "initialize_map": _("Click here to initialize map"),
+    "error_could_not_load_map": _("The map could not be loaded: %s"),
 }
 
 
+def get_geocoder_params(geocoder):
+    from wagtailgeowidget import app_settings
+    from wagtailgeowidget.views import PROXY_GEOCODERS
+
+    params = {}
+
+    # The proxy keeps provider credentials on the server
+    if app_settings.GEO_WIDGET_GEOCODER_PROXY and geocoder in PROXY_GEOCODERS:
+        params["proxyUrl"] = reverse("wagtailgeowidget:geocode")
+        return params
+
+    if geocoder == geocoders.MAPBOX:
+        params["accessToken"] = app_settings.MAPBOX_ACCESS_TOKEN
+        params["language"] = app_settings.MAPBOX_LANGUAGE
+
+    return params
+
+
+LEAFLET_VERSION = "1.9.4"
+LEAFLET_STATIC_DIR = "wagtailgeowidget/vendor/leaflet-{}".format(LEAFLET_VERSION)
+LEAFLET_CDN_URL = "https://unpkg.com/leaflet@{}/dist".format(LEAFLET_VERSION)
+
+# Integrity of the files published on the CDN
+LEAFLET_CDN_INTEGRITY = {
+    "leaflet.js": "sha256-20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=",
+    "leaflet.css": "sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=",
+}
+
+
+@lru_cache(maxsize=None)
+def get_static_integrity(path):
+    """
+    Returns the subresource integrity of a static file as served, which
+    differs from the source when the storage rewrites urls (such as
+    ManifestStaticFilesStorage).
+    """
+
+    from django.contrib.staticfiles import finders
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    name = path
+    if hasattr(staticfiles_storage, "stored_name"):
+        try:
+            name = staticfiles_storage.stored_name(path)
+        except ValueError:
+            pass
+
+    try:
+        with staticfiles_storage.open(name) as fd:
+            content = fd.read()
+    except (OSError, ValueError):
+        # Files are not collected when using the development server
+        absolute_path = finders.find(path)
+        if not absolute_path:
+            return None
+
+        with open(absolute_path, "rb") as fd:
+            content = fd.read()
+
+    digest = hashlib.sha384(content).digest()
+    return "sha384-{}".format(base64.b64encode(digest).decode("ascii"))
+
+
+def get_leaflet_assets():
+    from wagtailgeowidget import app_settings
+
+    assets = {}
+    for key, filename in (("leafletJs", "leaflet.js"), ("leafletCss", "leaflet.css")):
+        if app_settings.GEO_WIDGET_LEAFLET_USE_CDN:
+            url = "{}/{}".format(LEAFLET_CDN_URL, filename)
+            integrity = LEAFLET_CDN_INTEGRITY[filename]
+        else:
+            path = "{}/{}".format(LEAFLET_STATIC_DIR, filename)
+            url = static(path)
+            integrity = get_static_integrity(path)
+
+        assets[key] = url
+        assets["{}Integrity".format(key)] = integrity
+
+    # Leaflet finds the marker images from the url in leaflet.css, which
+    # fails once the storage adds a hash to their names
+    assets["leafletIcons"] = {}
+    for key, filename in (
+        ("iconUrl", "marker-icon.png"),
+        ("iconRetinaUrl", "marker-icon-2x.png"),
+        ("shadowUrl", "marker-shadow.png"),
+    ):
+        if app_settings.GEO_WIDGET_LEAFLET_USE_CDN:
+            url = "{}/images/{}".format(LEAFLET_CDN_URL, filename)
+        else:
+            url = static("{}/images/{}".format(LEAFLET_STATIC_DIR, filename))
+
+        assets["leafletIcons"][key] = url
+
+    return assets
+
+
+def get_google_maps_api_url():
+    from wagtailgeowidget import app_settings
+
+    google_maps_apikey = get_google_maps_api_key()
+
+    query = "libraries=places,marker&language={}".format(
+        app_settings.GOOGLE_MAPS_V3_LANGUAGE,
+    )
+    if google_maps_apikey:
+        query = "key={}&{}".format(google_maps_apikey, query)
+
+    return "https://maps.google.com/maps/api/js?{}".format(query)
+
+
+def reverse_public_url(name, args):
+    try:
+        return reverse("wagtailgeowidget_public:{}".format(name), args=args)
+    except NoReverseMatch:
+        # include('wagtailgeowidget.urls') is missing from the url conf
+        return None
+
+
+def get_tile_layer():
+    from wagtailgeowidget import app_settings
+    from wagtailgeowidget.tile_archives import get_tile_archive
+
+    # Turn the url of a tile into a Leaflet url template
+    # Fall back to the tile server when the public urls aren't served
+    url = None
+    archive = get_tile_archive()
+    if archive:
+        url = reverse_public_url("archive_tile", args=(archive.version, 0, 0, 0))
+    elif app_settings.GEO_WIDGET_TILE_PROXY:
+        url = reverse_public_url("tile", args=(0, 0, 0))
+
+    if url:
+        return url.replace("/0/0/0/", "/{z}/{x}/{y}/")
+
+    return app_settings.GEO_WIDGET_LEAFLET_TILE_LAYER
+
+
+def get_tile_layer_options():
+    from wagtailgeowidget.tile_archives import get_tile_archive
+
+    archive = get_tile_archive()
+    if archive and archive.max_zoom is not None:
+        # Upscale the deepest tiles of the archive when zooming in further
+        return {
+            **GEO_WIDGET_LEAFLET_TILE_LAYER_OPTIONS,
+            "maxNativeZoom": archive.max_zoom,
+        }
+
+    return GEO_WIDGET_LEAFLET_TILE_LAYER_OPTIONS
+
+
+def get_shared_config():
+    """
+    Options shared by all map and geocoder fields, emitted once per admin
+    page instead of being repeated for every field.
+    """
+
+    from wagtailgeowidget import app_settings
+
+    config = {
+        "translations": translations,
+        "showEmptyLocation": GEO_WIDGET_EMPTY_LOCATION,
+    }
+
+    if app_settings.GEO_WIDGET_REVERSE_GEOCODE:
+        config["reverseGeocodeUrl"] = reverse("wagtailgeowidget:reverse_geocode")
+
+    return config
+
+
+def get_google_maps_config():
+    # The SDK is only fetched once a field needs it
+    return {
+        "googleMapsApiUrl": get_google_maps_api_url(),
+    }
+
+
+def get_leaflet_config():
+    return {
+        "tileLayer": get_tile_layer(),
+        "tileLayerOptions": get_tile_layer_options(),
+        **get_leaflet_assets(),
+    }
+
+
+class SharedConfig:
+    """
+    Media entry rendering the shared config of a provider as a json script,
+    so it is only built on pages with a field that needs it and is emitted
+    once however many fields there are.
+    """
+
+    providers = {
+        None: get_shared_config,
+        "google-maps": get_google_maps_config,
+        "leaflet": get_leaflet_config,
+    }
+
+    def __init__(self, provider=None):
+        self.provider = provider
+
+    def __eq__(self, other):
+        return isinstance(other, SharedConfig) and other.provider == self.provider
+
+    def __hash__(self):
+        return hash((SharedConfig, self.provider))
+
+    def __repr__(self):
+        return "SharedConfig({!r})".format(self.provider)
+
+    @property
+    def element_id(self):
+        if self.provider is None:
+            return "wagtailgeowidget-config"
+        return "wagtailgeowidget-config-{}".format(self.provider)
+
+    def __html__(self):
+        return json_script(self.providers[self.provider](), self.element_id)
+
+
+GOOGLE_MAPS_GEOCODERS = (
+    geocoders.GOOGLE_MAPS,
+    geocoders.GOOGLE_MAPS_PLACES,
+    geocoders.GOOGLE_MAPS_PLACES_NEW,
+)
+
+
 class GoogleMapsField(forms.HiddenInput):
     address_field = None
     zoom_field = None
@@ -81,8 +315,6 @@ class GoogleMapsField(forms.HiddenInput):
             "zoomField": self.zoom_field,
             "zoom": self.zoom,
             "srid": self.srid,
-            "showEmptyLocation": GEO_WIDGET_EMPTY_LOCATION,
-            "translations": translations,
             "mapId": self.map_id,
         }
 
@@ -106,33 +338,15 @@ class GoogleMapsField(forms.HiddenInput):
 
     @cached_property
     def media(self):
-        from django.utils.module_loading import import_string
-
-        from wagtailgeowidget.app_settings import (
-            GOOGLE_MAPS_V3_APIKEY,
-            GOOGLE_MAPS_V3_APIKEY_CALLBACK,
-            GOOGLE_MAPS_V3_LANGUAGE,
-        )
-
-        google_maps_apikey = GOOGLE_MAPS_V3_APIKEY
-
-        if GOOGLE_MAPS_V3_APIKEY_CALLBACK:
-            if isinstance(GOOGLE_MAPS_V3_APIKEY_CALLBACK, str):
-                callback = import_string(GOOGLE_MAPS_V3_APIKEY_CALLBACK)
-            else:
-                callback = GOOGLE_MAPS_V3_APIKEY_CALLBACK
-
-            google_maps_apikey = callback()
-
         return forms.Media(
             css={"all": ("wagtailgeowidget/css/google-maps-field.css",)},
             js=(
+                SharedConfig(),
+                SharedConfig("google-maps"),
+                "wagtailgeowidget/js/geo-widget-config.js",
+                "wagtailgeowidget/js/sdk-loader.js",
                 "wagtailgeowidget/js/google-maps-field.js",
                 "wagtailgeowidget/js/google-maps-field-controller.js",
-                "https://maps.google.com/maps/api/js?key={}&libraries=places,marker&language={}".format(
-                    google_maps_apikey,
-                    GOOGLE_MAPS_V3_LANGUAGE,
-                ),
             ),
         )
 
@@ -178,18 +392,7 @@ class GeocoderField(widgets.TextInput):
         super().__init__(*args, **kwargs)
 
     def build_attrs(self, *args, **kwargs):
-        options = {"translations": translations}
-        params = {}
-        if self.geocoder == geocoders.MAPBOX:
-            from wagtailgeowidget.app_settings import (
-                MAPBOX_ACCESS_TOKEN,
-                MAPBOX_LANGUAGE,
-            )
-
-            params["accessToken"] = MAPBOX_ACCESS_TOKEN
-            params["language"] = MAPBOX_LANGUAGE
-
-        options["params"] = params
+        options = {"params": get_geocoder_params(self.geocoder)}
 
         attrs = super().build_attrs(*args, **kwargs)
         attrs["data-controller"] = "geocoder-field"
@@ -199,27 +402,18 @@ class GeocoderField(widgets.TextInput):
 
     @property
     def media(self):
-        js = [
-            "wagtailgeowidget/js/geocoder-field.js",
-            "wagtailgeowidget/js/geocoder-field-controller.js",
-        ]
-
-        from wagtailgeowidget.app_settings import (
-            GOOGLE_MAPS_V3_APIKEY,
-            GOOGLE_MAPS_V3_LANGUAGE,
-        )
-
-        if self.geocoder == geocoders.GOOGLE_MAPS:
-            js = [
-                *js,
-                "https://maps.google.com/maps/api/js?key={}&libraries=places,marker&language={}".format(
-                    GOOGLE_MAPS_V3_APIKEY,
-                    GOOGLE_MAPS_V3_LANGUAGE,
-                ),
-            ]
+        config = [SharedConfig()]
+        if self.geocoder in GOOGLE_MAPS_GEOCODERS:
+            config.append(SharedConfig("google-maps"))
 
         return forms.Media(
-            js=js,
+            js=[
+                *config,
+                "wagtailgeowidget/js/geo-widget-config.js",
+                "wagtailgeowidget/js/sdk-loader.js",
+                "wagtailgeowidget/js/geocoder-field.js",
+                "wagtailgeowidget/js/geocoder-field-controller.js",
+            ],
         )
 
     def render(self, name, value, attrs=None, renderer=None):
@@ -272,10 +466,6 @@ class LeafletField(forms.HiddenInput):
             "zoomField": self.zoom_field,
             "zoom": self.zoom,
             "srid": self.srid,
-            "tileLayer": GEO_WIDGET_LEAFLET_TILE_LAYER,
-            "tileLayerOptions": GEO_WIDGET_LEAFLET_TILE_LAYER_OPTIONS,
-            "showEmptyLocation": GEO_WIDGET_EMPTY_LOCATION,
-            "translations": translations,
         }
 
         if self.value_data and isinstance(self.value_data, str):
@@ -299,16 +489,14 @@ class LeafletField(forms.HiddenInput):
     @cached_property
     def media(self):
         return forms.Media(
-            css={
-                "all": (
-                    "wagtailgeowidget/css/leaflet-field.css",
-                    "https://unpkg.com/leaflet@1.9.4/dist/leaflet.css",
-                )
-            },
+            css={"all": ("wagtailgeowidget/css/leaflet-field.css",)},
             js=(
+                SharedConfig(),
+                SharedConfig("leaflet"),
+                "wagtailgeowidget/js/geo-widget-config.js",
+                "wagtailgeowidget/js/sdk-loader.js",
                 "wagtailgeowidget/js/leaflet-field.js",
                 "wagtailgeowidget/js/leaflet-field-controller.js",
-                "https://unpkg.com/leaflet@1.9.4/dist/leaflet.js",
             ),
         )
 
@@ -355,8 +543,6 @@ class GoogleMapsFieldAdapter(WidgetAdapter):
             "defaultLocation": GEO_WIDGET_DEFAULT_LOCATION,
             "srid": widget.srid,
             "zoom": widget.zoom,
-            "showEmptyLocation": GEO_WIDGET_EMPTY_LOCATION,
-            "translations": translations,
             "mapId": widget.map_id,
         }
 
@@ -375,14 +561,10 @@ class GeocoderFieldAdapter(WidgetAdapter):
     def js_args(self, widget):
         args = super().js_args(widget)
 
-        params = {}
-
-        if widget.geocoder == geocoders.MAPBOX:
-            from wagtailgeowidget.app_settings import MAPBOX_ACCESS_TOKEN
-
-            params["accessToken"] = MAPBOX_ACCESS_TOKEN
+        params = get_geocoder_params(widget.geocoder)
 
-        return [*args, widget.geocoder, translations, params]
+        # The translations are read from the shared config in the widget media
+        return [*args, widget.geocoder, params]
 
     class Media:
         js = ["wagtailgeowidget/js/geocoder-field-telepath.js"]
@@ -405,10 +587,6 @@ class LeafletFieldAdapter(WidgetAdapter):
                 "defaultLocation": GEO_WIDGET_DEFAULT_LOCATION,
                 "srid": widget.srid,
                 "zoom": widget.zoom,
-                "tileLayer": GEO_WIDGET_LEAFLET_TILE_LAYER,
-                "tileLayerOptions": GEO_WIDGET_LEAFLET_TILE_LAYER_OPTIONS,
-                "showEmptyLocation": GEO_WIDGET_EMPTY_LOCATION,
-                "translations": translations,
             },
         ]
 